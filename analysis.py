@@ -0,0 +1,86 @@
+import pandas as pd
+
+# Analyses for the Data Analysis tab. They read only the rollup tables built at
+# ingest (see ingest.ROLLUP_TABLES), never the raw report tables.
+
+
+def rollup_months(conn):
+    """
+    Returns the sorted months covered by the enforcement rollups
+    """
+    cursor = conn.execute(
+        "SELECT DISTINCT month FROM rollup_inspector_month ORDER BY month"
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def monthly_report_counts(conn, start_month=None, end_month=None):
+    """
+    Reports, fines and payments per month (התפלגות דוחות לפי חודשים)
+    """
+    return pd.read_sql_query(
+        """
+    SELECT month, SUM(report_count) AS report_count,
+           SUM(fine_total) AS fine_total, SUM(paid_total) AS paid_total
+    FROM rollup_inspector_month
+    WHERE month BETWEEN COALESCE(?, '') AND COALESCE(?, '9999')
+    GROUP BY month ORDER BY month
+    """,
+        conn,
+        params=(start_month, end_month),
+    )
+
+
+def inspector_comparison(conn, start_month=None, end_month=None):
+    """
+    Reports and fines per inspector over a month range (השוואת פקחים)
+    """
+    return pd.read_sql_query(
+        """
+    SELECT inspector, SUM(report_count) AS report_count,
+           SUM(fine_total) AS fine_total, SUM(paid_total) AS paid_total,
+           COUNT(DISTINCT month) AS active_months
+    FROM rollup_inspector_month
+    WHERE month BETWEEN COALESCE(?, '') AND COALESCE(?, '9999')
+    GROUP BY inspector ORDER BY report_count DESC
+    """,
+        conn,
+        params=(start_month, end_month),
+    )
+
+
+def area_trends(conn, area_column="supervision_area", start_month=None, end_month=None):
+    """
+    Reports per area and month, pivoted to one column per area (מגמות לפי אזורים)
+    """
+    if area_column not in ("supervision_area", "parking_area"):
+        raise ValueError(f"Unknown area column: {area_column}")
+    frame = pd.read_sql_query(
+        f"""
+    SELECT month, COALESCE({area_column}, 'לא ידוע') AS area,
+           SUM(report_count) AS report_count
+    FROM rollup_area_month
+    WHERE month BETWEEN COALESCE(?, '') AND COALESCE(?, '9999')
+    GROUP BY month, area ORDER BY month
+    """,
+        conn,
+        params=(start_month, end_month),
+    )
+    return frame.pivot(index="month", columns="area", values="report_count").fillna(0)
+
+
+def payment_totals(conn, start_month=None, end_month=None):
+    """
+    Charges, credits and transactions per payment month (ניתוח תשלומים)
+    """
+    return pd.read_sql_query(
+        """
+    SELECT month, transaction_count, report_count, charge_total, credit_total,
+           charge_total - credit_total AS net_total
+    FROM rollup_payments_month
+    WHERE month BETWEEN COALESCE(?, '') AND COALESCE(?, '9999')
+    ORDER BY month
+    """,
+        conn,
+        params=(start_month, end_month),
+    )
@@ -0,0 +1,309 @@
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from columnar_cache import COLUMNAR_CACHE_DIR
+from connection_pool import close_all_connections, get_read_connection
+from ingest import (
+    DATE_INDEX_COLUMNS,
+    DEFAULT_REPORT_STORAGE,
+    build_database,
+    index_name_for,
+    prepare_database_for_date_queries,
+    quote_identifier,
+)
+from prompt_context import DATE_EXAMPLES, EXAMPLES
+from query_engine import available_engines, create_engine
+from query_guard import (
+    ACTION_LIMIT,
+    blocking_issues,
+    check_query_plan,
+    sanitize_sql_query,
+)
+from result_summary import describe_results, stats_from_rows, stats_from_sql
+from schema_pruning import estimate_tokens
+from synthetic_data import DEFAULT_OVERLAP, generate_dataset
+
+# Rows fetched per query, as the app's max_result_rows default
+BENCHMARK_MAX_ROWS = 100_000
+
+# First page of a large result, as the app loads it before summarizing
+BENCHMARK_PAGE_ROWS = 1000
+
+# Large result summarized from its first page plus SQL statistics, the path
+# answers over many rows take
+LARGE_RESULT_SQL = (
+    "SELECT \"שם פקח\", עבירה, קנס, שולם, date_formatted FROM enforcement "
+    "WHERE date_formatted >= '2024-01-01'"
+)
+
+
+def git_commit(path="."):
+    """
+    Commit hash of the working tree, so results can be compared across
+    commits; None outside a git checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=path or ".",
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(func, *args, **kwargs):
+    """
+    Returns (result, milliseconds) of one call
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+
+def median_ms(func, repeat):
+    """
+    Median milliseconds of `repeat` calls after a warm-up call
+    """
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def remove_database(db_path):
+    close_all_connections()
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def benchmark_load(db_path, data_dir, report_storage):
+    """
+    Times build_database (what the app's load_csv_to_sqlite runs) three ways:
+    from the CSVs with no cache, from the columnar cache after the database
+    was deleted, and with nothing to do
+    """
+    cache_dir = os.path.join(
+        os.path.dirname(os.path.abspath(db_path)), COLUMNAR_CACHE_DIR
+    )
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, name))
+
+    results = {}
+    for stage in ("csv", "cache", "unchanged"):
+        if stage != "unchanged":
+            remove_database(db_path)
+        stats, ms = timed(
+            build_database, db_path, data_dir, report_storage=report_storage
+        )
+        results[stage] = {"ms": ms, "tables": stats}
+    results["db_mb"] = round(os.path.getsize(db_path) / 2**20, 1)
+    return results
+
+
+def benchmark_date_indexes(db_path):
+    """
+    Times prepare_database_for_date_queries building the date indexes from
+    scratch (they are dropped first; the load already built them)
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        for table_name, columns in DATE_INDEX_COLUMNS.items():
+            for column in columns:
+                conn.execute(
+                    "DROP INDEX IF EXISTS "
+                    + quote_identifier(index_name_for(table_name, column))
+                )
+        conn.commit()
+    finally:
+        conn.close()
+    _, ms = timed(prepare_database_for_date_queries, db_path)
+    return {"ms": ms}
+
+
+def run_query(engine, conn, sql, max_rows=BENCHMARK_MAX_ROWS):
+    """
+    Runs a query the way the app's execute_sql_query does, minus the result
+    cache: sanitize, plan check, then the engine. Returns (rows, columns),
+    or (None, error message).
+    """
+    sql = sanitize_sql_query(sql)
+    issues = check_query_plan(conn, sql)
+    blocked = blocking_issues(issues)
+    if blocked:
+        return None, "; ".join(issue["message"] for issue in blocked)
+    if any(issue["action"] == ACTION_LIMIT for issue in issues):
+        sql = f"SELECT * FROM ({sql}) LIMIT {int(max_rows)}"
+    try:
+        return engine.execute(sql, max_rows)
+    except (sqlite3.Error, *engine.errors) as e:
+        return None, str(e)
+
+
+def benchmark_queries(db_path, engines, repeat):
+    """
+    Times every prompt example on each engine (median of `repeat` runs) and
+    the summarization of its result (statistics and the token-budgeted
+    description sent to the answer model)
+    """
+    conn = get_read_connection(db_path)
+    instances = {name: create_engine(name, db_path) for name in engines}
+    for engine in instances.values():
+        engine.connection()  # Builds the DuckDB copy outside the timings
+
+    report = []
+    for example in EXAMPLES + DATE_EXAMPLES:
+        entry = {"question": example["question"], "ms": {}}
+        result = None
+        for name, engine in instances.items():
+            rows, columns = run_query(engine, conn, example["sql"])
+            if rows is None:
+                entry.setdefault("errors", {})[name] = columns
+                continue
+            result = rows, columns
+            entry["rows"] = len(rows)
+            entry["ms"][name] = median_ms(
+                lambda: run_query(engine, conn, example["sql"]), repeat
+            )
+
+        if result is not None:
+            rows, columns = result
+            description = ""
+
+            def summarize():
+                nonlocal description
+                stats = stats_from_rows(rows, columns)
+                description = describe_results(rows, columns, stats, len(rows))
+
+            entry["summary_ms"] = median_ms(summarize, repeat)
+            entry["summary_tokens"] = estimate_tokens(description)
+        report.append(entry)
+    return report
+
+
+def benchmark_large_summary(db_path, repeat):
+    """
+    Times summarizing a large result from its first page, with the column
+    statistics computed by SQL over the whole result
+    """
+    conn = get_read_connection(db_path)
+    engine = create_engine("sqlite", db_path)
+    (rows, columns), page_ms = timed(
+        run_query, engine, conn, LARGE_RESULT_SQL, BENCHMARK_PAGE_ROWS
+    )
+    if rows is None:
+        return {"error": columns}
+
+    result = {}
+
+    def summarize():
+        stats, total_rows = stats_from_sql(
+            lambda summary_sql: run_query(engine, conn, summary_sql),
+            sanitize_sql_query(LARGE_RESULT_SQL),
+            rows,
+            columns,
+        )
+        result["total_rows"] = total_rows
+        result["description"] = describe_results(rows, columns, stats, total_rows)
+
+    ms = median_ms(summarize, repeat)
+    return {
+        "first_page_ms": page_ms,
+        "summary_ms": ms,
+        "total_rows": result["total_rows"],
+        "summary_tokens": estimate_tokens(result["description"]),
+    }
+
+
+def run_benchmark(
+    data_dir,
+    rows=None,
+    seed=0,
+    overlap=DEFAULT_OVERLAP,
+    engines=None,
+    repeat=5,
+    report_storage=DEFAULT_REPORT_STORAGE,
+):
+    """
+    Runs the end-to-end benchmark on the source CSVs in data_dir, first
+    writing synthetic ones with `rows` rows per file when rows is given.
+    The database is (re)built as data_dir/reports.db.
+
+    The model calls (SQL generation, the streamed answer) are not timed:
+    they need OpenAI and their latency is not the app's.
+    Returns a JSON-serializable dict.
+    """
+    started = datetime.now(timezone.utc)
+    result = {
+        "commit": git_commit(os.path.dirname(os.path.abspath(__file__))),
+        "started": started.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpus": os.cpu_count(),
+        "report_storage": report_storage,
+        "stages": {},
+    }
+    stages = result["stages"]
+    if rows is not None:
+        _, ms = timed(generate_dataset, data_dir, rows, seed, overlap)
+        stages["generate"] = {"ms": ms, "rows": rows, "seed": seed, "overlap": overlap}
+
+    db_path = os.path.join(data_dir, "reports.db")
+    stages["load"] = benchmark_load(db_path, data_dir, report_storage)
+    stages["date_indexes"] = benchmark_date_indexes(db_path)
+    stages["queries"] = benchmark_queries(db_path, engines or available_engines(), repeat)
+    stages["large_summary"] = benchmark_large_summary(db_path, repeat)
+    close_all_connections()
+
+    result["seconds"] = round((datetime.now(timezone.utc) - started).total_seconds(), 1)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from synthetic_data import parse_rows
+
+    parser = argparse.ArgumentParser(
+        description="End-to-end benchmark: load, date indexes, prompt example "
+        "queries and result summarization"
+    )
+    parser.add_argument("data_dir", help="Directory with (or for) the source CSVs")
+    parser.add_argument(
+        "--rows",
+        default=None,
+        help="Generate synthetic CSVs first: 100k, 1m, 10m or a number",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--overlap", type=float, default=DEFAULT_OVERLAP)
+    parser.add_argument("--engines", nargs="+", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--report-storage", default=DEFAULT_REPORT_STORAGE)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    result = run_benchmark(
+        args.data_dir,
+        parse_rows(args.rows) if args.rows else None,
+        args.seed,
+        args.overlap,
+        args.engines,
+        args.repeat,
+        args.report_storage,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {args.output}")
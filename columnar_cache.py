@@ -0,0 +1,195 @@
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:  # Without pyarrow every load parses the CSV
+    pa = None
+
+# Arrow IPC stream files (one record batch per CSV chunk) live here, next to
+# the database. The stream format is used because every batch carries its own
+# dictionaries, which the IPC file format does not allow.
+COLUMNAR_CACHE_DIR = "columnar_cache"
+CACHE_SUFFIX = ".arrows"
+
+# dtype pd.read_csv(dtype=str) gives string columns in the installed pandas
+STRING_DTYPE = pd.Series([], dtype=str).dtype
+
+
+def cache_available():
+    return pa is not None
+
+
+def cache_path_for(cache_dir, table_name, sha256):
+    """
+    Cache file for one table built from a source file with the given content
+    hash; a changed CSV gets a new name, so a stale cache is never read
+    """
+    return os.path.join(cache_dir, f"{table_name}-{sha256[:16]}{CACHE_SUFFIX}")
+
+
+def remove_stale_caches(cache_dir, table_name, keep_path):
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(f"{table_name}-") and path != keep_path:
+            os.remove(path)
+
+
+def encode_chunk(chunk):
+    """
+    Converts a chunk read as strings to an Arrow record batch with every
+    column dictionary-encoded (the Hebrew text columns are highly repetitive)
+    """
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    arrays = [pc.dictionary_encode(column).combine_chunks() for column in table.columns]
+    return pa.RecordBatch.from_arrays(arrays, names=table.column_names)
+
+
+def decode_batch(batch, offset):
+    """
+    Converts a cached record batch back to the frame pd.read_csv(dtype=str)
+    would have produced for the same chunk, including its row index
+    """
+    arrays = [column.dictionary_decode() for column in batch.columns]
+    frame = pa.Table.from_arrays(arrays, names=batch.schema.names).to_pandas()
+    frame = frame.astype(STRING_DTYPE).where(frame.notna(), float("nan"))
+    frame.index = pd.RangeIndex(offset, offset + len(frame))
+    return frame
+
+
+def read_cached_chunks(path):
+    """
+    Yields the cached chunks of a table from a memory-mapped cache file
+    """
+    offset = 0
+    with pa.memory_map(path) as source:
+        for batch in ipc.open_stream(source):
+            yield decode_batch(batch, offset)
+            offset += batch.num_rows
+
+
+def write_through_chunks(chunks, path):
+    """
+    Yields the given CSV chunks unchanged while writing them to a cache file.
+
+    The file is written under a temporary name and renamed into place only
+    after the last chunk, so an interrupted load never leaves a partial cache.
+    """
+    partial = path + ".partial"
+    writer = None
+    try:
+        for chunk in chunks:
+            batch = encode_chunk(chunk)
+            if writer is None:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                writer = ipc.new_stream(partial, batch.schema)
+            writer.write_batch(batch)
+            yield chunk
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(partial, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def read_csv_chunks(csv_path, chunksize):
+    # Everything is read as text; types come from COLUMN_TYPES, not inference
+    return pd.read_csv(csv_path, encoding="utf-8", dtype=str, chunksize=chunksize)
+
+
+def source_chunks(table_name, csv_path, chunksize, cache_dir=None, sha256=None):
+    """
+    Returns (chunks, source): an iterator of a source table's rows as string
+    DataFrame chunks, and where they come from ("cache", "csv+cache" or "csv").
+
+    Given a cache directory and the source file's hash, the columnar cache is
+    read when present and written on the way through when not. Without them,
+    or without pyarrow, the CSV is parsed as before.
+    """
+    if not cache_available() or cache_dir is None or sha256 is None:
+        return read_csv_chunks(csv_path, chunksize), "csv"
+
+    path = cache_path_for(cache_dir, table_name, sha256)
+    if os.path.exists(path):
+        return read_cached_chunks(path), "cache"
+    remove_stale_caches(cache_dir, table_name, path)
+    return write_through_chunks(read_csv_chunks(csv_path, chunksize), path), "csv+cache"
+
+
+def measure_load(chunks):
+    """
+    Consumes an iterator of chunks and returns {"rows", "seconds",
+    "peak_python_mb", "max_chunk_mb"}. The peak is what tracemalloc sees;
+    the largest chunk's deep memory usage covers Arrow-backed strings too.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = 0
+    max_chunk_bytes = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        max_chunk_bytes = max(max_chunk_bytes, chunk.memory_usage(deep=True).sum())
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "peak_python_mb": round(peak / 2**20, 1),
+        "max_chunk_mb": round(max_chunk_bytes / 2**20, 1),
+    }
+
+
+def compare_load(csv_path, cache_dir=COLUMNAR_CACHE_DIR, chunksize=50_000):
+    """
+    Compares reading a CSV with pd.read_csv against writing and then reading
+    its columnar cache. Returns a dict of timings, memory and file sizes.
+    """
+    if not cache_available():
+        raise RuntimeError("pyarrow is not installed")
+    table_name = os.path.splitext(os.path.basename(csv_path))[0]
+    path = cache_path_for(cache_dir, table_name, "benchmark")
+    try:
+        results = {
+            "read_csv": measure_load(read_csv_chunks(csv_path, chunksize)),
+            "write_cache": measure_load(
+                write_through_chunks(read_csv_chunks(csv_path, chunksize), path)
+            ),
+            "read_cache": measure_load(read_cached_chunks(path)),
+            "csv_mb": round(os.path.getsize(csv_path) / 2**20, 1),
+            "cache_mb": round(os.path.getsize(path) / 2**20, 1),
+        }
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    results["speedup"] = round(
+        results["read_csv"]["seconds"] / max(results["read_cache"]["seconds"], 1e-6), 1
+    )
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(
+        description="Compare CSV parsing with the columnar cache"
+    )
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--cache-dir", default=COLUMNAR_CACHE_DIR)
+    args = parser.parse_args()
+
+    for csv_file in args.csv_files:
+        print(csv_file)
+        print(json.dumps(compare_load(csv_file, args.cache_dir), indent=2))
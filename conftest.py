@@ -0,0 +1,57 @@
+import os
+import shutil
+
+import pytest
+
+from connection_pool import close_all_connections
+from ingest import SOURCE_FILES, build_database
+from synthetic_data import generate_dataset
+
+# Rows per synthetic source file: enough for every value pool and several
+# ingest chunks, small enough to build a database in about a second
+TEST_ROWS = 2000
+TEST_SEED = 7
+
+
+@pytest.fixture(scope="session")
+def source_dir(tmp_path_factory):
+    """
+    Synthetic source CSVs shared by the session; tests must not modify them
+    """
+    path = tmp_path_factory.mktemp("sources")
+    generate_dataset(str(path), TEST_ROWS, seed=TEST_SEED)
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path, source_dir):
+    """
+    A private copy of the synthetic CSVs, for tests that change them
+    """
+    for source_file in SOURCE_FILES.values():
+        shutil.copy(source_dir / source_file, tmp_path / source_file)
+    yield tmp_path
+    close_all_connections()
+
+
+@pytest.fixture(scope="session")
+def databases(tmp_path_factory, source_dir):
+    """
+    {"shared": db path, "separate": db path}, both built from the session's
+    synthetic CSVs; tests must not modify them
+    """
+    paths = {}
+    for report_storage in ("shared", "separate"):
+        directory = tmp_path_factory.mktemp(report_storage)
+        for source_file in SOURCE_FILES.values():
+            shutil.copy(source_dir / source_file, directory / source_file)
+        paths[report_storage] = os.path.join(directory, "reports.db")
+        # Serial, so the tests do not depend on the machine's core count
+        build_database(
+            paths[report_storage],
+            str(directory),
+            parallel=False,
+            report_storage=report_storage,
+        )
+    yield paths
+    close_all_connections()
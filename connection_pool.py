@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+import weakref
+from urllib.parse import quote
+
+from text_search import register_search_functions
+
+# Pragmas applied to every pooled read-only connection
+READ_PRAGMAS = [
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA cache_size = -65536",  # 64 MB
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+# id(thread holder) -> {db_path: connection} of every live thread; a thread's
+# entry is closed and removed when the thread exits (its thread-local holder
+# is collected), so Streamlit's short-lived script threads do not pile up
+# open connections
+_open_connections = {}
+_lock = threading.Lock()
+# Bumped by close_all_connections so every thread drops its stale handles
+_generation = 0
+
+
+class _ThreadConnections:
+    """
+    Holder kept in a thread's local storage; its finalizer closes the
+    thread's connections once the thread is gone
+    """
+
+    def __init__(self):
+        self.connections = {}
+        with _lock:
+            _open_connections[id(self)] = self.connections
+        weakref.finalize(self, _close_thread_connections, id(self))
+
+
+def _close_thread_connections(key):
+    with _lock:
+        connections = _open_connections.pop(key, {})
+    _close(connections.values())
+
+
+def _close(connections):
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def _open_read_connection(db_path):
+    uri = "file:{}?mode=ro".format(quote(os.path.abspath(db_path)))
+    # Each connection is only used by its own thread; check_same_thread is
+    # off so close_all_connections can close it from another thread
+    conn = sqlite3.connect(
+        uri,
+        uri=True,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        timeout=5.0,
+        check_same_thread=False,
+    )
+    for pragma in READ_PRAGMAS:
+        conn.execute(pragma)
+    register_search_functions(conn)
+    return conn
+
+
+def get_read_connection(db_path="reports.db"):
+    """
+    Returns this thread's warm read-only connection to db_path.
+
+    Connections are opened once per (thread, database) and kept open while
+    the thread lives, so everything a thread runs reuses the page cache,
+    memory map and prepared statements. They are closed when the thread
+    exits. Callers must not close them.
+    """
+    if getattr(_local, "generation", None) != _generation:
+        _local.holder = _ThreadConnections()
+        _local.generation = _generation
+    connections = _local.holder.connections
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = _open_read_connection(db_path)
+        connections[db_path] = conn
+    return conn
+
+
+def open_connection_count():
+    """
+    Number of pooled connections currently open, across all threads
+    """
+    with _lock:
+        return sum(len(c) for c in _open_connections.values())
+
+
+def close_all_connections():
+    """
+    Closes every pooled connection (e.g. after the database file was replaced).
+    Threads open fresh connections on their next get_read_connection call.
+    """
+    global _generation
+    with _lock:
+        connections = []
+        for conns in _open_connections.values():
+            connections += conns.values()
+            conns.clear()
+        _generation += 1
+    _close(connections)
@@ -0,0 +1,281 @@
+import atexit
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from ingest import create_index, index_name_for, quote_identifier
+from query_guard import full_scans, query_budget
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_TABLE = "_query_log"
+
+# Queries from the log that the advisor looks at, most frequent first
+ADVISOR_QUERY_LIMIT = 50
+
+# Most recent executed queries kept in the log; older ones are deleted as
+# new ones are written
+QUERY_LOG_MAX_ROWS = 10_000
+
+# Executed queries are buffered and written in one transaction once this
+# many are pending or the oldest pending one is this many seconds old
+QUERY_LOG_FLUSH_ROWS = 20
+QUERY_LOG_FLUSH_SECONDS = 30.0
+
+# db_path -> buffered (sql, executed_at, duration_ms, row_count) rows
+_pending_queries = {}
+# db_path -> the connection that writes the log, reused across flushes
+_log_writers = {}
+_log_lock = threading.Lock()
+
+
+def ensure_query_log_table(conn):
+    conn.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS {QUERY_LOG_TABLE} (
+        sql TEXT NOT NULL,
+        executed_at REAL NOT NULL,
+        duration_ms REAL NOT NULL,
+        row_count INTEGER
+    )
+    """
+    )
+
+
+def log_executed_query(sql, duration_ms, row_count, db_path="reports.db"):
+    """
+    Appends an executed (sanitized) query to the query log used by the
+    advisor. Queries are buffered; see flush_query_log.
+    """
+    now = time.time()
+    with _log_lock:
+        pending = _pending_queries.setdefault(db_path, [])
+        pending.append((sql, now, duration_ms, row_count))
+        flush = (
+            len(pending) >= QUERY_LOG_FLUSH_ROWS
+            or now - pending[0][1] >= QUERY_LOG_FLUSH_SECONDS
+        )
+    if flush:
+        flush_query_log(db_path)
+
+
+def flush_query_log(db_path="reports.db"):
+    """
+    Writes the buffered queries of db_path in one transaction and trims the
+    log to its QUERY_LOG_MAX_ROWS most recent rows
+    """
+    with _log_lock:
+        pending = _pending_queries.pop(db_path, [])
+        if not pending:
+            return
+        conn = _log_writers.get(db_path)
+        try:
+            if conn is None:
+                # Only used under _log_lock, from whichever thread flushes
+                conn = sqlite3.connect(db_path, timeout=1.0, check_same_thread=False)
+                ensure_query_log_table(conn)
+                _log_writers[db_path] = conn
+            conn.executemany(
+                f"INSERT INTO {QUERY_LOG_TABLE} VALUES (?, ?, ?, ?)", pending
+            )
+            conn.execute(
+                f"DELETE FROM {QUERY_LOG_TABLE} WHERE rowid <= "
+                f"(SELECT MAX(rowid) FROM {QUERY_LOG_TABLE}) - ?",
+                (QUERY_LOG_MAX_ROWS,),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            # Logging must never break query execution; the batch is dropped
+            logger.warning("Query log error, %d queries dropped: %s", len(pending), e)
+            if conn is not None:
+                conn.close()
+            _log_writers.pop(db_path, None)
+
+
+@atexit.register
+def flush_all_query_logs():
+    for db_path in list(_pending_queries):
+        flush_query_log(db_path)
+
+
+def read_logged_queries(conn, limit=ADVISOR_QUERY_LIMIT):
+    """
+    Returns [(sql, executions)] of the most frequently executed logged queries
+    """
+    ensure_query_log_table(conn)
+    cursor = conn.execute(
+        f"""
+    SELECT sql, COUNT(*) AS executions FROM {QUERY_LOG_TABLE}
+    GROUP BY sql ORDER BY executions DESC LIMIT ?
+    """,
+        (limit,),
+    )
+    return cursor.fetchall()
+
+
+def scanned_tables(conn, sql):
+    """
+    Runs EXPLAIN QUERY PLAN and returns the tables read by a full scan; for
+    a view that is the table it reads (report_rows for the report views in
+    shared storage), where its indexes go
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [stored for _, _, stored in full_scans(conn, sql, plan)]
+
+
+def indexed_columns(conn, table_name):
+    """
+    Returns the set of columns that lead an existing index on the table
+    """
+    columns = set()
+    for index in conn.execute(
+        f"PRAGMA index_list({quote_identifier(table_name)})"
+    ).fetchall():
+        info = conn.execute(
+            f"PRAGMA index_info({quote_identifier(index[1])})"
+        ).fetchall()
+        if info:
+            columns.add(info[0][2])
+    return columns
+
+
+def filtered_columns(conn, table_name, sql):
+    """
+    Returns the table's columns that the query compares, joins or groups on
+    """
+    columns = [
+        row[1]
+        for row in conn.execute(
+            f"PRAGMA table_info({quote_identifier(table_name)})"
+        ).fetchall()
+    ]
+    group_by = re.search(r"GROUP BY(.*?)(ORDER BY|LIMIT|HAVING|$)", sql, re.I | re.S)
+    found = []
+    for column in columns:
+        pattern = r"(?:\"{quoted}\"|(?<![\w\"]){bare}(?![\w\"]))".format(
+            quoted=re.escape(column.replace('"', '""')), bare=re.escape(column)
+        )
+        compared = re.search(
+            pattern + r"\s*(?:=|<|>|!=|\bBETWEEN\b|\bIN\b|\bLIKE\s+'[^%])",
+            sql,
+            re.I,
+        )
+        grouped = group_by and re.search(pattern, group_by.group(1))
+        if compared or grouped:
+            found.append(column)
+    return found
+
+
+def time_query(conn, sql):
+    """
+    Milliseconds the query takes, or None when it exceeds the query budget
+    (query_guard.query_budget), so a heavy logged query cannot run unbounded
+    """
+    start = time.perf_counter()
+    with query_budget(conn) as budget:
+        try:
+            conn.execute(sql).fetchall()
+        except sqlite3.OperationalError:
+            if budget["exceeded"] is None:
+                raise
+            logger.warning(
+                "Not timing a query over the %s budget: %s", budget["exceeded"], sql
+            )
+            return None
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def time_queries(conn, queries):
+    """
+    Total milliseconds of the queries, or None when any exceeds the budget
+    """
+    timings = [time_query(conn, sql) for sql in queries]
+    return None if None in timings else round(sum(timings), 2)
+
+
+def advise_indexes(db_path="reports.db", create=False, limit=ADVISOR_QUERY_LIMIT):
+    """
+    Proposes (and optionally creates) single-column indexes for logged queries.
+
+    Every frequently executed query is run through EXPLAIN QUERY PLAN; for
+    each fully scanned table, the columns the query filters, joins or groups
+    on that do not already lead an index become candidates. With create=True
+    each candidate is built, the affected queries are timed before and
+    after (None when a query exceeds the query budget), and the index is
+    dropped again if the planner does not use it.
+    Returns a list of report dicts, one per candidate index.
+    """
+    flush_query_log(db_path)
+    conn = sqlite3.connect(db_path)
+    report = []
+    try:
+        candidates = {}
+        for sql, executions in read_logged_queries(conn, limit):
+            try:
+                tables = scanned_tables(conn, sql)
+            except sqlite3.Error:
+                continue  # e.g. the query references a column that no longer exists
+            for table_name in tables:
+                existing = indexed_columns(conn, table_name)
+                for column in filtered_columns(conn, table_name, sql):
+                    if column in existing:
+                        continue
+                    entry = candidates.setdefault(
+                        (table_name, column), {"queries": [], "executions": 0}
+                    )
+                    entry["queries"].append(sql)
+                    entry["executions"] += executions
+
+        ranked = sorted(candidates.items(), key=lambda item: -item[1]["executions"])
+        for (table_name, column), entry in ranked:
+            item = {
+                "table": table_name,
+                "column": column,
+                "index": index_name_for(table_name, column),
+                "executions": entry["executions"],
+                "queries": len(entry["queries"]),
+            }
+            if create:
+                before = time_queries(conn, entry["queries"])
+                create_index(conn, table_name, column)
+                conn.commit()
+                after = time_queries(conn, entry["queries"])
+                still_scanning = all(
+                    table_name in scanned_tables(conn, sql) for sql in entry["queries"]
+                )
+                if still_scanning:
+                    conn.execute(f"DROP INDEX {quote_identifier(item['index'])}")
+                    conn.commit()
+                item.update(
+                    {
+                        "before_ms": before,
+                        "after_ms": after,
+                        "created": not still_scanning,
+                    }
+                )
+            report.append(item)
+    finally:
+        conn.close()
+
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(
+        description="Propose indexes for the queries in the query log"
+    )
+    parser.add_argument("--db", default="reports.db")
+    parser.add_argument(
+        "--create", action="store_true", help="create the proposed indexes"
+    )
+    args = parser.parse_args()
+    print(
+        json.dumps(
+            advise_indexes(args.db, create=args.create), ensure_ascii=False, indent=2
+        )
+    )
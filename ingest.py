@@ -0,0 +1,1181 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from columnar_cache import COLUMNAR_CACHE_DIR, source_chunks
+from text_search import refresh_text_index
+
+# Source CSV file for each table in the reports database
+SOURCE_FILES = {
+    "enforcement": "אכיפה.csv",
+    "financial_transactions": "תנועות כספיות.csv",
+    "address_database": "מאגר כתובות.csv",
+    "report_data": "דטא דוחות.csv",
+}
+
+# Tables that get a date_formatted column (copy of תאריך) for date queries
+DATE_QUERY_TABLES = ["enforcement", "report_data"]
+
+# Bump when the generated table layout changes so existing databases are rebuilt
+SCHEMA_VERSION = 7
+
+MANIFEST_TABLE = "_build_manifest"
+
+# Storage of the two report tables: "separate" keeps each as a full table;
+# "shared" stores rows found in both sources once, in REPORT_ROWS_TABLE, and
+# exposes enforcement and report_data as views over it. "shared" is opt-in
+# (the report_storage setting, benchmark.py --report-storage shared)
+REPORT_STORAGE_MODES = ["separate", "shared"]
+DEFAULT_REPORT_STORAGE = "separate"
+
+REPORT_ROWS_TABLE = "report_rows"
+
+# Bit of each report table in report_rows.source_mask
+REPORT_SOURCE_BITS = {"enforcement": 1, "report_data": 2}
+
+# Columns only one report table has; kept in its "<table>_extra" side table,
+# keyed by report_rows.row_id
+REPORT_EXTRA_COLUMNS = {"enforcement": [], "report_data": ["הערות לדוח"]}
+
+# Staged report rows carry a 64-bit hash of their shared columns, the join
+# key for finding the rows present in both sources (their values are then
+# compared as well)
+ROW_HASH_COLUMN = "row_hash"
+
+# Rows that fail type conversion are kept here instead of the data tables
+QUARANTINE_TABLE = "_quarantine"
+
+# Only an unparseable key column or date quarantines a row; any other value
+# that fails to convert (a number, a new flag spelling) is stored as NULL
+KEY_COLUMNS = ["מס' דו''ח"]
+
+# Column kinds used at ingest: "integer", "real", "date" (stored as
+# YYYY-MM-DD text), "flag" (stored as 0/1). Unlisted columns are TEXT.
+REPORT_COLUMN_TYPES = {
+    "מס' דו''ח": "integer",
+    "תאריך": "date",
+    "קוד פקח": "integer",
+    "קוד רחוב": "integer",
+    "נכה": "flag",
+    "מבוקש": "flag",
+    "תאריך קובע": "date",
+    "לתשלום עד": "date",
+    "קנס": "real",
+    "שולם": "real",
+    "לתשלום": "real",
+    "תאריך תשלום": "date",
+    "ערעור מתאריך": "date",
+    "הסבה מתאריך": "date",
+}
+
+COLUMN_TYPES = {
+    "enforcement": REPORT_COLUMN_TYPES,
+    "report_data": REPORT_COLUMN_TYPES,
+    "financial_transactions": {
+        "מס' דו''ח": "integer",
+        "תאריך": "date",
+        "ת.תשלום": "date",
+        "חיוב": "real",
+        "זיכוי": "real",
+        "ת. פירעון": "date",
+    },
+    "address_database": {
+        "מס' דו''ח": "integer",
+        "תאריך": "date",
+    },
+}
+
+SQLITE_TYPES = {
+    "integer": "INTEGER",
+    "real": "REAL",
+    "date": "TEXT",
+    "flag": "INTEGER",
+    "text": "TEXT",
+}
+
+# Source date format (DD/MM/YYYY); trailing time parts are ignored
+SOURCE_DATE_FORMAT = "%d/%m/%Y"
+
+# Every date column X also gets an integer "X_day" column (days since 1970-01-01)
+DAY_COLUMN_SUFFIX = "_day"
+
+# Columns X that also get a 0/1 "X_flag" column: "present" flags any value
+# other than empty or a FLAG_FALSE_VALUES word (ננעל/נגרר holds the action
+# taken, not yes/no); "paid" flags a payment that covers a positive fine
+# (קנס), and is NULL when the fine is unknown
+FLAG_COLUMN_SUFFIX = "_flag"
+DERIVED_FLAG_COLUMNS = {
+    "enforcement": {"ננעל/נגרר": "present", "שולם": "paid"},
+    "report_data": {"ננעל/נגרר": "present", "שולם": "paid"},
+}
+
+# 0/1 flag columns of the report tables (source flags and derived ones)
+REPORT_FLAG_COLUMNS = ["נכה", "מבוקש", "ננעל/נגרר_flag", "שולם_flag"]
+
+# Date columns used in range filters, indexed after each load
+DATE_INDEX_COLUMNS = {
+    "enforcement": ["date_formatted", "תאריך_day", "תאריך תשלום_day"],
+    "report_data": ["date_formatted", "תאריך_day", "תאריך תשלום_day"],
+    REPORT_ROWS_TABLE: ["date_formatted", "תאריך_day", "תאריך תשלום_day"],
+    "financial_transactions": ["תאריך_day", "ת.תשלום_day"],
+}
+
+# Join keys and common filter columns, indexed after each load
+DEFAULT_INDEX_COLUMNS = {
+    "enforcement": ["מס' דו''ח", "שם פקח", "קוד רחוב", "עבירה"] + REPORT_FLAG_COLUMNS,
+    "report_data": ["מס' דו''ח", "שם פקח", "קוד רחוב", "עבירה"] + REPORT_FLAG_COLUMNS,
+    REPORT_ROWS_TABLE: ["מס' דו''ח", "שם פקח", "קוד רחוב", "עבירה", "source_mask"]
+    + REPORT_FLAG_COLUMNS,
+    "financial_transactions": ["מס' דו''ח"],
+    "address_database": ["מס' דו''ח"],
+}
+
+# Month key (YYYY-MM) of an ISO date column
+MONTH_OF_DATE = "substr({column}, 1, 7)"
+
+# Rollup tables for the Data Analysis tab: name -> (source table, SELECT that
+# fills it). A rollup is rebuilt only when its source table was rebuilt (or it
+# is missing), so unchanged sources never cost a rescan.
+ROLLUP_TABLES = {
+    "rollup_inspector_month": (
+        "enforcement",
+        f"""
+    SELECT {MONTH_OF_DATE.format(column="date_formatted")} AS month,
+           "שם פקח" AS inspector,
+           COUNT(*) AS report_count,
+           COALESCE(SUM(קנס), 0) AS fine_total,
+           COALESCE(SUM(שולם), 0) AS paid_total
+    FROM enforcement
+    WHERE date_formatted IS NOT NULL
+    GROUP BY month, inspector
+    """,
+    ),
+    "rollup_area_month": (
+        "enforcement",
+        f"""
+    SELECT {MONTH_OF_DATE.format(column="date_formatted")} AS month,
+           "אזור פיקוח" AS supervision_area,
+           "אזור חניה" AS parking_area,
+           COUNT(*) AS report_count,
+           COALESCE(SUM(קנס), 0) AS fine_total,
+           COALESCE(SUM(שולם), 0) AS paid_total
+    FROM enforcement
+    WHERE date_formatted IS NOT NULL
+    GROUP BY month, supervision_area, parking_area
+    """,
+    ),
+    "rollup_payments_month": (
+        "financial_transactions",
+        f"""
+    SELECT {MONTH_OF_DATE.format(column='COALESCE("ת.תשלום", תאריך)')} AS month,
+           COUNT(*) AS transaction_count,
+           COUNT(DISTINCT "מס' דו''ח") AS report_count,
+           COALESCE(SUM(חיוב), 0) AS charge_total,
+           COALESCE(SUM(זיכוי), 0) AS credit_total
+    FROM financial_transactions
+    WHERE COALESCE("ת.תשלום", תאריך) IS NOT NULL
+    GROUP BY month
+    """,
+    ),
+    "rollup_flags_month": (
+        "enforcement",
+        f"""
+    SELECT {MONTH_OF_DATE.format(column="date_formatted")} AS month,
+           COUNT(*) AS report_count,
+           COALESCE(SUM(נכה), 0) AS disabled_count,
+           COALESCE(SUM(מבוקש), 0) AS wanted_count,
+           COALESCE(SUM("ננעל/נגרר_flag"), 0) AS locked_towed_count,
+           COALESCE(SUM("שולם_flag"), 0) AS paid_count
+    FROM enforcement
+    WHERE date_formatted IS NOT NULL
+    GROUP BY month
+    """,
+    ),
+}
+
+FLAG_TRUE_VALUES = {"כן", "yes", "y", "true", "1", "1.0", "v", "x"}
+FLAG_FALSE_VALUES = {"לא", "no", "n", "false", "0", "0.0"}
+
+# Rows read from a CSV and written to SQLite per chunk; bounds peak memory
+CHUNK_ROWS = 50_000
+
+# Pragmas applied while bulk loading; synchronous is restored afterwards
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",  # 256 MB
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Staging databases are throwaway, so they skip journaling entirely
+STAGING_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -131072",  # 128 MB
+    "PRAGMA temp_store = MEMORY",
+]
+
+
+def quote_identifier(name):
+    """
+    Quotes a table or column name for SQLite (Hebrew names often contain quotes)
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def column_kind(table_name, column):
+    return COLUMN_TYPES.get(table_name, {}).get(column, "text")
+
+
+def convert_column(values, kind):
+    """
+    Converts one raw (string) column to its ingest kind.
+
+    Returns (converted series, boolean mask of values that failed to convert).
+    Failed values are NULL. Empty cells become NULL and never count as
+    failures (flags become 0).
+    """
+    present = values.notna() & (values.str.strip() != "")
+
+    if kind in ("integer", "real"):
+        cleaned = values.str.replace(r"[,\s₪]", "", regex=True)
+        numbers = pd.to_numeric(cleaned.where(present), errors="coerce")
+        failed = present & numbers.isna()
+        if kind == "integer":
+            fractional = numbers.notna() & (numbers % 1 != 0)
+            failed |= fractional
+            numbers = numbers.where(~fractional).astype("Int64")
+        return numbers, failed
+
+    if kind == "date":
+        # Parsed datetimes; convert_chunk derives the ISO text and day number
+        parsed = pd.to_datetime(
+            values.where(present), format=SOURCE_DATE_FORMAT, exact=False, errors="coerce"
+        )
+        return parsed, present & parsed.isna()
+
+    if kind == "flag":
+        normalized = values.str.strip().str.lower()
+        is_true = normalized.isin(FLAG_TRUE_VALUES)
+        is_false = ~present | normalized.isin(FLAG_FALSE_VALUES)
+        failed = ~(is_true | is_false)
+        return is_true.astype("Int64").mask(failed), failed
+
+    return values, pd.Series(False, index=values.index)
+
+
+def derived_flag(chunk, converted, column, rule):
+    """
+    Computes the "X_flag" column of a DERIVED_FLAG_COLUMNS entry from the raw
+    chunk and the already converted columns
+    """
+    if rule == "present":
+        normalized = chunk[column].str.strip().str.lower()
+        present = normalized.notna() & (normalized != "")
+        return (present & ~normalized.isin(FLAG_FALSE_VALUES)).astype("int64")
+    if rule == "paid":
+        paid = converted[column].fillna(0)
+        fine = converted.get("קנס", pd.Series(float("nan"), index=chunk.index))
+        flag = ((fine > 0) & (paid >= fine)).astype("Int64")
+        return flag.mask(fine.isna())
+    raise ValueError(f"Unknown flag rule: {rule}")
+
+
+def convert_chunk(table_name, chunk, row_hash=False):
+    """
+    Applies the table's column type map to a chunk read as strings.
+
+    Returns (converted DataFrame, Series of failing key and date column
+    names per row, empty string for rows to keep). With row_hash, a report
+    table's rows also get the ROW_HASH_COLUMN used by shared storage.
+    """
+    converted = {}
+    day_columns = {}
+    failures = pd.Series("", index=chunk.index)
+    for column in chunk.columns:
+        kind = column_kind(table_name, column)
+        values, failed = convert_column(chunk[column], kind)
+        if kind == "date":
+            day_columns[column + DAY_COLUMN_SUFFIX] = (
+                values - pd.Timestamp("1970-01-01")
+            ).dt.days.astype("Int64")
+            values = values.dt.strftime("%Y-%m-%d")
+        converted[column] = values
+        if (kind == "date" or column in KEY_COLUMNS) and failed.any():
+            failures = failures.where(~failed, failures + column + ";")
+
+    # Derived columns go after the source columns, in table_columns order
+    converted.update(day_columns)
+    if table_name in DATE_QUERY_TABLES:
+        converted["date_formatted"] = converted["תאריך"]
+    for column, rule in DERIVED_FLAG_COLUMNS.get(table_name, {}).items():
+        if column in chunk.columns:
+            converted[column + FLAG_COLUMN_SUFFIX] = derived_flag(
+                chunk, converted, column, rule
+            )
+    frame = pd.DataFrame(converted, index=chunk.index)
+    if row_hash:
+        # Sorted by name, so both sources hash their columns in the same order
+        shared = sorted(
+            c for c in frame.columns if c not in REPORT_EXTRA_COLUMNS.get(table_name, [])
+        )
+        hashes = pd.util.hash_pandas_object(frame[shared], index=False)
+        frame[ROW_HASH_COLUMN] = hashes.to_numpy().view("int64")
+    return frame, failures.str.rstrip(";")
+
+
+def table_columns(table_name, csv_columns, row_hash=False):
+    """
+    Returns [(column, SQLite type)] for a table: the CSV columns followed by
+    the derived day-number columns, date_formatted, the derived flag columns
+    and (with row_hash) the row hash, matching convert_chunk
+    """
+    columns = [
+        (column, SQLITE_TYPES[column_kind(table_name, column)]) for column in csv_columns
+    ]
+    columns += [
+        (column + DAY_COLUMN_SUFFIX, "INTEGER")
+        for column in csv_columns
+        if column_kind(table_name, column) == "date"
+    ]
+    if table_name in DATE_QUERY_TABLES:
+        columns.append(("date_formatted", "TEXT"))
+    columns += [
+        (column + FLAG_COLUMN_SUFFIX, "INTEGER")
+        for column in DERIVED_FLAG_COLUMNS.get(table_name, {})
+        if column in csv_columns
+    ]
+    if row_hash:
+        columns.append((ROW_HASH_COLUMN, "INTEGER"))
+    return columns
+
+
+def ensure_quarantine_table(conn):
+    conn.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS {QUARANTINE_TABLE} (
+        table_name TEXT NOT NULL,
+        line_number INTEGER NOT NULL,
+        failed_columns TEXT NOT NULL,
+        raw_row TEXT NOT NULL
+    )
+    """
+    )
+
+
+def file_fingerprint(path, with_hash=True):
+    """
+    Returns the size, mtime and (optionally) sha256 content hash of a source file
+    """
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": None}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+def ensure_manifest_table(conn):
+    conn.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+        table_name TEXT PRIMARY KEY,
+        source_file TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        sha256 TEXT NOT NULL,
+        built_at REAL NOT NULL
+    )
+    """
+    )
+
+
+def read_manifest(conn):
+    """
+    Returns the stored manifest as {table_name: row dict}
+    """
+    ensure_manifest_table(conn)
+    cursor = conn.execute(
+        f"SELECT table_name, source_file, size, mtime, sha256, built_at FROM {MANIFEST_TABLE}"
+    )
+    return {
+        row[0]: {
+            "source_file": row[1],
+            "size": row[2],
+            "mtime": row[3],
+            "sha256": row[4],
+            "built_at": row[5],
+        }
+        for row in cursor.fetchall()
+    }
+
+
+def write_manifest_entry(conn, table_name, source_file, fingerprint):
+    conn.execute(
+        f"""
+    INSERT OR REPLACE INTO {MANIFEST_TABLE}
+        (table_name, source_file, size, mtime, sha256, built_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """,
+        (
+            table_name,
+            source_file,
+            fingerprint["size"],
+            fingerprint["mtime"],
+            fingerprint["sha256"],
+            time.time(),
+        ),
+    )
+
+
+def data_version(conn):
+    """
+    Returns a string identifying the current build of the database.
+
+    It changes whenever any table is rebuilt from a different source file
+    or the table layout changes, so it can be used to invalidate caches.
+    """
+    try:
+        rows = conn.execute(
+            f"SELECT table_name, sha256 FROM {MANIFEST_TABLE} ORDER BY table_name"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    digest = hashlib.sha256(repr((user_version, rows)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def object_type(conn, name):
+    """
+    Returns "table" or "view" for an existing table or view, else None
+    """
+    row = conn.execute(
+        "SELECT type FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+        (name,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def table_exists(conn, table_name):
+    cursor = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+        (table_name,),
+    )
+    return cursor.fetchone() is not None
+
+
+def find_stale_tables(
+    conn, source_files=None, source_dir=".", report_storage=DEFAULT_REPORT_STORAGE
+):
+    """
+    Compares the source files against the build manifest.
+
+    Returns ({table_name: fingerprint} of tables that must be rebuilt,
+    {table_name: fingerprint} of unchanged tables whose mtime moved).
+    Size and mtime are checked first; the content hash is computed only
+    when they differ, so a touched-but-identical file is not reloaded.
+    A database built with another SCHEMA_VERSION is treated as empty.
+    Report tables stored in another storage mode are rebuilt, and in shared
+    storage both report tables are rebuilt when either one is.
+    """
+    source_files = source_files or SOURCE_FILES
+    manifest = read_manifest(conn)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # Built by an older layout: every table has to be regenerated
+        manifest = {}
+    stale = {}
+    touched = {}
+
+    for table_name, source_file in source_files.items():
+        path = os.path.join(source_dir, source_file)
+        entry = manifest.get(table_name)
+
+        if entry is None or not table_exists(conn, table_name):
+            stale[table_name] = file_fingerprint(path)
+            continue
+
+        fingerprint = file_fingerprint(path, with_hash=False)
+        if (
+            fingerprint["size"] == entry["size"]
+            and fingerprint["mtime"] == entry["mtime"]
+        ):
+            continue
+
+        fingerprint = file_fingerprint(path)
+        if fingerprint["sha256"] == entry["sha256"]:
+            touched[table_name] = fingerprint
+        else:
+            stale[table_name] = fingerprint
+
+    report_tables = [t for t in REPORT_SOURCE_BITS if t in source_files]
+    expected_type = "view" if report_storage == "shared" else "table"
+    rebuild = [
+        t for t in report_tables if t in stale or object_type(conn, t) != expected_type
+    ]
+    if report_storage == "shared" and rebuild:
+        rebuild = report_tables
+    for table_name in rebuild:
+        if table_name not in stale:
+            touched.pop(table_name, None)
+            stale[table_name] = file_fingerprint(
+                os.path.join(source_dir, source_files[table_name])
+            )
+
+    return stale, touched
+
+
+def index_name_for(table_name, column):
+    """
+    Builds the index name for a single-column index, e.g. idx_enforcement_שם_פקח
+    """
+    suffix = "date" if column == "date_formatted" else column
+    suffix = re.sub(r"[\s'\"/.]+", "_", suffix).strip("_")
+    return f"idx_{table_name}_{suffix}"
+
+
+def create_index(conn, table_name, column):
+    index_name = index_name_for(table_name, column)
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {quote_identifier(index_name)} "
+        f"ON {quote_identifier(table_name)} ({quote_identifier(column)})"
+    )
+    return index_name
+
+
+def create_default_indexes(db_path="reports.db", tables=None):
+    """
+    Creates the join-key and filter indexes in DEFAULT_INDEX_COLUMNS
+    """
+    tables = DEFAULT_INDEX_COLUMNS if tables is None else tables
+    conn = sqlite3.connect(db_path)
+    try:
+        for table_name in tables:
+            # Views (report tables in shared storage) are indexed via report_rows
+            if object_type(conn, table_name) != "table":
+                continue
+            for column in DEFAULT_INDEX_COLUMNS.get(table_name, []):
+                create_index(conn, table_name, column)
+        conn.execute("ANALYZE")
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def prepare_database_for_date_queries(db_path="reports.db", tables=None):
+    """
+    Indexes the date columns used in range filters.
+
+    Dates are normalized at ingest (ISO text, X_day day numbers and
+    date_formatted), so this only has to build the indexes after a load.
+    """
+    tables = DATE_INDEX_COLUMNS if tables is None else tables
+    conn = sqlite3.connect(db_path)
+    try:
+        for table_name in tables:
+            if object_type(conn, table_name) != "table":
+                continue
+            for column in DATE_INDEX_COLUMNS.get(table_name, []):
+                create_index(conn, table_name, column)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def build_rollup(conn, rollup_name):
+    """
+    Recreates one rollup table from its source table in a single transaction
+    """
+    source_table, select_sql = ROLLUP_TABLES[rollup_name]
+    start = time.perf_counter()
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {rollup_name}")
+        conn.execute(f"CREATE TABLE {rollup_name} AS {select_sql}")
+        conn.execute(f"CREATE INDEX idx_{rollup_name}_month ON {rollup_name} (month)")
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = isolation_level
+
+    rows = conn.execute(f"SELECT COUNT(*) FROM {rollup_name}").fetchone()[0]
+    seconds = round(time.perf_counter() - start, 3)
+    print(f"Built {rollup_name} from {source_table}: {rows:,} rows in {seconds}s")
+    return rows
+
+
+def refresh_rollups(db_path="reports.db", tables=None):
+    """
+    Rebuilds the rollups of the given (just rebuilt) source tables, plus any
+    rollup that does not exist yet. Returns the names of the rebuilt rollups.
+    """
+    tables = set(tables or [])
+    refreshed = []
+    conn = sqlite3.connect(db_path)
+    try:
+        for rollup_name, (source_table, _) in ROLLUP_TABLES.items():
+            if not table_exists(conn, source_table):
+                continue
+            if source_table in tables or not table_exists(conn, rollup_name):
+                build_rollup(conn, rollup_name)
+                refreshed.append(rollup_name)
+        if refreshed:
+            conn.execute("ANALYZE")
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Rollup error: {e}")
+    finally:
+        conn.close()
+    return refreshed
+
+
+def ingest_csv_chunked(
+    conn,
+    table_name,
+    csv_path,
+    chunksize=CHUNK_ROWS,
+    cache_dir=None,
+    sha256=None,
+    row_hash=False,
+):
+    """
+    Streams a CSV file into a SQLite table in fixed-size chunks.
+
+    The table is dropped and recreated with the declared types from
+    COLUMN_TYPES, and every chunk is converted and written with executemany
+    inside a single transaction, so memory stays bounded by the chunk size
+    regardless of the file size. Rows that fail conversion go to the
+    quarantine table instead. Indexes are built afterwards by the caller.
+    With cache_dir and the CSV's sha256 the chunks come from (or are saved
+    to) the columnar cache instead of being parsed from the CSV each time.
+    With row_hash the rows get the row hash column, for staging a report
+    table in shared storage.
+    Returns {"rows", "quarantined", "seconds", "rows_per_sec", "source"}.
+    """
+    table = quote_identifier(table_name)
+    start = time.perf_counter()
+    rows = 0
+    quarantined = 0
+    insert_sql = None
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        ensure_quarantine_table(conn)
+        conn.execute(
+            f"DELETE FROM {QUARANTINE_TABLE} WHERE table_name = ?", (table_name,)
+        )
+        chunks, source = source_chunks(
+            table_name, csv_path, chunksize, cache_dir=cache_dir, sha256=sha256
+        )
+        for chunk in chunks:
+            if insert_sql is None:
+                columns = table_columns(table_name, chunk.columns, row_hash)
+                column_defs = ", ".join(
+                    f"{quote_identifier(col)} {col_type}" for col, col_type in columns
+                )
+                conn.execute(f"CREATE TABLE {table} ({column_defs})")
+                placeholders = ", ".join("?" * len(columns))
+                insert_sql = f"INSERT INTO {table} VALUES ({placeholders})"
+
+            converted, failures = convert_chunk(table_name, chunk, row_hash)
+            bad = failures != ""
+            if bad.any():
+                # Header is line 1, so data row i is on line i + 2
+                conn.executemany(
+                    f"INSERT INTO {QUARANTINE_TABLE} VALUES (?, ?, ?, ?)",
+                    (
+                        (
+                            table_name,
+                            int(index) + 2,
+                            failures[index],
+                            json.dumps(raw.dropna().to_dict(), ensure_ascii=False),
+                        )
+                        for index, raw in chunk[bad].iterrows()
+                    ),
+                )
+                quarantined += int(bad.sum())
+                converted = converted[~bad]
+
+            converted = converted.astype(object).where(converted.notna(), None)
+            conn.executemany(insert_sql, converted.itertuples(index=False, name=None))
+            rows += len(converted)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = isolation_level
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "rows": rows,
+        "quarantined": quarantined,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds) if seconds > 0 else rows,
+        "source": source,
+    }
+    print(
+        f"Ingested {rows:,} rows into {table_name} from {source} in "
+        f"{stats['seconds']}s ({stats['rows_per_sec']:,} rows/sec, "
+        f"{quarantined:,} quarantined)"
+    )
+    return stats
+
+
+def ingest_table_to_staging(
+    table_name, csv_path, staging_path, cache_dir=None, sha256=None, row_hash=False
+):
+    """
+    Process pool worker: parses one CSV into its own staging database
+    """
+    conn = sqlite3.connect(staging_path)
+    try:
+        for pragma in STAGING_PRAGMAS:
+            conn.execute(pragma)
+        return ingest_csv_chunked(
+            conn,
+            table_name,
+            csv_path,
+            cache_dir=cache_dir,
+            sha256=sha256,
+            row_hash=row_hash,
+        )
+    finally:
+        conn.close()
+
+
+def extra_table_name(table_name):
+    return f"{table_name}_extra"
+
+
+def storage_tables(tables, report_storage=DEFAULT_REPORT_STORAGE):
+    """
+    The stored tables behind the given table names: in shared storage the
+    report tables are views over report_rows
+    """
+    if report_storage != "shared":
+        return list(tables)
+    stored = [t for t in tables if t not in REPORT_SOURCE_BITS]
+    if len(stored) < len(tables):
+        stored.append(REPORT_ROWS_TABLE)
+    return stored
+
+
+def reset_report_storage(conn, tables, report_storage=DEFAULT_REPORT_STORAGE):
+    """
+    Drops the views of the report tables about to be rebuilt (and, for shared
+    storage, their tables), plus report_rows and its side tables once every
+    report table is being rebuilt
+    """
+    for table_name in REPORT_SOURCE_BITS:
+        kind = object_type(conn, table_name)
+        if kind is None or table_name not in tables:
+            continue
+        if kind == "view" or report_storage == "shared":
+            conn.execute(f"DROP {kind.upper()} {quote_identifier(table_name)}")
+    if all(t in tables for t in REPORT_SOURCE_BITS):
+        conn.execute(f"DROP TABLE IF EXISTS {REPORT_ROWS_TABLE}")
+        for table_name in REPORT_SOURCE_BITS:
+            conn.execute(f"DROP TABLE IF EXISTS {extra_table_name(table_name)}")
+    conn.commit()
+
+
+def create_report_view(conn, table_name, columns):
+    """
+    Creates a report table's view over report_rows and its side table, with
+    the columns in the order of the source table
+    """
+    extra = REPORT_EXTRA_COLUMNS[table_name]
+    bit = REPORT_SOURCE_BITS[table_name]
+    masks = [m for m in range(1, 2 ** len(REPORT_SOURCE_BITS)) if m & bit]
+    select = ", ".join(
+        ("x." if c in extra else "r.") + quote_identifier(c) + " AS " + quote_identifier(c)
+        for c in columns
+    )
+    join = ""
+    if extra:
+        join = f" LEFT JOIN {extra_table_name(table_name)} AS x ON x.row_id = r.row_id"
+    conn.execute(
+        f"CREATE VIEW {quote_identifier(table_name)} AS SELECT {select} "
+        f"FROM {REPORT_ROWS_TABLE} AS r{join} "
+        f"WHERE r.source_mask IN ({', '.join(map(str, masks))})"
+    )
+
+
+def merge_report_rows(conn, table_name, schema="staging"):
+    """
+    Adds a report table's staged rows (schema.table_name, with row hashes)
+    to report_rows and creates the table's view. Runs inside the caller's
+    transaction, on a report_rows reset for this build.
+
+    A staged row whose shared columns are equal (IS) to a row stored for
+    the other report table is not stored again; that row's source_mask
+    gains this table's bit instead. The row hash only narrows the search.
+    Rows pair one to one, so duplicate rows keep their multiplicity. Extra columns go to the table's side table.
+    """
+    bit = REPORT_SOURCE_BITS[table_name]
+    extra = REPORT_EXTRA_COLUMNS[table_name]
+    staged = f"{schema}.{quote_identifier(table_name)}"
+    columns = [
+        (row[1], row[2])
+        for row in conn.execute(f"PRAGMA {schema}.table_info({quote_identifier(table_name)})")
+        if row[1] != ROW_HASH_COLUMN
+    ]
+    shared = [(c, t) for c, t in columns if c not in extra]
+
+    if not table_exists(conn, REPORT_ROWS_TABLE):
+        column_defs = ", ".join(f"{quote_identifier(c)} {t}" for c, t in shared)
+        conn.execute(
+            f"CREATE TABLE {REPORT_ROWS_TABLE} (row_id INTEGER PRIMARY KEY, "
+            f"source_mask INTEGER NOT NULL, {ROW_HASH_COLUMN} INTEGER NOT NULL, "
+            f"{column_defs})"
+        )
+    stored = {row[1] for row in conn.execute(f"PRAGMA main.table_info({REPORT_ROWS_TABLE})")}
+    missing = [c for c, _ in shared if c not in stored]
+    if missing:
+        raise ValueError(
+            f"{table_name} has columns the other report table lacks "
+            f"({', '.join(missing)}); list them in REPORT_EXTRA_COLUMNS or use "
+            "separate report storage"
+        )
+
+    # Pair every staged row with an unpaired stored row of equal hash (the
+    # n-th duplicate with the n-th) whose values are equal too; unpaired rows
+    # get new row ids. The hash is only the join key: rows of colliding
+    # hashes fail the value comparison and are stored separately.
+    base = conn.execute(
+        f"SELECT COALESCE(MAX(row_id), 0) FROM {REPORT_ROWS_TABLE}"
+    ).fetchone()[0]
+    names = ", ".join(quote_identifier(c) for c, _ in shared)
+    same_values = " AND ".join(
+        f"v.{quote_identifier(c)} IS r.{quote_identifier(c)}" for c, _ in shared
+    )
+    conn.execute("DROP TABLE IF EXISTS temp._report_merge")
+    conn.execute(
+        f"""
+    CREATE TEMP TABLE _report_merge AS
+    WITH staged AS (
+        SELECT rowid AS staged_id, {ROW_HASH_COLUMN} AS hash,
+               ROW_NUMBER() OVER (PARTITION BY {ROW_HASH_COLUMN} ORDER BY rowid) AS n
+        FROM {staged}
+    ), stored AS (
+        SELECT row_id, {ROW_HASH_COLUMN} AS hash,
+               ROW_NUMBER() OVER (PARTITION BY {ROW_HASH_COLUMN} ORDER BY row_id) AS n
+        FROM {REPORT_ROWS_TABLE} WHERE source_mask & {bit} = 0
+    ), candidates AS (
+        SELECT s.staged_id, p.row_id AS stored_id
+        FROM staged AS s LEFT JOIN stored AS p ON p.hash = s.hash AND p.n = s.n
+    ), paired AS (
+        SELECT c.staged_id, CASE WHEN {same_values} THEN c.stored_id END AS stored_id
+        FROM candidates AS c
+        JOIN {staged} AS v ON v.rowid = c.staged_id
+        LEFT JOIN {REPORT_ROWS_TABLE} AS r ON r.row_id = c.stored_id
+    )
+    SELECT staged_id, stored_id IS NOT NULL AS matched,
+           COALESCE(stored_id, {base} + ROW_NUMBER() OVER (
+               PARTITION BY stored_id IS NULL ORDER BY staged_id)) AS row_id
+    FROM paired
+    """
+    )
+
+    conn.execute(
+        f"UPDATE {REPORT_ROWS_TABLE} SET source_mask = source_mask | {bit} "
+        "WHERE row_id IN (SELECT row_id FROM temp._report_merge WHERE matched)"
+    )
+    values = ", ".join("s." + quote_identifier(c) for c, _ in shared)
+    conn.execute(
+        f"""
+    INSERT INTO {REPORT_ROWS_TABLE} (row_id, source_mask, {ROW_HASH_COLUMN}, {names})
+    SELECT m.row_id, {bit}, s.{ROW_HASH_COLUMN}, {values}
+    FROM temp._report_merge AS m JOIN {staged} AS s ON s.rowid = m.staged_id
+    WHERE NOT m.matched ORDER BY m.row_id
+    """
+    )
+    if extra:
+        side = extra_table_name(table_name)
+        extra_defs = ", ".join(f"{quote_identifier(c)} {t}" for c, t in columns if c in extra)
+        conn.execute(f"DROP TABLE IF EXISTS {side}")
+        conn.execute(f"CREATE TABLE {side} (row_id INTEGER PRIMARY KEY, {extra_defs})")
+        # Rows without any extra value are left out; the view LEFT JOINs
+        conn.execute(
+            f"""
+        INSERT INTO {side}
+        SELECT m.row_id, {", ".join("s." + quote_identifier(c) for c in extra)}
+        FROM temp._report_merge AS m JOIN {staged} AS s ON s.rowid = m.staged_id
+        WHERE {" OR ".join("s." + quote_identifier(c) + " IS NOT NULL" for c in extra)}
+        ORDER BY m.row_id
+        """
+        )
+    conn.execute("DROP TABLE temp._report_merge")
+    create_report_view(conn, table_name, [c for c, _ in columns])
+
+
+def merge_staging_table(conn, table_name, staging_path, shared=False):
+    """
+    Attaches a staging database and copies its table into the main database,
+    or with shared, merges a staged report table into report_rows
+    """
+    table = quote_identifier(table_name)
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    conn.execute("ATTACH DATABASE ? AS staging", (staging_path,))
+    try:
+        staged = conn.execute(
+            "SELECT sql FROM staging.sqlite_master WHERE type = 'table' AND name = ?",
+            (table_name,),
+        ).fetchone()
+        conn.execute("BEGIN")
+        if staged is None:
+            # The worker read no chunk at all, so it created no table; like
+            # the serial ingest, the table is then left out
+            print(f"No table staged for {table_name}; nothing to merge")
+            if not shared:
+                conn.execute(f"DROP TABLE IF EXISTS main.{table}")
+        elif shared:
+            merge_report_rows(conn, table_name, "staging")
+        else:
+            conn.execute(f"DROP TABLE IF EXISTS main.{table}")
+            conn.execute(staged[0])
+            conn.execute(f"INSERT INTO main.{table} SELECT * FROM staging.{table}")
+        ensure_quarantine_table(conn)
+        conn.execute(
+            f"DELETE FROM main.{QUARANTINE_TABLE} WHERE table_name = ?", (table_name,)
+        )
+        conn.execute(
+            f"INSERT INTO main.{QUARANTINE_TABLE} SELECT * FROM staging.{QUARANTINE_TABLE}"
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("DETACH DATABASE staging")
+        conn.isolation_level = isolation_level
+
+
+def ingest_tables_parallel(
+    conn, db_path, tables, source_dir=".", cache_dir=None, shared_tables=()
+):
+    """
+    Parses the given tables' CSVs concurrently in a process pool.
+
+    tables maps each table name to its source file fingerprint; the tables
+    in shared_tables are merged into report_rows (shared report storage).
+
+    Each worker writes into a private staging database, so parsing and type
+    conversion never contend for the main database's write lock; the main
+    connection is the single writer that merges the staged tables in. Total
+    time is bounded by the largest file plus the (cheap) merge copies.
+    """
+    staging_dir = tempfile.mkdtemp(
+        prefix="staging_", dir=os.path.dirname(os.path.abspath(db_path))
+    )
+    ingest_stats = {}
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(len(tables), os.cpu_count() or 1)
+        ) as pool:
+            futures = {}
+            for table_name in tables:
+                source_file = SOURCE_FILES[table_name]
+                print(f"Rebuilding {table_name} from {source_file}")
+                futures[table_name] = pool.submit(
+                    ingest_table_to_staging,
+                    table_name,
+                    os.path.join(source_dir, source_file),
+                    os.path.join(staging_dir, f"{table_name}.db"),
+                    cache_dir,
+                    tables[table_name]["sha256"],
+                    table_name in shared_tables,
+                )
+
+            # Merge in submission order: wait for each worker in turn (later
+            # workers keep parsing meanwhile)
+            for table_name, future in futures.items():
+                ingest_stats[table_name] = future.result()
+                merge_start = time.perf_counter()
+                merge_staging_table(
+                    conn,
+                    table_name,
+                    os.path.join(staging_dir, f"{table_name}.db"),
+                    shared=table_name in shared_tables,
+                )
+                ingest_stats[table_name]["merge_seconds"] = round(
+                    time.perf_counter() - merge_start, 3
+                )
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return ingest_stats
+
+
+def ingest_shared_report_table(
+    conn, db_path, table_name, csv_path, cache_dir=None, sha256=None
+):
+    """
+    Serial ingest of a report table in shared storage: its rows are staged,
+    with row hashes, in a temporary database and then merged into report_rows
+    """
+    staging_dir = tempfile.mkdtemp(
+        prefix="staging_", dir=os.path.dirname(os.path.abspath(db_path))
+    )
+    try:
+        staging_path = os.path.join(staging_dir, f"{table_name}.db")
+        stats = ingest_table_to_staging(
+            table_name, csv_path, staging_path, cache_dir, sha256, row_hash=True
+        )
+        merge_start = time.perf_counter()
+        merge_staging_table(conn, table_name, staging_path, shared=True)
+        stats["merge_seconds"] = round(time.perf_counter() - merge_start, 3)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    return stats
+
+
+def report_storage_stats(db_path="reports.db"):
+    """
+    Row counts of the report tables as stored: {"mode", "rows", "stored_rows",
+    "shared_rows"}. In separate storage every row is stored once per table.
+    """
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    try:
+        tables = [t for t in REPORT_SOURCE_BITS if table_exists(conn, t)]
+        rows = sum(
+            conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(t)}").fetchone()[0]
+            for t in tables
+        )
+        if object_type(conn, REPORT_ROWS_TABLE) != "table" or any(
+            object_type(conn, t) != "view" for t in tables
+        ):
+            return {"mode": "separate", "rows": rows, "stored_rows": rows, "shared_rows": 0}
+        stored_rows, shared_rows = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(source_mask = 3), 0) FROM {REPORT_ROWS_TABLE}"
+        ).fetchone()
+    finally:
+        conn.close()
+    return {
+        "mode": "shared",
+        "rows": rows,
+        "stored_rows": stored_rows,
+        "shared_rows": shared_rows,
+    }
+
+
+def build_database(
+    db_path="reports.db",
+    source_dir=".",
+    parallel=True,
+    columnar_cache=True,
+    report_storage=DEFAULT_REPORT_STORAGE,
+):
+    """
+    Brings the SQLite database up to date with the source CSV files.
+
+    Tables whose source file is unchanged since the last build (per the
+    manifest stored in the database) are reused as-is; only changed or
+    missing tables are re-read and rewritten, in parallel when more than one
+    changed and more than one core is available. A rebuilt table whose CSV
+    is unchanged (new schema version, deleted database) is read from the
+    columnar cache next to the database instead of being parsed again.
+    report_storage ("shared" or "separate") sets how the two report tables
+    are stored; see REPORT_STORAGE_MODES.
+    Returns {table_name: ingest stats} for the rebuilt tables.
+    """
+    if report_storage not in REPORT_STORAGE_MODES:
+        raise ValueError(f"Unknown report storage: {report_storage}")
+    shared_tables = set(REPORT_SOURCE_BITS) if report_storage == "shared" else set()
+    cache_dir = None
+    if columnar_cache:
+        cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(db_path)), COLUMNAR_CACHE_DIR
+        )
+    conn = sqlite3.connect(db_path)
+    try:
+        stale, touched = find_stale_tables(
+            conn, source_dir=source_dir, report_storage=report_storage
+        )
+
+        for table_name, fingerprint in touched.items():
+            write_manifest_entry(conn, table_name, SOURCE_FILES[table_name], fingerprint)
+        conn.commit()
+
+        ingest_stats = {}
+        if stale:
+            for pragma in BULK_LOAD_PRAGMAS:
+                conn.execute(pragma)
+            reset_report_storage(conn, stale, report_storage)
+            # A pool only pays off with more than one table and more than one core
+            if parallel and len(stale) > 1 and (os.cpu_count() or 1) > 1:
+                ingest_stats = ingest_tables_parallel(
+                    conn, db_path, stale, source_dir, cache_dir, shared_tables
+                )
+            else:
+                for table_name in stale:
+                    source_file = SOURCE_FILES[table_name]
+                    print(f"Rebuilding {table_name} from {source_file}")
+                    csv_path = os.path.join(source_dir, source_file)
+                    sha256 = stale[table_name]["sha256"]
+                    if table_name in shared_tables:
+                        ingest_stats[table_name] = ingest_shared_report_table(
+                            conn, db_path, table_name, csv_path, cache_dir, sha256
+                        )
+                    else:
+                        ingest_stats[table_name] = ingest_csv_chunked(
+                            conn, table_name, csv_path, cache_dir=cache_dir, sha256=sha256
+                        )
+            conn.execute("PRAGMA synchronous = NORMAL")
+    finally:
+        conn.close()
+
+    # Indexes go on the stored tables (report_rows for shared report tables)
+    stored = storage_tables(stale, report_storage)
+    date_tables = [t for t in DATE_INDEX_COLUMNS if t in stored]
+    if date_tables:
+        prepare_database_for_date_queries(db_path, tables=date_tables)
+    if stale:
+        create_default_indexes(db_path, tables=stored)
+    # Both also build what is missing from databases made before they existed
+    refresh_rollups(db_path, tables=list(stale))
+    refresh_text_index(db_path, tables=list(stale))
+
+    # Record the manifest last so an interrupted build is retried next start
+    if stale:
+        conn = sqlite3.connect(db_path)
+        try:
+            for table_name, fingerprint in stale.items():
+                write_manifest_entry(
+                    conn, table_name, SOURCE_FILES[table_name], fingerprint
+                )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        finally:
+            conn.close()
+
+    return ingest_stats
@@ -0,0 +1,610 @@
+import calendar
+import re
+import unicodedata
+from datetime import date, timedelta
+
+from question_cache import FINAL_LETTERS
+from reports import HEBREW_MONTHS
+
+# Questions of these shapes are answered from a SQL template, without the
+# model. Patterns are matched against the whole question (see routing_text),
+# so a question with any extra condition falls through to the model.
+
+REPORT_NUMBER_COLUMN = "מס' דו''ח"
+
+# Columns shown for a report lookup; present in both report tables
+REPORT_LOOKUP_COLUMNS = [
+    REPORT_NUMBER_COLUMN, "תאריך", "שעה", "שם פקח", "שם רחוב", "מיקום",
+    "עבירה", "מס ' רישוי", "קנס", "שולם", "לתשלום", "תאריך תשלום",
+    "סטטוס לדוח",
+]
+
+REPORT_TABLES = ["enforcement", "report_data"]
+
+# Geresh/gershayim and quotes are removed inside words (דו״ח == דוח)
+QUOTES = re.compile("[\"'`׳״’”]")
+# Dates keep their separators; every other punctuation mark becomes a space
+PUNCTUATION = re.compile(r"[^\w\s/.\-]|_|(?<!\d)[/.\-]|[/.\-](?!\d)")
+
+MONTH_NUMBERS = {
+    **{name.translate(FINAL_LETTERS): i for i, name in enumerate(HEBREW_MONTHS, 1)},
+    **{calendar.month_name[i].lower(): i for i in range(1, 13)},
+    **{calendar.month_abbr[i].lower(): i for i in range(1, 13)},
+    "sept": 9,
+}
+
+QUARTER_ORDINALS = {
+    name.translate(FINAL_LETTERS): quarter
+    for name, quarter in {
+        "ראשון": 1, "שני": 2, "שלישי": 3, "רביעי": 4, "אחרון": 4,
+        "first": 1, "second": 2, "third": 3, "fourth": 4, "last": 4,
+    }.items()
+}
+
+# Words that may introduce a date phrase ("בחודש", "in the month of", ...)
+DATE_LEAD = (
+    r"(?:(?:in|during|for|on|from|of)\s+(?:the\s+)?(?:month\s+of\s+|year\s+)?"
+    r"|[ובלמה]{0,2}(?:חודש|שנת|שנה|תקופת)\s+|[ובלמ]{1,2}\s+)?"
+)
+# Up to two Hebrew prefix letters attached to the first word ("בדצמבר")
+PREFIX = r"[ובלמה]{0,2}"
+DAY = r"(\d{1,2})[/.](\d{1,2})[/.](\d{4})"
+MONTH_NAME = "|".join(sorted(MONTH_NUMBERS, key=len, reverse=True))
+ORDINAL = "|".join(QUARTER_ORDINALS)
+
+
+def date_pattern(core):
+    return re.compile(rf"(?<!\w){DATE_LEAD}{core}(?!\w)".translate(FINAL_LETTERS))
+
+
+# Date phrases, most specific first: (kind, compiled pattern)
+DATE_PATTERNS = [
+    ("range", date_pattern(
+        rf"(?:between|from|בין|מ)\s*{DAY}\s+(?:and|to|until|till|ו?עד|ו|ל)\s*{DAY}"
+    )),
+    ("day", date_pattern(DAY)),
+    ("quarter", date_pattern(
+        rf"(?:q([1-4])|quarter\s+([1-4])|{PREFIX}רבעון\s+([1-4]))"
+        r"(?:\s+(?:of\s+|של\s+)?(\d{4}))?"
+    )),
+    ("quarter_ordinal", date_pattern(
+        rf"(?:(?:the\s+)?({ORDINAL})\s+quarter|{PREFIX}רבעון\s+ה({ORDINAL}))"
+        r"(?:\s+(?:of\s+|של\s+)?(?:שנת\s+)?(\d{4}))?"
+    )),
+    ("month", date_pattern(rf"{PREFIX}({MONTH_NAME})(?:\s+(?:of\s+)?(\d{{4}}))?")),
+    ("month_number", date_pattern(r"(?:(\d{1,2})[/.](\d{4})|(\d{4})-(\d{1,2}))")),
+    ("last_month", date_pattern(
+        r"(?:(?:the\s+)?(?:last|previous|past)\s+month|this\s+month"
+        rf"|{PREFIX}חודש\s+(?:ה?אחרון|ש?עבר)|{PREFIX}חודש\s+הנוכחי)"
+    )),
+    ("last_year", date_pattern(
+        rf"(?:(?:the\s+)?(?:last|previous|past)\s+year|{PREFIX}שנה\s+(?:ש?עברה|הקודמת))"
+    )),
+    ("this_year", date_pattern(
+        rf"(?:this\s+year|{PREFIX}שנה\s+הנוכחית|{PREFIX}שנה\s+הזו|השנה)"
+    )),
+    ("year", date_pattern(r"((?:19|20)\d{2})")),
+]
+
+# Shared pattern pieces
+HE_REPORT_NUMBER = r"[לבש]?ה?דוח\s*(?:מספר|מס)?\s*(?P<number>\d+)"
+EN_REPORT_NUMBER = r"(?:the\s+)?(?:report|ticket|fine)\s*(?:number|no|num)?\s*(?P<number>\d+)"
+HE_REPORTS = r"(?:ה?דוחות|ה?קנסות|ה?דוחות\s+ה?חניה)"
+EN_REPORTS = r"(?:parking\s+)?(?:tickets|reports|fines)"
+HE_ISSUED = r"(?:ש?(?:ניתנו|נרשמו|הוצאו|נכתבו|היו|יש))"
+HE_PER_INSPECTOR = r"(?:לפי|לכל|כל|של\s+כל|עבור\s+כל|פר)\s+ה?פקח(?:ים)?"
+EN_PER_INSPECTOR = r"(?:per|by|for\s+each|for\s+every|of\s+each)\s+inspector"
+BY_INSPECTOR = rf"(?P<by_inspector>\s+(?:{HE_PER_INSPECTOR}|{EN_PER_INSPECTOR}))?"
+
+
+def intent_patterns(*patterns):
+    # Patterns are written with final letters; routing text has none
+    return [re.compile(pattern.translate(FINAL_LETTERS)) for pattern in patterns]
+
+
+# Intents about one report, matched before any date phrase is looked for (a
+# report number can look like a year)
+REPORT_INTENTS = {
+    "payment_status": intent_patterns(
+        rf"(?:ה?אם\s+)?{HE_REPORT_NUMBER}\s+(?:שולם|נפרע|שילמו)(?:\s+כבר)?",
+        rf"(?:ה?אם\s+)?(?:שולם|שילמו)\s+(?:את\s+|על\s+)?{HE_REPORT_NUMBER}",
+        r"(?:מה\s+)?(?:ה?סטטוס|ה?מצב)\s+(?:ה?תשלום|תשלום)\s+(?:של\s+|עבור\s+)?"
+        + HE_REPORT_NUMBER,
+        rf"(?:is|was|has)\s+{EN_REPORT_NUMBER}\s+(?:been\s+)?paid(?:\s+yet)?",
+        r"(?:what\s+is\s+)?(?:the\s+)?payment\s+status\s+(?:of|for)\s+"
+        + EN_REPORT_NUMBER,
+        rf"(?:did|has)\s+(?:someone\s+|anyone\s+)?pa(?:y|id)\s+{EN_REPORT_NUMBER}",
+    ),
+    "report_lookup": intent_patterns(
+        r"(?:(?:הצג|הראה|תראה|מצא|חפש|הבא)(?:\s+לי)?\s+)?(?:את\s+)?"
+        r"(?:(?:כל\s+)?ה?פרטים\s+(?:של|על)\s+|פרטי\s+|מה\s+(?:ה?פרטים\s+של|פרטי)\s+)?"
+        + HE_REPORT_NUMBER,
+        r"(?:(?:show|find|get|display|look\s+up|lookup|open)(?:\s+me)?\s+)?"
+        r"(?:(?:the\s+)?details\s+(?:of|for|on)\s+)?"
+        + EN_REPORT_NUMBER
+        + r"(?:\s+details)?",
+        rf"what\s+is\s+{EN_REPORT_NUMBER}",
+    ),
+}
+
+# Intents over a period, matched after the date phrase has been removed
+PERIOD_INTENTS = {
+    "disabled_percentage": intent_patterns(
+        r"(?:כמה|מה\s+ה?אחוז|איזה\s+אחוז|ה?אחוז)\s+"
+        rf"(?:(?:מ|של\s+)?{HE_REPORTS}\s+(?:{HE_ISSUED}\s+)?(?:ל|על\s+|עבור\s+))?"
+        r"ה?רכבי\s+(?:ה?נכים|נכה)"
+        rf"(?:\s+(?:קיבלו|קיבל)(?:\s+{HE_REPORTS}|\s+דוח)?)?",
+        r"(?:what\s+(?:is\s+|was\s+)?)?(?:the\s+)?(?:percentage|percent|share|how\s+many)\s+"
+        rf"(?:of\s+)?(?:(?:the\s+)?{EN_REPORTS}\s+(?:(?:were|was)\s+)?"
+        r"(?:issued\s+|given\s+)?(?:to|for|on)\s+)?"
+        r"disabled\s+(?:vehicles?|cars?|drivers?|parking)"
+        rf"(?:\s+(?:got|received|were\s+given)\s+{EN_REPORTS})?",
+    ),
+    "inspector_counts": intent_patterns(
+        rf"(?:כמה|מה\s+מספר|מספר)\s+{HE_REPORTS}\s+"
+        r"(?:(?:נתן|נתנו|רשם|רשמו|כתב|כתבו|הוציא|ניתנו|נרשמו|הוצאו)\s+)?"
+        + HE_PER_INSPECTOR,
+        rf"(?:מספר\s+)?{HE_REPORTS}\s+{HE_PER_INSPECTOR}",
+        rf"how\s+many\s+{EN_REPORTS}\s+did\s+(?:each|every)\s+inspector\s+"
+        r"(?:issue|give|write)",
+        rf"how\s+many\s+{EN_REPORTS}\s+(?:were\s+)?(?:issued\s+|given\s+)?"
+        + EN_PER_INSPECTOR,
+        rf"(?:(?:the\s+)?number\s+of\s+)?{EN_REPORTS}\s+(?:issued\s+)?{EN_PER_INSPECTOR}",
+        rf"(?:ticket\s+|report\s+)?counts?\s+{EN_PER_INSPECTOR}",
+    ),
+    "fine_totals": intent_patterns(
+        r"(?:(?:מה|מהם|מה\s+היה|מה\s+היו|מה\s+הוא|מה\s+הם)\s+)?"
+        r"(?:ה?סכום|ה?סכומי|סהכ|ה?סך(?:\s+ה?כל)?)\s+(?:כל\s+)?ה?קנסות"
+        rf"(?:\s+{HE_ISSUED})?{BY_INSPECTOR}",
+        r"(?:what\s+(?:is|was|are|were)\s+)?(?:the\s+)?(?:total|sum)\s+(?:of\s+)?"
+        rf"(?:the\s+|all\s+)?(?:fines?|fine\s+amounts?)(?:\s+issued|\s+given)?{BY_INSPECTOR}",
+        rf"(?:the\s+)?(?:total\s+)?fines?\s+(?:totals?|amounts?|sums?){BY_INSPECTOR}",
+        rf"how\s+much\s+(?:in\s+)?fines?\s+(?:were|was)\s+(?:issued|given){BY_INSPECTOR}",
+    ),
+    "report_count": intent_patterns(
+        rf"(?:כמה|מה\s+מספר|מה\s+היה\s+מספר|מספר)\s+{HE_REPORTS}"
+        rf"(?:\s+{HE_ISSUED})?(?:\s+(?:בסהכ|סהכ|בסך\s+הכל))?(?:\s+ב?מערכת)?",
+        rf"how\s+many\s+{EN_REPORTS}(?:\s+(?:were|are|have\s+been|was))?"
+        r"(?:\s+(?:issued|given|written|there))?(?:\s+in\s+total|\s+total)?",
+        rf"(?:the\s+)?(?:total\s+)?number\s+of\s+{EN_REPORTS}(?:\s+issued)?",
+    ),
+}
+
+INSPECTOR_ROLLUP = "rollup_inspector_month"
+FLAGS_ROLLUP = "rollup_flags_month"
+
+# Hebrew and English answers; fields are filled in by answer_fields()
+ANSWER_TEMPLATES = {
+    "report_lookup": {
+        "hebrew": (
+            "דו״ח מספר {number} ניתן בתאריך {date} על ידי הפקח {inspector} "
+            "ברחוב {street}. עבירה: {offense}. קנס: {fine} ₪, שולם: {paid} ₪."
+        ),
+        "english": (
+            "Report {number} was issued on {date} by inspector {inspector} "
+            "on {street}. Offense: {offense}. Fine: ₪{fine}, paid: ₪{paid}."
+        ),
+    },
+    "payment_status": {
+        "hebrew": (
+            "סטטוס התשלום של דו״ח מספר {number}: {status}. "
+            "קנס: {fine} ₪, שולם: {paid} ₪, יתרה לתשלום: {balance} ₪."
+        ),
+        "english": (
+            "Payment status of report {number}: {status}. "
+            "Fine: ₪{fine}, paid: ₪{paid}, balance: ₪{balance}."
+        ),
+    },
+    "disabled_percentage": {
+        "hebrew": (
+            "{period_text} ניתנו {disabled} דוחות לרכבי נכים מתוך {total} דוחות, "
+            "שהם {percentage}% מכלל הדוחות."
+        ),
+        "english": (
+            "{period_text}, {disabled} of {total} tickets were issued to "
+            "disabled vehicles, {percentage}% of all tickets."
+        ),
+    },
+    "inspector_counts": {
+        "hebrew": (
+            "{period_text} ניתנו {total} דוחות על ידי {inspectors} פקחים. "
+            "הכי הרבה דוחות נתן {top} ({top_count} דוחות)."
+        ),
+        "english": (
+            "{period_text}, {inspectors} inspectors issued {total} tickets. "
+            "{top} issued the most ({top_count} tickets)."
+        ),
+    },
+    "fine_totals": {
+        "hebrew": (
+            "{period_text} ניתנו {total} דוחות בסכום קנסות כולל של {fine_total} ₪, "
+            "מתוכם שולמו {paid_total} ₪."
+        ),
+        "english": (
+            "{period_text}, {total} tickets were issued with fines totaling "
+            "₪{fine_total}, of which ₪{paid_total} was paid."
+        ),
+    },
+    "fine_totals_by_inspector": {
+        "hebrew": (
+            "{period_text} סכום הקנסות של {inspectors} פקחים הוא {fine_total} ₪. "
+            "הסכום הגבוה ביותר: {top} ({top_fines} ₪)."
+        ),
+        "english": (
+            "{period_text}, fines issued by {inspectors} inspectors total "
+            "₪{fine_total}. The highest is {top} (₪{top_fines})."
+        ),
+    },
+    "report_count": {
+        "hebrew": "{period_text} ניתנו {total} דוחות.",
+        "english": "{period_text}, {total} tickets were issued.",
+    },
+}
+
+NO_RESULTS_TEMPLATES = {
+    "report_lookup": {
+        "hebrew": "לא נמצא דו״ח מספר {number}.",
+        "english": "No report number {number} was found.",
+    },
+    "payment_status": {
+        "hebrew": "לא נמצא דו״ח מספר {number}.",
+        "english": "No report number {number} was found.",
+    },
+}
+
+PAYMENT_STATUS_LABELS = {
+    "paid": {"hebrew": "שולם", "english": "paid"},
+    "partial": {"hebrew": "שולם חלקית", "english": "partially paid"},
+    "unpaid": {"hebrew": "לא שולם", "english": "not paid"},
+}
+
+
+def routing_text(question):
+    """
+    Normalizes a question for intent matching like normalize_question, but
+    keeps the separators of dates such as 31/12/2024 and 2024-12
+    """
+    text = unicodedata.normalize("NFKD", question)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.translate(FINAL_LETTERS).lower()
+    text = QUOTES.sub("", text)
+    text = PUNCTUATION.sub(" ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def month_range(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def parse_day(day, month, year):
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def date_range_from_match(kind, groups, reference):
+    """
+    Returns (start date, end date, label) for a matched date phrase, or None
+    when the phrase does not name a valid date. Month and quarter phrases
+    without a year refer to the latest such period up to the reference date.
+    """
+    def latest_year(month):
+        return reference.year if month <= reference.month else reference.year - 1
+
+    if kind == "range":
+        start, end = parse_day(*groups[:3]), parse_day(*groups[3:])
+        if start is None or end is None or end < start:
+            return None
+        return start, end, f"{start:%d/%m/%Y}–{end:%d/%m/%Y}"
+    if kind == "day":
+        day = parse_day(*groups)
+        return None if day is None else (day, day, f"{day:%d/%m/%Y}")
+    if kind in ("quarter", "quarter_ordinal"):
+        *quarter, year = groups
+        quarter = next(q for q in quarter if q)
+        quarter = QUARTER_ORDINALS.get(quarter) or int(quarter)
+        if year is None:
+            year = latest_year(quarter * 3 - 2)
+        start, _ = month_range(int(year), quarter * 3 - 2)
+        _, end = month_range(int(year), quarter * 3)
+        return start, end, f"Q{quarter} {year}"
+    if kind in ("month", "month_number"):
+        if kind == "month":
+            month, year = MONTH_NUMBERS[groups[0]], groups[1]
+        elif groups[0]:
+            month, year = int(groups[0]), groups[1]
+        else:
+            month, year = int(groups[3]), groups[2]
+        if not 1 <= month <= 12:
+            return None
+        year = int(year) if year else latest_year(month)
+        return (*month_range(year, month), f"{month:02d}/{year}")
+    if kind == "last_month":
+        return (*month_range(reference.year, reference.month),
+                f"{reference.month:02d}/{reference.year}")
+    if kind in ("last_year", "this_year", "year"):
+        year = {"last_year": reference.year - 1, "this_year": reference.year}.get(
+            kind, int(groups[0]) if groups else reference.year
+        )
+        return date(year, 1, 1), date(year, 12, 31), str(year)
+    return None
+
+
+def extract_date_range(text, reference):
+    """
+    Finds the date phrase in a routing text. Returns (period, rest): the
+    period as {"start", "end", "label"} (ISO dates) or None, and the text
+    with the phrase removed. A text with more than one date phrase returns
+    (None, None), since no template compares periods.
+    """
+    for kind, pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match is None:
+            continue
+        parsed = date_range_from_match(kind, match.groups(), reference)
+        if parsed is None:
+            return None, None
+        rest = re.sub(r"\s+", " ", text[: match.start()] + " " + text[match.end():])
+        rest = rest.strip()
+        if any(p.search(rest) for _, p in DATE_PATTERNS):
+            return None, None
+        start, end, label = parsed
+        return {"start": start.isoformat(), "end": end.isoformat(), "label": label}, rest
+    return None, text
+
+
+def month_bounds(period):
+    """
+    Returns (start month, end month) when the period covers whole months (or
+    is None: every month), so it can be answered from a monthly rollup
+    """
+    if period is None:
+        return "0000-00", "9999-99"
+    start, end = date.fromisoformat(period["start"]), date.fromisoformat(period["end"])
+    if start.day != 1 or (end + timedelta(days=1)).day != 1:
+        return None
+    return period["start"][:7], period["end"][:7]
+
+
+def date_filter(period, column="date_formatted"):
+    # Routed SQL inlines its parameters: they are ints and ISO dates built by
+    # the parser, never user text, and inlined queries share the result cache
+    # and plan check with every other query
+    if period is None:
+        return ""
+    return f"WHERE {column} BETWEEN '{period['start']}' AND '{period['end']}'"
+
+
+def report_lookup_sql(number):
+    columns = ", ".join('"' + c.replace('"', '""') + '"' for c in REPORT_LOOKUP_COLUMNS)
+    return "\nUNION ALL\n".join(
+        f"SELECT '{table}' AS source, {columns} FROM {table} "
+        f"WHERE \"{REPORT_NUMBER_COLUMN}\" = {int(number)}"
+        for table in REPORT_TABLES
+    )
+
+
+def payment_status_sql(number):
+    return f"""
+SELECT "{REPORT_NUMBER_COLUMN}", תאריך, קנס, שולם, לתשלום, "לתשלום עד", "תאריך תשלום",
+       CASE WHEN "שולם_flag" = 1 THEN 'paid'
+            WHEN COALESCE(שולם, 0) > 0 THEN 'partial'
+            ELSE 'unpaid' END AS payment_status
+FROM enforcement WHERE "{REPORT_NUMBER_COLUMN}" = {int(number)}
+"""
+
+
+def disabled_percentage_sql(period):
+    months = month_bounds(period)
+    if months is not None:
+        return f"""
+SELECT COALESCE(SUM(report_count), 0) AS total_tickets,
+       COALESCE(SUM(disabled_count), 0) AS disabled_tickets,
+       ROUND(COALESCE(SUM(disabled_count), 0) * 100.0
+             / MAX(COALESCE(SUM(report_count), 0), 1), 2) AS percentage
+FROM {FLAGS_ROLLUP} WHERE month BETWEEN '{months[0]}' AND '{months[1]}'
+"""
+    # נכה is an indexed 0/1 flag, so the filtered count reads only the index
+    where = date_filter(period)
+    return f"""
+SELECT total_tickets, disabled_tickets,
+       ROUND(disabled_tickets * 100.0 / MAX(total_tickets, 1), 2) AS percentage
+FROM (SELECT (SELECT COUNT(*) FROM enforcement {where}) AS total_tickets,
+             (SELECT COUNT(*) FROM enforcement {where} {"AND" if where else "WHERE"} נכה = 1)
+                 AS disabled_tickets)
+"""
+
+
+def inspector_counts_sql(period):
+    months = month_bounds(period)
+    if months is not None:
+        return f"""
+SELECT inspector AS "שם פקח", SUM(report_count) AS report_count
+FROM {INSPECTOR_ROLLUP} WHERE month BETWEEN '{months[0]}' AND '{months[1]}'
+GROUP BY inspector ORDER BY report_count DESC
+"""
+    return f"""
+SELECT "שם פקח", COUNT(*) AS report_count FROM enforcement {date_filter(period)}
+GROUP BY "שם פקח" ORDER BY report_count DESC
+"""
+
+
+def fine_totals_sql(period, by_inspector=False):
+    months = month_bounds(period)
+    group = ' AS "שם פקח"' if by_inspector else ""
+    if months is not None:
+        select = f"inspector{group}, " if by_inspector else ""
+        grouping = "GROUP BY inspector ORDER BY fine_total DESC" if by_inspector else ""
+        return f"""
+SELECT {select}SUM(report_count) AS report_count, SUM(fine_total) AS fine_total,
+       SUM(paid_total) AS paid_total
+FROM {INSPECTOR_ROLLUP} WHERE month BETWEEN '{months[0]}' AND '{months[1]}'
+{grouping}
+"""
+    select = '"שם פקח", ' if by_inspector else ""
+    grouping = 'GROUP BY "שם פקח" ORDER BY fine_total DESC' if by_inspector else ""
+    return f"""
+SELECT {select}COUNT(*) AS report_count, COALESCE(SUM(קנס), 0) AS fine_total,
+       COALESCE(SUM(שולם), 0) AS paid_total
+FROM enforcement {date_filter(period)}
+{grouping}
+"""
+
+
+def report_count_sql(period):
+    return f"SELECT COUNT(*) AS report_count FROM enforcement {date_filter(period)}"
+
+
+def latest_data_date(conn):
+    """
+    Latest report date in the data (an index lookup); relative phrases such
+    as "last month" refer to it, since the data is not updated daily
+    """
+    try:
+        value = conn.execute("SELECT MAX(date_formatted) FROM enforcement").fetchone()[0]
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return date.today()
+    except Exception as e:
+        print(f"Could not read the latest data date: {e}")
+        return date.today()
+
+
+def route_question(question, reference=None):
+    """
+    Matches a question against the templated intents. Returns a route dict
+    {"intent", "sql", "params", "period"} or None when the question needs the
+    model. reference is the date relative phrases are resolved against.
+    """
+    text = routing_text(question)
+    if not text:
+        return None
+    reference = reference or date.today()
+
+    for intent, patterns in REPORT_INTENTS.items():
+        for pattern in patterns:
+            match = pattern.fullmatch(text)
+            if match is None:
+                continue
+            number = int(match.group("number"))
+            sql = (
+                payment_status_sql(number)
+                if intent == "payment_status"
+                else report_lookup_sql(number)
+            )
+            return {
+                "intent": intent,
+                "sql": sql.strip(),
+                "params": {"number": number},
+                "period": None,
+            }
+
+    period, rest = extract_date_range(text, reference)
+    if rest is None:
+        return None
+    for intent, patterns in PERIOD_INTENTS.items():
+        for pattern in patterns:
+            match = pattern.fullmatch(rest)
+            if match is None:
+                continue
+            params = {}
+            if intent == "disabled_percentage":
+                sql = disabled_percentage_sql(period)
+            elif intent == "inspector_counts":
+                sql = inspector_counts_sql(period)
+            elif intent == "fine_totals":
+                params["by_inspector"] = bool(match.groupdict().get("by_inspector"))
+                sql = fine_totals_sql(period, params["by_inspector"])
+            else:
+                sql = report_count_sql(period)
+            return {
+                "intent": intent,
+                "sql": re.sub(r"\n\s*\n", "\n", sql).strip(),
+                "params": params,
+                "period": period,
+            }
+    return None
+
+
+def format_amount(value):
+    return f"{value or 0:,.0f}"
+
+
+def answer_fields(route, rows, language):
+    """
+    Values for the answer template of a route, from its result rows
+    (dicts by column name)
+    """
+    period = route["period"]
+    if period is None:
+        period_text = "בסך הכל" if language == "hebrew" else "Overall"
+    elif language == "hebrew":
+        period_text = f"בתקופה {period['label']}"
+    else:
+        period_text = f"In {period['label']}"
+    fields = {"period_text": period_text, **route["params"]}
+
+    first = rows[0]
+    intent = route["intent"]
+    if intent == "report_lookup":
+        fields.update(
+            date=first.get("תאריך") or "-",
+            inspector=first.get("שם פקח") or "-",
+            street=first.get("שם רחוב") or "-",
+            offense=first.get("עבירה") or "-",
+            fine=format_amount(first.get("קנס")),
+            paid=format_amount(first.get("שולם")),
+        )
+    elif intent == "payment_status":
+        fields.update(
+            status=PAYMENT_STATUS_LABELS[first["payment_status"]][language],
+            fine=format_amount(first.get("קנס")),
+            paid=format_amount(first.get("שולם")),
+            balance=format_amount(first.get("לתשלום")),
+        )
+    elif intent == "disabled_percentage":
+        fields.update(
+            total=f"{first['total_tickets']:,}",
+            disabled=f"{first['disabled_tickets']:,}",
+            percentage=first["percentage"],
+        )
+    elif intent == "report_count":
+        fields["total"] = f"{first['report_count']:,}"
+    else:
+        fields.update(
+            total=f"{sum(row['report_count'] or 0 for row in rows):,}",
+            fine_total=format_amount(sum(row.get("fine_total") or 0 for row in rows)),
+            paid_total=format_amount(sum(row.get("paid_total") or 0 for row in rows)),
+            inspectors=len(rows),
+            top=first.get("שם פקח"),
+            top_count=f"{first['report_count']:,}",
+            top_fines=format_amount(first.get("fine_total")),
+        )
+    return fields
+
+
+def answer_text(route, results, columns, language="hebrew"):
+    """
+    The templated textual answer for a routed question's results
+    """
+    rows = [dict(zip(columns, row)) for row in results]
+    intent = route["intent"]
+    if intent == "fine_totals" and route["params"].get("by_inspector"):
+        intent = "fine_totals_by_inspector"
+    empty = not rows or (
+        intent in ("inspector_counts", "fine_totals", "report_count")
+        and not rows[0].get("report_count")
+    )
+    if empty:
+        template = NO_RESULTS_TEMPLATES.get(intent)
+        if template is None:
+            return (
+                "לא נמצאו נתונים לשאלה שהוזנה."
+                if language == "hebrew"
+                else "No data was found for this question."
+            )
+        return template[language].format(**route["params"])
+    return ANSWER_TEMPLATES[intent][language].format(
+        **answer_fields(route, rows, language)
+    )
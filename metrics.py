@@ -0,0 +1,381 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Per-request stage spans, kept in the reports database next to the query
+# log; only the SUMMARY_WINDOW most recent spans of each stage are kept
+METRICS_TABLE = "_request_metrics"
+
+# Running count, duration, token and result-size totals per path and stage,
+# so the exported counters keep growing while old spans are trimmed
+METRIC_TOTALS_TABLE = "_request_metric_totals"
+
+# Prometheus text file (for the node_exporter textfile collector); relative
+# paths are next to the database. It is rewritten in a background thread at
+# most once per PROMETHEUS_WRITE_SECONDS, and at most that long after a request.
+PROMETHEUS_FILE = "metrics.prom"
+PROMETHEUS_WRITE_SECONDS = 15.0
+
+# Stages of an answered question, in pipeline order; questions answered from
+# an intent router template only have routing, execution, rendering and total
+PIPELINE_STAGES = [
+    "routing",
+    "prompt_build",
+    "sql_generation",
+    "sql_rewrite",
+    "sanitization",
+    "execution",
+    "dataframe",
+    "row_count",
+    "rendering",
+    "answer_first_token",
+    "answer_streaming",
+    "total",
+]
+
+# Percentiles are computed over this many most recent spans per stage
+SUMMARY_WINDOW = 1000
+
+# db_path -> time of the last Prometheus file write, and the databases with
+# a write scheduled
+_last_export = {}
+_scheduled_exports = set()
+_export_lock = threading.Lock()
+
+SUMMARY_QUANTILES = [0.5, 0.95]
+
+# Prefix of every exported metric name
+METRIC_PREFIX = "reports_qa"
+
+SPAN_VALUES = ["prompt_tokens", "completion_tokens", "rows", "bytes"]
+
+
+class RequestTrace:
+    """
+    Stage spans of one answered question.
+
+    Each span records its duration and, where they apply, token counts
+    (prompt_tokens, completion_tokens) and result size (rows, bytes). The
+    trace is written to the metrics table once the request is over.
+    """
+
+    def __init__(self, path="model"):
+        self.request_id = uuid.uuid4().hex[:16]
+        self.path = path  # "model" (LLM pipeline) or "routed" (SQL template)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+
+    @contextmanager
+    def span(self, stage, **values):
+        """
+        Times the block as one stage; the yielded dict takes values known
+        only inside it, e.g. span["rows"] = len(results)
+        """
+        entry = dict(values)
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000, **entry)
+
+    def record(self, stage, duration_ms, **values):
+        self.spans.append({"stage": stage, "duration_ms": duration_ms, **values})
+
+    def finish(self):
+        """
+        Closes the trace with a "total" span covering the whole request
+        """
+        self.record("total", (time.perf_counter() - self.start) * 1000)
+
+
+def ensure_metrics_table(conn):
+    conn.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS {METRICS_TABLE} (
+        request_id TEXT NOT NULL,
+        path TEXT NOT NULL,
+        recorded_at REAL NOT NULL,
+        stage TEXT NOT NULL,
+        duration_ms REAL NOT NULL,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        rows INTEGER,
+        bytes INTEGER
+    )
+    """
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{METRICS_TABLE}_path_stage "
+        f"ON {METRICS_TABLE} (path, stage)"
+    )
+    conn.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS {METRIC_TOTALS_TABLE} (
+        path TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        sum_ms REAL NOT NULL,
+        prompt_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        rows INTEGER NOT NULL,
+        bytes INTEGER NOT NULL,
+        PRIMARY KEY (path, stage)
+    )
+    """
+    )
+
+
+def save_trace(trace, db_path="reports.db", prometheus_file=PROMETHEUS_FILE):
+    """
+    Finishes a trace, appends its spans to the metrics table (trimming each
+    of its stages to the SUMMARY_WINDOW most recent spans), adds them to the
+    running totals and schedules a rewrite of the Prometheus text file (when
+    prometheus_file is set)
+    """
+    trace.finish()
+    spans = [
+        (
+            trace.request_id,
+            trace.path,
+            trace.started_at,
+            span["stage"],
+            round(span["duration_ms"], 3),
+            *(span.get(name) for name in SPAN_VALUES),
+        )
+        for span in trace.spans
+    ]
+    conn = sqlite3.connect(db_path, timeout=1.0)
+    try:
+        ensure_metrics_table(conn)
+        conn.executemany(
+            f"INSERT INTO {METRICS_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", spans
+        )
+        conn.executemany(
+            f"""
+        INSERT INTO {METRIC_TOTALS_TABLE} VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+        ON CONFLICT (path, stage) DO UPDATE SET
+            count = count + 1,
+            sum_ms = sum_ms + excluded.sum_ms,
+            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+            completion_tokens = completion_tokens + excluded.completion_tokens,
+            rows = rows + excluded.rows,
+            bytes = bytes + excluded.bytes
+        """,
+            [
+                (path, stage, duration_ms, *(value or 0 for value in values))
+                for _, path, _, stage, duration_ms, *values in spans
+            ],
+        )
+        for stage in {span[3] for span in spans}:
+            conn.execute(
+                f"""
+            DELETE FROM {METRICS_TABLE} WHERE path = ? AND stage = ? AND rowid < (
+                SELECT rowid FROM {METRICS_TABLE} WHERE path = ? AND stage = ?
+                ORDER BY rowid DESC LIMIT 1 OFFSET ?
+            )
+            """,
+                (trace.path, stage, trace.path, stage, SUMMARY_WINDOW - 1),
+            )
+        conn.commit()
+    except sqlite3.Error as e:
+        # Metrics must never break answering
+        print(f"Metrics error: {e}")
+        return
+    finally:
+        conn.close()
+    if prometheus_file:
+        schedule_prometheus_write(db_path, prometheus_file)
+
+
+def schedule_prometheus_write(db_path="reports.db", path=PROMETHEUS_FILE):
+    """
+    Rewrites the Prometheus text file in a background thread: right away,
+    or PROMETHEUS_WRITE_SECONDS after the previous write when that was more
+    recent. Requests in between share the one scheduled write.
+    """
+    with _export_lock:
+        if db_path in _scheduled_exports:
+            return
+        last = _last_export.get(db_path)
+        delay = 0.0
+        if last is not None:
+            delay = max(0.0, last + PROMETHEUS_WRITE_SECONDS - time.monotonic())
+        timer = threading.Timer(delay, export_prometheus_file, (db_path, path))
+        timer.daemon = True
+        _scheduled_exports.add(db_path)
+    timer.start()
+
+
+def export_prometheus_file(db_path="reports.db", path=PROMETHEUS_FILE):
+    with _export_lock:
+        _scheduled_exports.discard(db_path)
+        _last_export[db_path] = time.monotonic()
+    conn = sqlite3.connect(db_path, timeout=1.0)
+    try:
+        write_prometheus_file(conn, path, db_path)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Metrics error: {e}")
+    finally:
+        conn.close()
+
+
+def percentile(sorted_values, quantile):
+    """
+    Nearest-rank percentile of an ascending list
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(quantile * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def stage_summaries(conn, window=SUMMARY_WINDOW):
+    """
+    Returns [{"path", "stage", "count", "p50_ms", "p95_ms", "sum_ms",
+    "prompt_tokens", "completion_tokens", "rows", "bytes"}] with percentiles
+    over the `window` most recent spans of each stage, and counts and sums
+    over all of them. Works on read-only connections.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (METRIC_TOTALS_TABLE,),
+    ).fetchone()
+    if not exists:
+        return []
+    durations = {}
+    for path, stage, duration_ms in conn.execute(
+        f"SELECT path, stage, duration_ms FROM {METRICS_TABLE} ORDER BY rowid DESC"
+    ):
+        recent = durations.setdefault((path, stage), [])
+        if len(recent) < window:
+            recent.append(duration_ms)
+
+    summaries = []
+    for path, stage, count, sum_ms, prompt, completion, rows, size in conn.execute(
+        f"SELECT * FROM {METRIC_TOTALS_TABLE}"
+    ).fetchall():
+        recent = sorted(durations.get((path, stage), []))
+        if not recent:
+            continue
+        summaries.append(
+            {
+                "path": path,
+                "stage": stage,
+                "count": count,
+                **{
+                    f"p{int(q * 100)}_ms": round(percentile(recent, q), 1)
+                    for q in SUMMARY_QUANTILES
+                },
+                "sum_ms": round(sum_ms, 1),
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "rows": rows,
+                "bytes": size,
+            }
+        )
+    order = {stage: i for i, stage in enumerate(PIPELINE_STAGES)}
+    summaries.sort(key=lambda s: (s["path"], order.get(s["stage"], len(order))))
+    return summaries
+
+
+def prometheus_text(conn, window=SUMMARY_WINDOW):
+    """
+    The stage summaries in the Prometheus text exposition format: a latency
+    summary per path and stage, plus token and result-size counters
+    """
+    summaries = stage_summaries(conn, window)
+    duration = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines = [
+        f"# HELP {duration} Latency of answer pipeline stages",
+        f"# TYPE {duration} summary",
+    ]
+    for s in summaries:
+        labels = f'path="{s["path"]}",stage="{s["stage"]}"'
+        for quantile in SUMMARY_QUANTILES:
+            value = round(s[f"p{int(quantile * 100)}_ms"] / 1000, 6)
+            lines.append(f'{duration}{{{labels},quantile="{quantile}"}} {value}')
+        lines.append(f"{duration}_sum{{{labels}}} {round(s['sum_ms'] / 1000, 6)}")
+        lines.append(f"{duration}_count{{{labels}}} {s['count']}")
+
+    counters = [
+        ("tokens_total", "Model tokens used, by kind", "prompt_tokens", "prompt"),
+        ("tokens_total", None, "completion_tokens", "completion"),
+        ("result_rows_total", "Rows fetched by executed queries", "rows", None),
+        ("result_bytes_total", "Approximate bytes of fetched results", "bytes", None),
+    ]
+    for name, help_text, key, kind in counters:
+        metric = f"{METRIC_PREFIX}_{name}"
+        if help_text:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for s in summaries:
+            if not s[key]:
+                continue
+            labels = f'path="{s["path"]}",stage="{s["stage"]}"'
+            if kind:
+                labels += f',kind="{kind}"'
+            lines.append(f"{metric}{{{labels}}} {s[key]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_file(conn, path=PROMETHEUS_FILE, db_path="reports.db"):
+    """
+    Writes prometheus_text() to path, replacing the old file atomically so a
+    scraper never reads a partial one
+    """
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(db_path)), path)
+    partial = path + ".partial"
+    with open(partial, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(conn))
+    os.replace(partial, path)
+
+
+def serve_metrics(db_path="reports.db", port=9464):
+    """
+    Serves prometheus_text() on http://0.0.0.0:port/metrics
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            conn = sqlite3.connect(db_path, timeout=1.0)
+            try:
+                body = prometheus_text(conn).encode("utf-8")
+            finally:
+                conn.close()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    print(f"Serving metrics of {db_path} on port {port}")
+    ThreadingHTTPServer(("", port), MetricsHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Print or serve the answer pipeline metrics (Prometheus format)"
+    )
+    parser.add_argument("--db", default="reports.db")
+    parser.add_argument("--serve", type=int, metavar="PORT", default=None)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_metrics(args.db, args.serve)
+    else:
+        conn = sqlite3.connect(args.db)
+        try:
+            print(prometheus_text(conn), end="")
+        finally:
+            conn.close()
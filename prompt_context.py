@@ -0,0 +1,200 @@
+# Schema description given to the model (pruned per question by schema_pruning)
+SCHEMA = """
+Table: enforcement
+- "מס' דו''ח": report number
+direction: rtl
+- תאריך: date
+- יום: day
+- שעה: time
+- "קוד פקח": inspector code
+- "שם פקח": inspector name
+- "קוד רחוב": street code
+- "שם רחוב": street name
+- מיקום: location
+- "מס' בית": house number
+- עבירה: offense
+- "מס ' רישוי": vehicle registration number
+- סוג: type
+- צבע: color
+- תוצרת: make
+- נכה: disabled
+- מבוקש: wanted
+- "ננעל/נגרר": locked/towed
+- "כרטיס חניה 1": parking card 1
+- "כרטיס חניה 2": parking card 2
+- "תאריך קובע": determining date
+- "לתשלום עד": payment due date
+- קנס: fine
+- "הערת פקח 1": inspector note 1
+- "הערת פקח 2": inspector note 2
+- "הערת פקח 3": inspector note 3
+- "הערת פקח 4": inspector note 4
+- "אזור חניה": parking area
+- "אזור פיקוח": supervision area
+- "ת''ז": ID number
+- "שם משפחה": last name
+- "שם פרטי": first name
+- רחוב: street
+- "'מס": house number
+- דירה: apartment
+- עיר: city
+- מיקוד: postal code
+- שולם: paid
+- לתשלום: to pay
+- "תאריך תשלום": payment date
+- "ערעור מתאריך": appeal from date
+- "הסבה מתאריך": conversion from date
+- "בקשה להישפט": request for trial
+- "מספר יחודי": unique number
+- "סטטוס לדוח": report status
+- פעולה: action
+- "מספר שבב": chip number
+- "/דוח מוביל": leading report
+- "מספר דרכון": passport number
+- "ננעל/נגרר_flag": locked or towed (0/1)
+- "שולם_flag": fine paid in full (0/1; NULL when the fine is unknown)
+
+Table: financial_transactions
+- "מס' דו''ח": report number
+- תאריך: date
+- סוג: type
+- "ת.תשלום": payment date
+- חיוב: charge
+- זיכוי: credit
+- "ת. פירעון": repayment date
+
+Table: address_database
+- "מס' דו''ח": report number
+- תאריך: date
+- "ת.ז": ID number
+- "שם משפחה": last name
+- "שם פרטי": first name
+- רחוב: street
+- מס: house number
+- דירה: apartment
+- מיקוד: postal code
+- "ת.ד": PO box
+- עיר: city
+- מקור: source
+
+Table: report_data
+- "מס' דו''ח": report number
+- תאריך: date
+- יום: day
+- שעה: time
+- "קוד פקח": inspector code
+- "שם פקח": inspector name
+- "קוד רחוב": street code
+- "שם רחוב": street name
+- מיקום: location
+- "מס' בית": house number
+- עבירה: offense
+- "מס ' רישוי": vehicle registration number
+- סוג: type
+- צבע: color
+- תוצרת: make
+- נכה: disabled
+- מבוקש: wanted
+- "ננעל/נגרר": locked/towed
+- "כרטיס חניה 1": parking card 1
+- "כרטיס חניה 2": parking card 2
+- "תאריך קובע": determining date
+- "לתשלום עד": payment due date
+- קנס: fine
+- "הערת פקח 1": inspector note 1
+- "הערת פקח 2": inspector note 2
+- "הערת פקח 3": inspector note 3
+- "הערת פקח 4": inspector note 4
+- "אזור חניה": parking area
+- "אזור פיקוח": supervision area
+- "ת''ז": ID number
+- "שם משפחה": last name
+- "שם פרטי": first name
+- רחוב: street
+- "'מס": house number
+- דירה: apartment
+- עיר: city
+- מיקוד: postal code
+- שולם: paid
+- לתשלום: to pay
+- "תאריך תשלום": payment date
+- "ערעור מתאריך": appeal from date
+- "הסבה מתאריך": conversion from date
+- "בקשה להישפט": request for trial
+- "מספר יחודי": unique number
+- "הערות לדוח": report notes
+- "סטטוס לדוח": report status
+- פעולה: action
+- "מספר שבב": chip number
+- "/דוח מוביל": leading report
+- "מספר דרכון": passport number
+- "ננעל/נגרר_flag": locked or towed (0/1)
+- "שולם_flag": fine paid in full (0/1; NULL when the fine is unknown)
+
+Table: report_text_fts
+- "מס' דו''ח": report number (join key to enforcement and report_data)
+- source: table the row was indexed from ('enforcement' or 'report_data')
+- notes: inspector notes and report notes, normalized for full-text search
+- street: street name, normalized for full-text search
+- location: location, normalized for full-text search
+
+Table: rollup_flags_month
+- month: month of the report date (YYYY-MM)
+- report_count: enforcement reports in the month
+- disabled_count: reports with נכה = 1
+- wanted_count: reports with מבוקש = 1
+- locked_towed_count: reports with "ננעל/נגרר_flag" = 1
+- paid_count: reports with "שולם_flag" = 1
+"""
+
+# Question/SQL examples included in the SQL generation prompt
+EXAMPLES = [
+    {
+        "question": "What is the fine for report number 123?",
+        "sql": "SELECT קנס FROM enforcement WHERE \"מס' דו''ח\" = 123;",
+    },
+    {
+        "question": "How much was paid for report number 456?",
+        "sql": "SELECT שולם FROM report_data WHERE \"מס' דו''ח\" = 456;",
+    },
+    {
+        "question": "What is the address for the individual in report number 789?",
+        "sql": "SELECT רחוב, \"'מס\", דירה, עיר FROM address_database WHERE \"מס' דו''ח\" = 789;",
+    },
+    {
+        "question": "List all financial transactions for report number 101.",
+        "sql": "SELECT * FROM financial_transactions WHERE \"מס' דו''ח\" = 101;",
+    },
+    {
+        "question": "What is the offense and fine for report number 202?",
+        "sql": "SELECT עבירה, קנס FROM enforcement WHERE \"מס' דו''ח\" = 202;",
+    },
+    {
+        "question": "Which reports mention a blocked passage in the inspector notes?",
+        "sql": "SELECT e.\"מס' דו''ח\", e.תאריך, e.\"הערת פקח 1\" FROM report_text_fts JOIN enforcement e ON e.\"מס' דו''ח\" = report_text_fts.\"מס' דו''ח\" WHERE report_text_fts.source = 'enforcement' AND report_text_fts MATCH fts_query('חסימת מעבר', 'notes');",
+    },
+    {
+        "question": "What percentage of the tickets in 2024 were towed or locked vehicles?",
+        "sql": "SELECT ROUND(SUM(locked_towed_count) * 100.0 / SUM(report_count), 2) AS percentage FROM rollup_flags_month WHERE month BETWEEN '2024-01' AND '2024-12';",
+    },
+    {
+        "question": "How many wanted vehicles got tickets on Herzl street?",
+        "sql": "SELECT COUNT(*) FROM enforcement WHERE מבוקש = 1 AND \"שם רחוב\" = 'הרצל';",
+    },
+]
+
+# Date examples added to every prompt, to show how date filters are written
+DATE_EXAMPLES = [
+    {
+        "question": "How many tickets were issued in December 2024?",
+        "sql": "SELECT COUNT(*) FROM enforcement WHERE strftime('%Y-%m', date_formatted) = '2024-12';",
+    },
+    {
+        "question": "List the inspectors who issued tickets in the last quarter of 2024.",
+        "sql": "SELECT DISTINCT \"שם פקח\" FROM enforcement WHERE date_formatted >= '2024-10-01' AND date_formatted <= '2024-12-31';",
+    },
+    {
+        "question": "How many tickets did each inspector issue in the first month of 2024?",
+        "sql": "SELECT \"שם פקח\", COUNT(*) as ticket_count FROM enforcement WHERE date_formatted BETWEEN '2024-01-01' AND '2024-01-31' GROUP BY \"שם פקח\" ORDER BY ticket_count DESC;",
+    },
+]
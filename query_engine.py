@@ -0,0 +1,495 @@
+import os
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from connection_pool import get_read_connection
+from ingest import data_version
+from query_guard import QUERY_TIMEOUT_SECONDS, data_tables, query_budget
+
+try:
+    import duckdb
+except ImportError:  # Only the SQLite engine is available
+    duckdb = None
+
+DEFAULT_ENGINE = "sqlite"
+
+# The DuckDB copies of the reports database are stored next to it, one file
+# per data version ("reports-<version>.duckdb"): DuckDB hands out the already
+# open database for a path it has open, so a new copy needs a new name
+DUCKDB_SUFFIX = ".duckdb"
+
+# Rows per chunk when copying a SQLite table into DuckDB
+COPY_CHUNK_ROWS = 100_000
+
+# Table in the DuckDB copy recording which SQLite data version it holds
+DUCKDB_VERSION_TABLE = "_source_version"
+
+# Aggregate questions that make up most traffic, plus the date examples from
+# the prompt; used by the engine benchmark
+BENCHMARK_QUERIES = [
+    {
+        "question": "How many tickets were issued in December 2024?",
+        "sql": "SELECT COUNT(*) FROM enforcement WHERE strftime('%Y-%m', date_formatted) = '2024-12'",
+    },
+    {
+        "question": "List the inspectors who issued tickets in the last quarter of 2024.",
+        "sql": "SELECT DISTINCT \"שם פקח\" FROM enforcement WHERE date_formatted >= '2024-10-01' AND date_formatted <= '2024-12-31' ORDER BY 1",
+    },
+    {
+        "question": "How many tickets did each inspector issue in the first month of 2024?",
+        "sql": "SELECT \"שם פקח\", COUNT(*) as ticket_count FROM enforcement WHERE date_formatted BETWEEN '2024-01-01' AND '2024-01-31' GROUP BY \"שם פקח\" ORDER BY ticket_count DESC, 1",
+    },
+    {
+        "question": "Total fines per inspector",
+        "sql": "SELECT \"שם פקח\", SUM(קנס) AS total_fines, COUNT(*) AS tickets FROM enforcement GROUP BY \"שם פקח\" ORDER BY total_fines DESC, 1",
+    },
+    {
+        "question": "Tickets per month over all years",
+        "sql": "SELECT strftime('%Y-%m', date_formatted) AS month, COUNT(*) AS tickets FROM enforcement GROUP BY month ORDER BY month",
+    },
+    {
+        "question": "Average fine and paid share per offense",
+        "sql": "SELECT עבירה, AVG(קנס) AS avg_fine, SUM(שולם) * 100 / SUM(קנס) AS paid_pct FROM enforcement GROUP BY עבירה ORDER BY 1",
+    },
+    {
+        "question": "Charges and credits per year",
+        "sql": "SELECT substr(\"ת.תשלום\", 1, 4) AS year, SUM(חיוב) AS charges, SUM(זיכוי) AS credits FROM financial_transactions GROUP BY year ORDER BY year",
+    },
+    {
+        "question": "Tickets per inspector and area",
+        "sql": "SELECT \"שם פקח\", \"אזור פיקוח\", COUNT(*) AS tickets FROM enforcement GROUP BY 1, 2 ORDER BY 1, 2",
+    },
+]
+
+# Quoted identifiers and string literals, which dialect rewrites must not touch
+_QUOTED = re.compile(r"\"(?:[^\"]|\"\")*\"|'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"\x00(\d+)\x00")
+# A simple function argument: a placeholder, a word or a number
+_ARG = r"(\x00\d+\x00|[\w.]+)"
+
+
+def sqlite_to_duckdb(sql):
+    """
+    Rewrites the SQLite-only constructs the SQL generator produces into
+    DuckDB syntax. Literals and quoted identifiers are left untouched.
+    Anything not covered here fails in DuckDB and is rerun on SQLite.
+    """
+    literals = []
+
+    def hide(match):
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    def is_now(token):
+        match = _PLACEHOLDER.fullmatch(token)
+        return match is not None and literals[int(match.group(1))].lower() == "'now'"
+
+    def as_date(token):
+        return "current_date" if is_now(token) else f"CAST({token} AS DATE)"
+
+    text = _QUOTED.sub(hide, sql)
+    # strftime(format, value) -> strftime(value, format)
+    text = re.sub(
+        rf"\bstrftime\s*\(\s*{_ARG}\s*,\s*{_ARG}\s*\)",
+        lambda m: f"strftime({as_date(m.group(2))}, {m.group(1)})",
+        text,
+        flags=re.IGNORECASE,
+    )
+    text = re.sub(
+        rf"\bdate\s*\(\s*{_ARG}\s*\)",
+        lambda m: as_date(m.group(1)),
+        text,
+        flags=re.IGNORECASE,
+    )
+    text = re.sub(
+        rf"\bjulianday\s*\(\s*{_ARG}\s*\)",
+        lambda m: f"(epoch(CAST({m.group(1)} AS TIMESTAMP)) / 86400.0 + 2440587.5)",
+        text,
+        flags=re.IGNORECASE,
+    )
+    # SQLite's LIKE ignores (ASCII) case
+    text = re.sub(r"(?<!\w)(NOT\s+)?LIKE\b", r"\1ILIKE", text, flags=re.IGNORECASE)
+    return _PLACEHOLDER.sub(lambda m: literals[int(m.group(1))], text)
+
+
+class SQLiteEngine:
+    """
+    Runs queries on the pooled read-only SQLite connections
+    """
+
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+
+    def __init__(self, db_path="reports.db"):
+        self.db_path = db_path
+
+    def connection(self):
+        return get_read_connection(self.db_path)
+
+    @contextmanager
+    def budget(self):
+        with query_budget(self.connection()) as state:
+            yield state
+
+    def execute(self, sql, max_rows):
+        cursor = self.connection().cursor()
+        try:
+            cursor.execute(sql)
+            rows = cursor.fetchmany(max_rows)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            return rows, columns
+        finally:
+            cursor.close()
+
+
+def duckdb_type(declared_type):
+    """
+    Maps a SQLite declared column type to a DuckDB type by SQLite's affinity rules
+    """
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type:
+        return "BIGINT"
+    if any(name in declared_type for name in ("CHAR", "CLOB", "TEXT")) or not declared_type:
+        return "VARCHAR"
+    return "DOUBLE"
+
+
+def stored_type(conn, table, column):
+    """
+    DuckDB type for a column without a declared type (rollups are created
+    with CREATE TABLE AS), from the types of the values it holds
+    """
+    column = '"' + column.replace('"', '""') + '"'
+    kinds = {
+        row[0]
+        for row in conn.execute(
+            f"SELECT typeof({column}) FROM {table} WHERE {column} IS NOT NULL "
+            "GROUP BY 1"
+        )
+    }
+    if kinds == {"integer"}:
+        return "BIGINT"
+    if kinds and kinds <= {"integer", "real"}:
+        return "DOUBLE"
+    return "VARCHAR"
+
+
+def copy_to_duckdb(db_path, duckdb_path, version):
+    """
+    Copies every data table (and rollup) and view of the SQLite database into
+    a new DuckDB database file, replacing the old one only once the copy is
+    complete
+    """
+    partial = duckdb_path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    start = time.perf_counter()
+    source = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    target = duckdb.connect(partial)
+    try:
+        # Virtual (FTS) tables stay in SQLite; queries using them fall back
+        tables = data_tables(source)
+        for table_name in tables:
+            table = '"' + table_name.replace('"', '""') + '"'
+            columns = source.execute(f"PRAGMA table_info({table})").fetchall()
+            column_defs = ", ".join(
+                '"' + col[1].replace('"', '""') + '" '
+                + (duckdb_type(col[2]) if col[2] else stored_type(source, table, col[1]))
+                for col in columns
+            )
+            target.execute(f"CREATE TABLE {table} ({column_defs})")
+            for chunk in pd.read_sql_query(
+                f"SELECT * FROM {table}", source, chunksize=COPY_CHUNK_ROWS
+            ):
+                target.register("chunk", chunk)
+                target.execute(f"INSERT INTO {table} SELECT * FROM chunk")
+                target.unregister("chunk")
+        # Views (the report tables in shared storage) are recreated over the copies
+        for (view_sql,) in source.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'view'"
+        ).fetchall():
+            target.execute(view_sql)
+        target.execute(f"CREATE TABLE {DUCKDB_VERSION_TABLE} (version VARCHAR)")
+        target.execute(f"INSERT INTO {DUCKDB_VERSION_TABLE} VALUES (?)", [version])
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial, duckdb_path)
+    print(
+        f"Copied {len(tables)} tables to {duckdb_path} in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+
+
+def duckdb_path_for(db_path, version):
+    return f"{os.path.splitext(db_path)[0]}-{version[:16]}{DUCKDB_SUFFIX}"
+
+
+def remove_stale_copies(db_path, keep_paths):
+    """
+    Deletes the DuckDB copies of db_path other than keep_paths, including
+    the unversioned copy older builds made
+    """
+    base = os.path.splitext(db_path)[0]
+    directory = os.path.dirname(os.path.abspath(db_path))
+    prefix = os.path.basename(base)
+    keep = {os.path.abspath(path) for path in keep_paths}
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if (
+            name == prefix + DUCKDB_SUFFIX
+            or (name.startswith(prefix + "-") and name.endswith(DUCKDB_SUFFIX))
+        ) and path not in keep:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Could not remove DuckDB copy {path}: {e}")
+
+
+def duckdb_copy_version(duckdb_path):
+    if not os.path.exists(duckdb_path):
+        return None
+    try:
+        conn = duckdb.connect(duckdb_path, read_only=True)
+        try:
+            return conn.execute(f"SELECT version FROM {DUCKDB_VERSION_TABLE}").fetchone()[0]
+        finally:
+            conn.close()
+    except duckdb.Error:
+        return None
+
+
+class _DuckDBCopy:
+    """
+    An open DuckDB copy and the number of queries using it. A copy replaced
+    by a newer one is closed by its last user.
+    """
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.database = duckdb.connect(path, read_only=True)
+        # Integer division like SQLite, so results match across engines
+        self.database.execute("SET integer_division = true")
+        self.users = 0
+        self.retired = False
+
+    def close(self):
+        """
+        Closes a retired copy and deletes its file
+        """
+        self.database.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            print(f"Could not remove DuckDB copy {self.path}: {e}")
+
+
+class DuckDBEngine:
+    """
+    Runs queries on a columnar DuckDB copy of the reports database.
+
+    A new copy is made whenever the SQLite data version changes. It is
+    opened before it replaces the current one, and the old copy is closed
+    only once no query uses it. Queries are written for SQLite, so they are
+    translated first; a query DuckDB still rejects is rerun on SQLite, so
+    switching engines never loses answers.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, db_path="reports.db"):
+        self.db_path = db_path
+        self.fallback = SQLiteEngine(db_path)
+        self.errors = (duckdb.Error, sqlite3.Error)
+        # Guards _copy and the users/retired counts of every copy
+        self._lock = threading.Lock()
+        # Serializes making and opening new copies
+        self._refresh_lock = threading.Lock()
+        self._copy = None
+        self._local = threading.local()
+
+    def _acquire(self):
+        """
+        Returns the copy matching the current data version, counted as used
+        until _release
+        """
+        version = data_version(self.fallback.connection())
+        with self._lock:
+            copy = self._copy
+            if copy is not None and copy.version == version:
+                copy.users += 1
+                return copy
+
+        with self._refresh_lock:
+            with self._lock:
+                current = self._copy
+            if current is None or current.version != version:
+                path = duckdb_path_for(self.db_path, version)
+                if duckdb_copy_version(path) != version:
+                    copy_to_duckdb(self.db_path, path, version)
+                copy = _DuckDBCopy(path, version)
+                with self._lock:
+                    old, self._copy = self._copy, copy
+                    in_use = [copy.path]
+                    if old is not None:
+                        old.retired = True
+                        if old.users:
+                            in_use.append(old.path)
+                        else:
+                            old.database.close()
+                # An old copy still in use is deleted by its last user
+                remove_stale_copies(self.db_path, in_use)
+            with self._lock:
+                copy = self._copy
+                copy.users += 1
+                return copy
+
+    def _release(self, copy):
+        with self._lock:
+            copy.users -= 1
+            close = copy.retired and copy.users == 0
+        if close:
+            copy.close()
+
+    @contextmanager
+    def _cursor(self):
+        """
+        This thread's cursor on the current copy, which stays open until the
+        block ends. Nested blocks (execute inside budget) share the cursor.
+        """
+        local = self._local
+        if getattr(local, "held", None) is not None:
+            yield local.cursor
+            return
+        copy = self._acquire()
+        local.held = copy
+        try:
+            # Cursors are cached per copy; a new copy gets new cursors
+            if getattr(local, "copy", None) is not copy:
+                local.cursor = copy.database.cursor()
+                local.copy = copy
+            yield local.cursor
+        finally:
+            local.held = None
+            self._release(copy)
+
+    def connection(self):
+        """
+        Makes sure the copy matches the current data version (e.g. to build
+        it ahead of timed queries) and returns this thread's cursor on it
+        """
+        with self._cursor() as cursor:
+            return cursor
+
+    @contextmanager
+    def budget(self):
+        # The SQLite budget covers fallbacks; a timer interrupts DuckDB
+        with self.fallback.budget() as state, self._cursor() as conn:
+
+            def interrupt():
+                state["exceeded"] = "time"
+                conn.interrupt()
+
+            timer = threading.Timer(QUERY_TIMEOUT_SECONDS, interrupt)
+            timer.start()
+            try:
+                yield state
+            finally:
+                timer.cancel()
+
+    def execute(self, sql, max_rows):
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(sqlite_to_duckdb(sql))
+            except duckdb.InterruptException:
+                raise
+            except duckdb.Error as e:
+                print(f"DuckDB could not run the query ({e}); falling back to SQLite")
+                return self.fallback.execute(sql, max_rows)
+            rows = cursor.fetchmany(max_rows)
+            columns = (
+                [desc[0] for desc in cursor.description] if cursor.description else []
+            )
+            return rows, columns
+
+
+ENGINES = {"sqlite": SQLiteEngine, "duckdb": DuckDBEngine}
+
+
+def available_engines():
+    return [name for name in ENGINES if name != "duckdb" or duckdb is not None]
+
+
+def create_engine(name=DEFAULT_ENGINE, db_path="reports.db"):
+    """
+    Returns the named engine, or the SQLite engine when it is unavailable
+    """
+    if name not in available_engines():
+        print(f"Query engine {name!r} is not available; using {DEFAULT_ENGINE}")
+        name = DEFAULT_ENGINE
+    return ENGINES[name](db_path)
+
+
+def normalize_rows(rows):
+    """
+    Makes result rows comparable across engines (float noise, tuple types)
+    """
+    return [
+        tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+        for row in rows
+    ]
+
+
+def benchmark_engines(db_path="reports.db", engines=None, repeat=5, queries=None):
+    """
+    Times every benchmark query on each engine (median of `repeat` runs after
+    a warm-up) and checks that the engines return the same rows
+    """
+    engines = engines or available_engines()
+    queries = queries or BENCHMARK_QUERIES
+    instances = {name: create_engine(name, db_path) for name in engines}
+    for engine in instances.values():
+        engine.connection()  # Builds the DuckDB copy outside the timings
+
+    report = []
+    for query in queries:
+        entry = {"question": query["question"], "ms": {}}
+        results = {}
+        for name, engine in instances.items():
+            results[name] = normalize_rows(engine.execute(query["sql"], 100_000)[0])
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                engine.execute(query["sql"], 100_000)
+                timings.append((time.perf_counter() - start) * 1000)
+            entry["ms"][name] = round(statistics.median(timings), 2)
+        first = next(iter(results.values()))
+        entry["same_results"] = all(rows == first for rows in results.values())
+        report.append(entry)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark the query engines")
+    parser.add_argument("--db", default="reports.db")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--engines", nargs="+", default=None)
+    args = parser.parse_args()
+
+    print(
+        json.dumps(
+            benchmark_engines(args.db, args.engines, args.repeat),
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
@@ -0,0 +1,395 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Wall-clock limit for a single query, including fetching its rows
+QUERY_TIMEOUT_SECONDS = 15.0
+
+# SQLite VM instructions a single query may execute
+QUERY_MAX_VM_STEPS = 2_000_000_000
+
+# The progress handler runs every this many VM instructions
+PROGRESS_INTERVAL = 100_000
+
+# Tables above this many rows count as large for the plan pre-check
+LARGE_TABLE_ROWS = 100_000
+
+# What the caller should do about an issue
+ACTION_REWRITE = "rewrite"  # too expensive to run; ask for a cheaper query or reject
+ACTION_LIMIT = "limit"  # run it, but only with a row limit
+ACTION_WARN = "warn"  # run it; the budget still bounds it
+
+_AGGREGATE = re.compile(r"\b(GROUP\s+BY|COUNT|SUM|AVG|MIN|MAX|TOTAL)\b", re.I)
+_LIMIT = re.compile(r"\bLIMIT\s+\d+", re.I)
+_LEADING_WILDCARD = re.compile(r"\bLIKE\s+'%", re.I)
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\S+)(.*)$")
+_SEARCH = re.compile(
+    r"^SEARCH (?:TABLE )?(\S+) USING (?:COVERING )?INDEX \S+ \((.*)\)$"
+)
+_CONSTRAINT = re.compile(r"^(.+?)(?:=|>|<)")
+_FROM_TABLE = re.compile(r'(?:\bFROM|\bJOIN|,)\s+("(?:[^"]|"")+"|\w+)', re.I)
+_VIEW_TABLE = re.compile(r'\bFROM\s+("(?:[^"]|"")+"|\w+)', re.I)
+_VIEW_FILTER = re.compile(r"\bWHERE\b(.*)$", re.I | re.S)
+_QUALIFIED_COLUMN = re.compile(r'\w+\.("(?:[^"]|"")+"|\w+)')
+_TABLE_ALIAS = re.compile(
+    r'(?:\bFROM|\bJOIN|,)\s+("(?:[^"]|"")+"|\w+)\s+(?:AS\s+)?("(?:[^"]|"")+"|\w+)',
+    re.I,
+)
+_QUOTED = re.compile(r"\"(?:[^\"]|\"\")*\"|'(?:[^']|'')*'|`[^`]*`|\[[^\]]*\]")
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.I)
+_TRAILING_LIMIT = re.compile(
+    r"\bLIMIT\s+(\d+)(?:\s+OFFSET\s+(\d+)|\s*,\s*(\d+))?\s*$", re.I
+)
+_NOT_ALIASES = {
+    "where", "join", "inner", "left", "right", "cross", "full", "natural",
+    "on", "using", "group", "order", "limit", "having", "union", "except",
+    "intersect", "window", "outer", "from", "as", "and", "or",
+}
+
+# db path -> (data version, {table: row count}) of the latest version seen;
+# shared by every session thread
+_row_counts = {}
+_row_counts_lock = threading.Lock()
+
+
+@contextmanager
+def query_budget(conn, timeout=QUERY_TIMEOUT_SECONDS, max_steps=QUERY_MAX_VM_STEPS):
+    """
+    Installs a progress handler that interrupts the statement once it runs
+    longer than `timeout` seconds or more than `max_steps` VM instructions.
+
+    Yields a dict whose "exceeded" key is set to "time" or "steps" when the
+    budget interrupted the query (SQLite then raises OperationalError).
+    """
+    state = {"steps": 0, "exceeded": None}
+    deadline = time.perf_counter() + timeout
+
+    def handler():
+        state["steps"] += PROGRESS_INTERVAL
+        if state["steps"] > max_steps:
+            state["exceeded"] = "steps"
+            return 1
+        if time.perf_counter() > deadline:
+            state["exceeded"] = "time"
+            return 1
+        return 0
+
+    conn.set_progress_handler(handler, PROGRESS_INTERVAL)
+    try:
+        yield state
+    finally:
+        conn.set_progress_handler(None, PROGRESS_INTERVAL)
+
+
+def _unquote(name):
+    return name.strip('"').replace('""', '"')
+
+
+def table_aliases(sql):
+    """
+    Maps the aliases used in FROM/JOIN clauses (and comma joins) to table
+    names, since EXPLAIN QUERY PLAN reports scans by alias
+    """
+    aliases = {}
+    for table_name, alias in _TABLE_ALIAS.findall(sql):
+        table_name = _unquote(table_name)
+        alias = _unquote(alias)
+        if alias.lower() not in _NOT_ALIASES:
+            aliases[alias] = table_name
+    return aliases
+
+
+def view_definitions(conn):
+    """
+    Returns {view: {"table", "aliases", "filter_columns"}}: the table each
+    view reads (the first of its FROM clause), the aliases inside its
+    definition and the columns of its WHERE clause. SQLite flattens views,
+    so EXPLAIN QUERY PLAN reports their scans by those inner aliases.
+    """
+    views = {}
+    for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'view'"
+    ).fetchall():
+        match = _VIEW_TABLE.search(sql or "")
+        if not match:
+            continue
+        where = _VIEW_FILTER.search(sql)
+        filters = _QUALIFIED_COLUMN.findall(where.group(1)) if where else []
+        views[name] = {
+            "table": _unquote(match.group(1)),
+            "aliases": table_aliases(sql),
+            "filter_columns": {_unquote(column) for column in filters},
+        }
+    return views
+
+
+def full_scans(conn, sql, plan):
+    """
+    Returns [(parent, name, stored table)] for the full table scans of a
+    query plan. name is the table or view the query used, stored table the
+    one whose rows are read (a view's underlying table).
+
+    A view's scan shows up as a scan of its underlying table, under the
+    alias used inside the view; searching that table only by the view's own
+    filter (e.g. report_rows.source_mask, which nearly every row matches)
+    also counts as a full scan.
+    """
+    views = view_definitions(conn)
+    aliases = table_aliases(sql)
+    # Views the query reads, in order, to name the flattened scans after
+    referenced = [
+        table_name
+        for table_name in (_unquote(t) for t in _FROM_TABLE.findall(sql))
+        if table_name in views
+    ]
+    inner_aliases = {}
+    for view in views.values():
+        for alias, table_name in view["aliases"].items():
+            inner_aliases.setdefault(alias, (table_name, view["filter_columns"]))
+
+    scans = []
+    for _, parent, _, detail in plan:
+        scan, search = _SCAN.match(detail), _SEARCH.match(detail)
+        if scan and "INDEX" not in scan.group(2):
+            name, constraints = scan.group(1), None
+        elif search:
+            name, constraints = search.group(1), search.group(2).split(" AND ")
+        else:
+            continue
+
+        table_name = aliases.get(name, name)
+        if table_name in views:
+            # A view that was not flattened (e.g. materialized)
+            shown = table_name
+            stored = views[table_name]["table"]
+            filters = views[table_name]["filter_columns"]
+        elif name not in aliases and name in inner_aliases:
+            stored, filters = inner_aliases[name]
+            shown = next((v for v in referenced if views[v]["table"] == stored), stored)
+            if shown in referenced:
+                referenced.remove(shown)
+        else:
+            shown = stored = table_name
+            filters = set()
+
+        if constraints is not None:
+            columns = {
+                match.group(1).strip()
+                for match in map(_CONSTRAINT.match, constraints)
+                if match
+            }
+            if not columns or not columns <= filters:
+                continue  # A real index search
+        scans.append((parent, shown, stored))
+    return scans
+
+
+def data_tables(conn):
+    """
+    Names of the regular data tables: internal (_-prefixed) and SQLite tables
+    are skipped, as are virtual tables (FTS) and their shadow tables
+    """
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' "
+        "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '\\_%' ESCAPE '\\'"
+    ).fetchall()
+    virtual = [
+        name for name, sql in rows if (sql or "").upper().startswith("CREATE VIRTUAL")
+    ]
+    return [
+        name
+        for name, _ in rows
+        if not any(name == v or name.startswith(v + "_") for v in virtual)
+    ]
+
+
+def database_path(conn):
+    """
+    File of the connection's main database ("" for an in-memory one)
+    """
+    for _, name, path in conn.execute("PRAGMA database_list").fetchall():
+        if name == "main":
+            return path
+    return ""
+
+
+def table_row_counts(conn, version=None):
+    """
+    Approximate row count per data table (MAX(rowid), an index lookup),
+    memoized per (database, data version)
+    """
+    key = database_path(conn)
+    if version is not None:
+        with _row_counts_lock:
+            cached = _row_counts.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    counts = {}
+    for name in data_tables(conn):
+        quoted = '"' + name.replace('"', '""') + '"'
+        counts[name] = conn.execute(f"SELECT MAX(rowid) FROM {quoted}").fetchone()[0] or 0
+    if version is not None and key:
+        with _row_counts_lock:
+            _row_counts[key] = (version, counts)
+    return counts
+
+
+def check_query_plan(conn, sql, version=None):
+    """
+    Runs EXPLAIN QUERY PLAN and flags expensive shapes before execution.
+    Views are sized by the table they read (see full_scans).
+
+    Returns a list of issues {"kind", "table", "action", "message"}:
+    - "cartesian": two large tables fully scanned in the same nested loop
+      (a missing or non-indexable join condition) -> ACTION_REWRITE
+    - "full_scan": a large table scanned for a non-aggregate query with no
+      LIMIT -> ACTION_LIMIT
+    - "wildcard_like": LIKE '%...' over a fully scanned large table -> ACTION_WARN
+    """
+    counts = table_row_counts(conn, version)
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+
+    large_scans = {}
+    sizes = {}
+    for parent, table_name, stored in full_scans(conn, sql, plan):
+        if counts.get(stored, 0) >= LARGE_TABLE_ROWS:
+            large_scans.setdefault(parent, []).append(table_name)
+            sizes[table_name] = counts[stored]
+
+    issues = []
+    for tables in large_scans.values():
+        if len(tables) > 1:
+            issues.append(
+                {
+                    "kind": "cartesian",
+                    "table": ", ".join(tables),
+                    "action": ACTION_REWRITE,
+                    "message": (
+                        f"Tables {', '.join(tables)} are joined without a usable "
+                        "join condition (cartesian product)"
+                    ),
+                }
+            )
+
+    scanned = sorted({t for tables in large_scans.values() for t in tables})
+    aggregate = bool(_AGGREGATE.search(sql))
+    for table_name in scanned:
+        if _LEADING_WILDCARD.search(sql):
+            issues.append(
+                {
+                    "kind": "wildcard_like",
+                    "table": table_name,
+                    "action": ACTION_WARN,
+                    "message": f"LIKE '%...' forces a full scan of {table_name}",
+                }
+            )
+        if not aggregate and not _LIMIT.search(sql):
+            issues.append(
+                {
+                    "kind": "full_scan",
+                    "table": table_name,
+                    "action": ACTION_LIMIT,
+                    "message": (
+                        f"Full scan of {table_name} "
+                        f"({sizes[table_name]:,} rows) without a LIMIT"
+                    ),
+                }
+            )
+    return issues
+
+
+def top_level_sql(sql):
+    """
+    sql with its literals, quoted names and parenthesized parts (subqueries,
+    CTE bodies, window definitions) blanked out, keeping every offset, so
+    clauses of the outer statement can be found with regexes
+    """
+    text = _QUOTED.sub(lambda m: " " * len(m.group(0)), sql)
+    chars = []
+    depth = 0
+    for char in text:
+        if char == "(":
+            depth += 1
+        chars.append(char if depth == 0 else " ")
+        if char == ")":
+            depth = max(depth - 1, 0)
+    return "".join(chars)
+
+
+def result_column_count(conn, sql):
+    """
+    Number of columns a query returns; LIMIT 0 stops before any row is read
+    """
+    return len(conn.execute(f"SELECT * FROM ({sql}) LIMIT 0").description)
+
+
+def paged_query(sql, limit, offset, column_count):
+    """
+    Returns sql restricted to `limit` rows starting at `offset`, in a stable
+    order so consecutive pages neither overlap nor skip rows: the query's own
+    ORDER BY when it has one, else every result column (column_count of
+    them). A query's own trailing LIMIT/OFFSET is folded into the page's.
+    """
+    outer = top_level_sql(sql)
+    ordered = _ORDER_BY.search(outer) is not None
+    order_by = "" if ordered else " ORDER BY " + ", ".join(
+        str(i) for i in range(1, column_count + 1)
+    )
+    match = _TRAILING_LIMIT.search(outer)
+    if match is None and re.search(r"\bLIMIT\b", outer, re.I) is None:
+        return f"{sql}{order_by} LIMIT {int(limit)} OFFSET {int(offset)}"
+    if match is None:
+        # A LIMIT that is not a plain number: page over the query's rows
+        return (
+            f"SELECT * FROM ({sql}) ORDER BY "
+            + ", ".join(str(i) for i in range(1, column_count + 1))
+            + f" LIMIT {int(limit)} OFFSET {int(offset)}"
+        )
+    if match.group(3) is not None:  # LIMIT offset, count
+        own_offset, own_limit = int(match.group(1)), int(match.group(3))
+    else:
+        own_limit, own_offset = int(match.group(1)), int(match.group(2) or 0)
+    page_limit = max(0, min(int(limit), own_limit - int(offset)))
+    return (
+        f"{sql[:match.start()].rstrip()}{order_by} "
+        f"LIMIT {page_limit} OFFSET {own_offset + int(offset)}"
+    )
+
+
+def blocking_issues(issues):
+    """
+    Issues that must not run as-is
+    """
+    return [issue for issue in issues if issue["action"] == ACTION_REWRITE]
+
+
+def sanitize_sql_query(sql_query):
+    """
+    Sanitize and fix common SQL query issues
+    """
+    # Remove any trailing semicolons that could cause 'you can only execute one statement' errors
+    sql_query = sql_query.strip()
+    if sql_query.endswith(";"):
+        sql_query = sql_query[:-1]
+
+    # Remove any additional statements that might be present
+    if ";" in sql_query:
+        sql_query = sql_query.split(";")[0]
+
+    # Fix common issues with SQLite's handling of division and CAST
+    if "CAST(" in sql_query and "AS FLOAT" in sql_query:
+        # SQLite doesn't handle CAST(x AS FLOAT) well, replace with CAST(x AS REAL)
+        sql_query = sql_query.replace("AS FLOAT", "AS REAL")
+
+    # Handle alternative syntax for percentage calculation
+    if "percentage" in sql_query.lower() and "/" in sql_query:
+        # Check for potentially problematic division operations
+        # SQLite might need explicit casting to avoid integer division
+        if not "1.0" in sql_query and not "100.0" in sql_query:
+            sql_query = sql_query.replace("* 100", "* 100.0")
+            sql_query = sql_query.replace("/ COUNT", "/ CAST(COUNT")
+            if not "AS REAL" in sql_query and "))" in sql_query:
+                sql_query = sql_query.replace("))", " AS REAL))")
+
+    return sql_query
@@ -0,0 +1,204 @@
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import pandas as pd
+
+QUESTION_CACHE_TABLE = "_question_cache"
+
+# Cache hits are counted in memory and written to the cache table in one
+# transaction once this many are pending (or with the next store/forget),
+# so lookups stay read-only
+HIT_FLUSH_COUNT = 20
+
+# (db_path, question_key) -> [hits, last_used_at] not yet written
+_pending_hits = {}
+_hits_lock = threading.Lock()
+
+# Hebrew final letters and their regular forms
+FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+
+# Geresh/gershayim and quotes are removed inside words (דו״ח == דוח)
+_QUOTES = re.compile("[\"'`\u05f3\u05f4\u2019\u201d]")
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+# normalize_series removes the combining marks of the Basic Multilingual
+# Plane (niqqud, accents) and maps final letters in one str.translate
+_SERIES_TRANSLATION = {
+    **{
+        code: None
+        for code in range(0x300, 0x10000)
+        if unicodedata.combining(chr(code))
+    },
+    **FINAL_LETTERS,
+}
+
+
+def normalize_question(question):
+    """
+    Normalizes a Hebrew/English question for cache lookups: niqqud and
+    punctuation are removed, final letters are mapped to their regular form,
+    English is lowercased and whitespace is collapsed
+    """
+    text = unicodedata.normalize("NFKD", question)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.translate(FINAL_LETTERS).lower()
+    text = _QUOTES.sub("", text)
+    text = _PUNCTUATION.sub(" ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def normalize_series(values):
+    """
+    normalize_question over a pandas Series of strings (None/NaN become ""),
+    with vectorized string operations over its distinct values
+    """
+    values = values.fillna("").astype(str)
+    distinct = pd.Series(values.unique())
+    text = distinct.str.normalize("NFKD")
+    text = text.str.translate(_SERIES_TRANSLATION).str.lower()
+    text = text.str.replace(_QUOTES, "", regex=True)
+    text = text.str.replace(_PUNCTUATION, " ", regex=True)
+    text = text.str.replace(r"\s+", " ", regex=True).str.strip()
+    codes = pd.Index(distinct).get_indexer(values)
+    return pd.Series(text.to_numpy()[codes], index=values.index)
+
+
+def ensure_question_cache_table(conn):
+    conn.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS {QUESTION_CACHE_TABLE} (
+        question_key TEXT PRIMARY KEY,
+        question TEXT NOT NULL,
+        sql TEXT NOT NULL,
+        schema_version INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used_at REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+    """
+    )
+
+
+def lookup_cached_sql(question, db_path="reports.db"):
+    """
+    Returns the validated SQL previously generated for this question, or None.
+    Entries stored under another table layout (PRAGMA user_version) are ignored.
+    """
+    key = normalize_question(question)
+    if not key:
+        return None
+    conn = sqlite3.connect(db_path, timeout=1.0)
+    try:
+        ensure_question_cache_table(conn)
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        row = conn.execute(
+            f"SELECT sql FROM {QUESTION_CACHE_TABLE} "
+            "WHERE question_key = ? AND schema_version = ?",
+            (key, schema_version),
+        ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Question cache error: {e}")
+        return None
+    finally:
+        conn.close()
+    if row is None:
+        return None
+
+    with _hits_lock:
+        pending = _pending_hits.setdefault((db_path, key), [0, 0.0])
+        pending[0] += 1
+        pending[1] = time.time()
+        pending_count = sum(
+            hits for (path, _), (hits, _) in _pending_hits.items() if path == db_path
+        )
+    if pending_count >= HIT_FLUSH_COUNT:
+        flush_cache_hits(db_path)
+    return row[0]
+
+
+def flush_cache_hits(db_path="reports.db", conn=None):
+    """
+    Writes the pending hit counts of db_path's cache entries. Uses (and
+    does not commit) conn when given.
+    """
+    with _hits_lock:
+        updates = [
+            (hits, last_used_at, key)
+            for (path, key), (hits, last_used_at) in _pending_hits.items()
+            if path == db_path
+        ]
+        for _, _, key in updates:
+            del _pending_hits[(db_path, key)]
+    if not updates:
+        return
+    own = conn is None
+    if own:
+        conn = sqlite3.connect(db_path, timeout=1.0)
+    try:
+        conn.executemany(
+            f"UPDATE {QUESTION_CACHE_TABLE} SET hits = hits + ?, "
+            "last_used_at = MAX(last_used_at, ?) WHERE question_key = ?",
+            updates,
+        )
+        if own:
+            conn.commit()
+    except sqlite3.Error as e:
+        # Hit counts are statistics only; losing a batch is harmless
+        print(f"Question cache error: {e}")
+    finally:
+        if own:
+            conn.close()
+
+
+def store_question_sql(question, sql, db_path="reports.db"):
+    """
+    Remembers the SQL that answered a question with at least one row
+    """
+    key = normalize_question(question)
+    if not key:
+        return
+    conn = sqlite3.connect(db_path, timeout=1.0)
+    try:
+        ensure_question_cache_table(conn)
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        now = time.time()
+        conn.execute(
+            f"""
+        INSERT OR REPLACE INTO {QUESTION_CACHE_TABLE}
+            (question_key, question, sql, schema_version, created_at, last_used_at, hits)
+        VALUES (?, ?, ?, ?, ?, ?, 0)
+        """,
+            (key, question, sql, schema_version, now, now),
+        )
+        flush_cache_hits(db_path, conn)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Question cache error: {e}")
+    finally:
+        conn.close()
+
+
+def forget_question_sql(question, db_path="reports.db"):
+    """
+    Drops a question's cached SQL, e.g. when replaying it failed or
+    returned no rows
+    """
+    key = normalize_question(question)
+    if not key:
+        return
+    with _hits_lock:
+        _pending_hits.pop((db_path, key), None)
+    conn = sqlite3.connect(db_path, timeout=1.0)
+    try:
+        ensure_question_cache_table(conn)
+        conn.execute(
+            f"DELETE FROM {QUESTION_CACHE_TABLE} WHERE question_key = ?", (key,)
+        )
+        flush_cache_hits(db_path, conn)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Question cache error: {e}")
+    finally:
+        conn.close()
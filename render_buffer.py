@@ -0,0 +1,88 @@
+import threading
+import time
+
+# Flush cadence for streamed answers
+FLUSH_INTERVAL_SECONDS = 0.05
+
+# Flush early once this many characters are waiting
+MAX_PENDING_CHARS = 400
+
+_totals = {"answers": 0, "tokens": 0, "renders": 0, "bytes_pushed": 0}
+_totals_lock = threading.Lock()
+
+
+class StreamRenderBuffer:
+    """
+    Coalesces streamed tokens and re-renders on a time/size cadence.
+
+    Streamlit placeholders can only be replaced, not appended to, so every
+    render sends the whole answer so far. Rendering once per token is O(n²)
+    in bytes; rendering every FLUSH_INTERVAL_SECONDS (or once
+    MAX_PENDING_CHARS are pending) keeps the number of renders proportional
+    to the streaming time instead of the token count.
+    """
+
+    def __init__(
+        self,
+        render,
+        interval=FLUSH_INTERVAL_SECONDS,
+        max_pending_chars=MAX_PENDING_CHARS,
+    ):
+        self.render = render
+        self.interval = interval
+        self.max_pending_chars = max_pending_chars
+        self.text = ""
+        self.pending_chars = 0
+        self.last_flush = time.perf_counter()
+        self.tokens = 0
+        self.renders = 0
+        self.bytes_pushed = 0
+
+    def add(self, token):
+        self.text += token
+        self.tokens += 1
+        self.pending_chars += len(token)
+        if (
+            self.pending_chars >= self.max_pending_chars
+            or time.perf_counter() - self.last_flush >= self.interval
+        ):
+            self.flush()
+
+    def flush(self):
+        if self.pending_chars == 0 and self.renders:
+            return
+        rendered = self.render(self.text)
+        self.renders += 1
+        self.bytes_pushed += len(rendered.encode("utf-8"))
+        self.pending_chars = 0
+        self.last_flush = time.perf_counter()
+
+    def close(self):
+        """
+        Renders whatever is still pending and records the stream's counters
+        """
+        self.flush()
+        with _totals_lock:
+            _totals["answers"] += 1
+            _totals["tokens"] += self.tokens
+            _totals["renders"] += self.renders
+            _totals["bytes_pushed"] += self.bytes_pushed
+        print(
+            f"Answer rendered: {self.tokens} tokens, {self.renders} renders, "
+            f"{self.bytes_pushed:,} bytes pushed"
+        )
+
+    def stats(self):
+        return {
+            "tokens": self.tokens,
+            "renders": self.renders,
+            "bytes_pushed": self.bytes_pushed,
+        }
+
+
+def render_totals():
+    """
+    Process-wide rendering counters across all streamed answers
+    """
+    with _totals_lock:
+        return dict(_totals)
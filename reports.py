@@ -0,0 +1,320 @@
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from ingest import data_version
+
+try:
+    import openpyxl
+except ImportError:  # Reports are written as CSV only
+    openpyxl = None
+
+# Report types offered in the Reports tab
+REPORT_TYPES = ["monthly", "quarterly", "yearly", "custom"]
+
+REPORT_OUTPUT_DIR = "generated_reports"
+
+# Rollup tables a report is computed from (see ingest.ROLLUP_TABLES)
+REPORT_ROLLUPS = [
+    "rollup_inspector_month",
+    "rollup_area_month",
+    "rollup_payments_month",
+]
+
+# Sections of every report, in output order; one CSV file / Excel sheet each
+REPORT_SECTIONS = ["summary", "by_month", "by_inspector", "by_area", "payments"]
+
+HEBREW_MONTHS = [
+    "ינואר", "פברואר", "מרץ", "אפריל", "מאי", "יוני",
+    "יולי", "אוגוסט", "ספטמבר", "אוקטובר", "נובמבר", "דצמבר",
+]
+
+
+def make_period(report_type, start_month, end_month=None):
+    """
+    Builds a period dict: {"type", "start", "end", "key", "label"}.
+
+    Months are "YYYY-MM" strings. For monthly, quarterly and yearly reports
+    only start_month is needed; the end is derived from the report type.
+    """
+    year, month = int(start_month[:4]), int(start_month[5:7])
+    if report_type == "monthly":
+        end_month = start_month
+        key = start_month
+        label = f"{HEBREW_MONTHS[month - 1]} {year}"
+    elif report_type == "quarterly":
+        quarter = (month - 1) // 3 + 1
+        start_month = f"{year}-{(quarter - 1) * 3 + 1:02d}"
+        end_month = f"{year}-{quarter * 3:02d}"
+        key = f"{year}-Q{quarter}"
+        label = f"רבעון {quarter} {year}"
+    elif report_type == "yearly":
+        start_month, end_month = f"{year}-01", f"{year}-12"
+        key = str(year)
+        label = str(year)
+    elif report_type == "custom":
+        end_month = end_month or start_month
+        key = f"{start_month}_{end_month}"
+        label = f"{start_month} - {end_month}"
+    else:
+        raise ValueError(f"Unknown report type: {report_type}")
+    return {
+        "type": report_type,
+        "start": start_month,
+        "end": end_month,
+        "key": key,
+        "label": label,
+    }
+
+
+def report_periods(report_type, months):
+    """
+    Returns every period of the given type that covers at least one of the months
+    """
+    if report_type == "custom":
+        return [make_period("custom", months[0], months[-1])] if months else []
+    periods = {}
+    for month in months:
+        period = make_period(report_type, month)
+        periods.setdefault(period["key"], period)
+    return list(periods.values())
+
+
+def load_rollups(db_path="reports.db"):
+    """
+    Reads the rollup tables once; every report period is sliced from these
+    """
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    try:
+        rollups = {
+            name: pd.read_sql_query(f"SELECT * FROM {name}", conn)
+            for name in REPORT_ROLLUPS
+        }
+        version = data_version(conn)
+    finally:
+        conn.close()
+    return rollups, version
+
+
+def in_period(frame, period):
+    return frame[frame["month"].between(period["start"], period["end"])]
+
+
+def build_report(rollups, period):
+    """
+    Computes the report sections for one period from the loaded rollups
+    """
+    inspectors = in_period(rollups["rollup_inspector_month"], period)
+    areas = in_period(rollups["rollup_area_month"], period)
+    payments = in_period(rollups["rollup_payments_month"], period)
+    totals = ["report_count", "fine_total", "paid_total"]
+    area_keys = ["supervision_area", "parking_area"]
+
+    by_month = inspectors.groupby("month", as_index=False)[totals].sum()
+    by_inspector = (
+        inspectors.groupby("inspector", as_index=False)[totals]
+        .sum()
+        .sort_values("report_count", ascending=False)
+    )
+    by_area = (
+        areas.groupby(area_keys, as_index=False, dropna=False)[totals]
+        .sum()
+        .sort_values("report_count", ascending=False)
+    )
+
+    fine_total = inspectors["fine_total"].sum()
+    summary = pd.DataFrame(
+        [
+            {
+                "period": period["label"],
+                "start_month": period["start"],
+                "end_month": period["end"],
+                "report_count": int(inspectors["report_count"].sum()),
+                "fine_total": fine_total,
+                "paid_total": inspectors["paid_total"].sum(),
+                "collection_rate": (
+                    round(inspectors["paid_total"].sum() / fine_total * 100, 1)
+                    if fine_total
+                    else None
+                ),
+                "inspectors": inspectors["inspector"].nunique(),
+                "transaction_count": int(payments["transaction_count"].sum()),
+                "charge_total": payments["charge_total"].sum(),
+                "credit_total": payments["credit_total"].sum(),
+            }
+        ]
+    )
+    return {
+        "summary": summary,
+        "by_month": by_month,
+        "by_inspector": by_inspector,
+        "by_area": by_area,
+        "payments": payments,
+    }
+
+
+def report_dir(output_dir, version, period):
+    """
+    Directory of one generated report; its path is the (type, period, data
+    version) cache key, so a rebuilt database never serves stale files
+    """
+    return os.path.join(output_dir, version, period["type"], period["key"])
+
+
+def report_files(directory):
+    """
+    Returns {format: [paths]} for a finished report directory, or None
+    """
+    files = {"csv": [os.path.join(directory, f"{s}.csv") for s in REPORT_SECTIONS]}
+    if openpyxl is not None:
+        files["xlsx"] = [os.path.join(directory, "report.xlsx")]
+    if all(os.path.exists(p) for paths in files.values() for p in paths):
+        return files
+    return None
+
+
+def write_report(sections, directory):
+    """
+    Writes one report as a CSV per section plus an Excel workbook (one sheet
+    per section) when openpyxl is available. Files are written to a private
+    temporary directory and renamed into place, so a partial report is never
+    cached and sessions writing the same report do not clash; the first
+    complete copy wins.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    partial = tempfile.mkdtemp(
+        prefix=os.path.basename(directory) + ".", suffix=".partial", dir=parent
+    )
+    try:
+        for name, frame in sections.items():
+            # utf-8-sig so Excel opens the Hebrew CSVs correctly
+            frame.to_csv(
+                os.path.join(partial, f"{name}.csv"), index=False, encoding="utf-8-sig"
+            )
+        if openpyxl is not None:
+            workbook = os.path.join(partial, "report.xlsx")
+            with pd.ExcelWriter(workbook, engine="openpyxl") as writer:
+                for name, frame in sections.items():
+                    frame.to_excel(writer, sheet_name=name, index=False)
+        if report_files(directory) is None:
+            # Left over from an interrupted or older writer
+            shutil.rmtree(directory, ignore_errors=True)
+        try:
+            os.replace(partial, directory)
+        except OSError:
+            # Another session put the same report in place first
+            if report_files(directory) is None:
+                raise
+    finally:
+        shutil.rmtree(partial, ignore_errors=True)
+    return report_files(directory)
+
+
+def generate_report_files(rollups, period, directory):
+    """
+    Process pool worker: builds and writes one period's report
+    """
+    start = time.perf_counter()
+    write_report(build_report(rollups, period), directory)
+    return round(time.perf_counter() - start, 3)
+
+
+def remove_stale_reports(output_dir, version):
+    """
+    Deletes reports generated from earlier builds of the database
+    """
+    if not os.path.isdir(output_dir):
+        return
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if name != version and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def generate_reports(
+    db_path="reports.db", periods=(), output_dir=REPORT_OUTPUT_DIR, parallel=True
+):
+    """
+    Generates the reports for the given periods and returns
+    {period key: {"period", "files", "cached", "seconds"}}.
+
+    Periods already generated for the current data version are served from
+    disk. The rest are built from a single read of the rollup tables, in a
+    process pool when there is more than one of them and more than one core.
+    """
+    rollups, version = load_rollups(db_path)
+    remove_stale_reports(output_dir, version)
+
+    results = {}
+    pending = {}
+    for period in periods:
+        directory = report_dir(output_dir, version, period)
+        files = report_files(directory)
+        if files is not None:
+            results[period["key"]] = {
+                "period": period,
+                "files": files,
+                "cached": True,
+                "seconds": 0.0,
+            }
+        else:
+            pending[period["key"]] = (period, directory)
+
+    if parallel and len(pending) > 1 and (os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(len(pending), os.cpu_count() or 1)
+        ) as pool:
+            futures = {
+                key: pool.submit(generate_report_files, rollups, period, directory)
+                for key, (period, directory) in pending.items()
+            }
+            seconds = {key: future.result() for key, future in futures.items()}
+    else:
+        seconds = {
+            key: generate_report_files(rollups, period, directory)
+            for key, (period, directory) in pending.items()
+        }
+
+    for key, (period, directory) in pending.items():
+        results[key] = {
+            "period": period,
+            "files": report_files(directory),
+            "cached": False,
+            "seconds": seconds[key],
+        }
+    print(
+        f"Reports: {len(pending)} generated, {len(results) - len(pending)} "
+        f"served from cache (data version {version})"
+    )
+    return results
+
+
+def read_report(files):
+    """
+    Loads a generated report's sections back from its CSV files
+    """
+    return {
+        os.path.splitext(os.path.basename(path))[0]: pd.read_csv(
+            path, encoding="utf-8-sig"
+        )
+        for path in files["csv"]
+    }
+
+
+def report_archive(files):
+    """
+    Returns the report's CSV files zipped into one in-memory archive (bytes)
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in files["csv"]:
+            archive.write(path, arcname=os.path.basename(path))
+    return buffer.getvalue()
@@ -0,0 +1,108 @@
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+# Default byte budget for cached query results
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Splits SQL into string literals / quoted identifiers and everything else
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def normalize_sql(sql):
+    """
+    Normalizes SQL text for use as a cache key: whitespace outside quotes is
+    collapsed and a trailing semicolon is dropped; literals are left as-is
+    """
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    return "".join(
+        part if index % 2 else re.sub(r"\s+", " ", part)
+        for index, part in enumerate(parts)
+    ).strip()
+
+
+def estimate_result_bytes(results, columns):
+    """
+    Rough in-memory size of a fetched result set
+    """
+    size = sys.getsizeof(results) + sum(sys.getsizeof(c) for c in columns)
+    for row in results:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results bounded by an approximate byte budget.
+
+    Entries belong to a data version; when a lookup or store arrives with a
+    different version (the database was rebuilt), the whole cache is dropped.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.current_bytes = 0
+            self._version = version
+
+    def get(self, sql, version):
+        key = normalize_sql(sql)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, sql, version, results, columns):
+        key = normalize_sql(sql)
+        size = estimate_result_bytes(results, columns)
+        if size > self.max_bytes:
+            return  # Never let one result flush the whole cache
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._entries[key] = (results, columns, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted[2]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,186 @@
+from ingest import quote_identifier
+from schema_pruning import estimate_tokens
+
+# Results up to this size are sent to the model verbatim
+FULL_RESULT_ROWS = 20
+
+# Sample rows included in the description of larger results
+SAMPLE_ROWS = 5
+
+# Most frequent values listed per text column, and how many text columns get them
+TOP_K_VALUES = 5
+TOP_K_COLUMNS = 3
+
+# Token budget for the result description in the answer prompt
+DESCRIPTION_TOKEN_BUDGET = 1200
+
+
+def is_numeric_column(rows, index):
+    values = [row[index] for row in rows if row[index] is not None]
+    return bool(values) and all(
+        isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+    )
+
+
+def stats_from_rows(rows, columns):
+    """
+    Column statistics computed from rows already in memory (complete results)
+    """
+    stats = {}
+    for index, column in enumerate(columns):
+        values = [row[index] for row in rows if row[index] is not None]
+        entry = {"count": len(values)}
+        if is_numeric_column(rows, index):
+            entry.update(
+                {
+                    "numeric": True,
+                    "min": min(values),
+                    "max": max(values),
+                    "sum": sum(values),
+                    "avg": sum(values) / len(values),
+                }
+            )
+        else:
+            counts = {}
+            for value in values:
+                counts[value] = counts.get(value, 0) + 1
+            top = sorted(counts.items(), key=lambda item: -item[1])[:TOP_K_VALUES]
+            entry.update({"numeric": False, "distinct": len(counts), "top": top})
+        stats[column] = entry
+    return stats
+
+
+def stats_from_sql(run_query, sql, sample_rows, columns):
+    """
+    Column statistics computed by SQLite over the full result of `sql`:
+    one aggregate pass for counts/min/max/sum/avg, plus a GROUP BY for the
+    top values of the first TOP_K_COLUMNS text columns. `sample_rows` (the
+    first page) only decides which columns are numeric.
+    Returns (stats, total row count) or (None, error message).
+    """
+    unique_columns = [c for i, c in enumerate(columns) if c not in columns[:i]]
+    numeric = {
+        column: is_numeric_column(sample_rows, columns.index(column))
+        for column in unique_columns
+    }
+
+    expressions = ["COUNT(*)"]
+    for column in unique_columns:
+        quoted = quote_identifier(column)
+        expressions.append(f"COUNT({quoted})")
+        if numeric[column]:
+            expressions += [
+                f"MIN({quoted})",
+                f"MAX({quoted})",
+                f"TOTAL({quoted})",
+                f"AVG({quoted})",
+            ]
+    results, columns_or_error = run_query(
+        f"SELECT {', '.join(expressions)} FROM ({sql})"
+    )
+    if results is None:
+        return None, columns_or_error
+
+    values = iter(results[0])
+    total_rows = next(values)
+    stats = {}
+    for column in unique_columns:
+        entry = {"count": next(values), "numeric": numeric[column]}
+        if numeric[column]:
+            entry.update(
+                {
+                    "min": next(values),
+                    "max": next(values),
+                    "sum": next(values),
+                    "avg": next(values),
+                }
+            )
+        stats[column] = entry
+
+    text_columns = [c for c in unique_columns if not numeric[c]][:TOP_K_COLUMNS]
+    for column in text_columns:
+        quoted = quote_identifier(column)
+        top, _ = run_query(
+            f"SELECT {quoted}, COUNT(*) AS n FROM ({sql}) "
+            f"WHERE {quoted} IS NOT NULL GROUP BY {quoted} "
+            f"ORDER BY n DESC LIMIT {TOP_K_VALUES}"
+        )
+        stats[column]["top"] = top or []
+    return stats, total_rows
+
+
+def format_number(value):
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return f"{value:,}" if isinstance(value, int) else str(value)
+
+
+def format_table(rows, columns):
+    lines = [" | ".join(str(c) for c in columns)]
+    lines += [" | ".join("" if v is None else str(v) for v in row) for row in rows]
+    return "\n".join(lines)
+
+
+def describe_results(rows, columns, stats, total_rows, token_budget=DESCRIPTION_TOKEN_BUDGET):
+    """
+    Builds a compact, token-budgeted text description of a result set.
+
+    Small results are included verbatim. Larger ones are described by their
+    row count, per-column statistics, top values and a few sample rows;
+    sample rows, then top values, are dropped until the text fits the budget,
+    so the prompt costs about the same however many rows the query returned.
+    """
+    if total_rows == 0:
+        return "No data was found for this query."
+    if total_rows <= FULL_RESULT_ROWS and len(rows) >= total_rows:
+        return f"Found {total_rows} rows of data.\n\n" + format_table(rows, columns)
+
+    def build(sample_count, top_count):
+        parts = [f"Found {total_rows:,} rows of data.", "", "Column statistics:"]
+        for column, entry in stats.items():
+            if entry.get("numeric"):
+                parts.append(
+                    f"- {column}: {entry['count']:,} values, "
+                    f"min {format_number(entry['min'])}, max {format_number(entry['max'])}, "
+                    f"sum {format_number(entry['sum'])}, avg {format_number(entry['avg'])}"
+                )
+            else:
+                line = f"- {column}: {entry['count']:,} values"
+                top = entry.get("top", [])[:top_count]
+                if top:
+                    line += "; most common: " + ", ".join(
+                        f"{value} ({count:,})" for value, count in top
+                    )
+                parts.append(line)
+        if sample_count:
+            parts += [
+                "",
+                f"Sample of data (first {min(sample_count, len(rows))} rows):",
+                format_table(rows[:sample_count], columns),
+            ]
+        return "\n".join(parts)
+
+    for sample_count in range(SAMPLE_ROWS, -1, -1):
+        for top_count in (TOP_K_VALUES, 3, 1, 0):
+            description = build(sample_count, top_count)
+            if estimate_tokens(description) <= token_budget:
+                return description
+    return description
+
+
+def stats_table(stats):
+    """
+    Rows for the statistics view: one per numeric column
+    """
+    return [
+        {
+            "column": column,
+            "count": entry["count"],
+            "min": entry["min"],
+            "max": entry["max"],
+            "sum": entry["sum"],
+            "avg": entry["avg"],
+        }
+        for column, entry in stats.items()
+        if entry.get("numeric")
+    ]
@@ -0,0 +1,213 @@
+import re
+
+from question_cache import normalize_question
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a character estimate
+    tiktoken = None
+
+# Table that answers most questions; it is always part of the pruned schema
+PRIMARY_TABLE = "enforcement"
+
+# Columns kept for every selected table (join key and main date)
+CORE_COLUMNS = ["מס' דו''ח", "תאריך"]
+
+# Categorical columns kept for every selected table that has them, along
+# with its 0/1 flag columns: questions usually name a value ("חניה אסורה",
+# "רכב פרטי") rather than the column it is filtered on
+CATEGORICAL_COLUMNS = ["עבירה", "סוג", "סטטוס לדוח"]
+FLAG_COLUMN_SUFFIX = "_flag"
+
+# Words that make a secondary table relevant
+TABLE_KEYWORDS = {
+    "financial_transactions": [
+        "תנועה", "תנועות", "כספי", "חיוב", "זיכוי", "פירעונ", "העברה",
+        "transaction", "charge", "credit", "repayment", "financial",
+    ],
+    "address_database": [
+        "כתובת", "מען", "מיקוד", "תד", "מקור",
+        "address", "postal", "po box", "source",
+    ],
+    "report_data": ["הערות לדוח", "הערה לדוח", "report notes", "report_data"],
+    "rollup_flags_month": [
+        "אחוז", "שיעור", "נכ", "מבוקש", "נגרר", "ננעל",
+        "percent", "rate", "disabled", "wanted", "tow", "locked",
+    ],
+    "report_text_fts": [
+        "הערת", "הערה", "הערות", "רחוב", "מיקום", "מכיל", "מופיע", "כתוב", "חיפוש",
+        "note", "remark", "street", "location", "mention", "contain", "search",
+    ],
+}
+
+# Question words mapped to the columns they usually refer to
+COLUMN_ALIASES = {
+    "פקח": ["שם פקח", "קוד פקח"],
+    "inspector": ["שם פקח", "קוד פקח"],
+    "רחוב": ["שם רחוב", "קוד רחוב"],
+    "street": ["שם רחוב", "קוד רחוב"],
+    "קנס": ["קנס"],
+    "fine": ["קנס"],
+    "שולמ": ["שולם", "לתשלום", "תאריך תשלום", "שולם_flag"],
+    "תשלומ": ["שולם", "לתשלום", "תאריך תשלום", "שולם_flag"],
+    "paid": ["שולם", "לתשלום", "תאריך תשלום", "שולם_flag"],
+    "pay": ["שולם", "לתשלום", "תאריך תשלום", "שולם_flag"],
+    "נכ": ["נכה"],
+    "disabled": ["נכה"],
+    "מבוקש": ["מבוקש"],
+    "wanted": ["מבוקש"],
+    "נגרר": ["ננעל/נגרר", "ננעל/נגרר_flag"],
+    "ננעל": ["ננעל/נגרר", "ננעל/נגרר_flag"],
+    "tow": ["ננעל/נגרר", "ננעל/נגרר_flag"],
+    "אזור": ["אזור חניה", "אזור פיקוח"],
+    "area": ["אזור חניה", "אזור פיקוח"],
+    "region": ["אזור חניה", "אזור פיקוח"],
+    "רכב": ["מס ' רישוי", "סוג", "צבע", "תוצרת"],
+    "vehicle": ["מס ' רישוי", "סוג", "צבע", "תוצרת"],
+    "רישוי": ["מס ' רישוי"],
+    "עביר": ["עבירה"],
+    "offense": ["עבירה"],
+    "violation": ["עבירה"],
+    "ערעור": ["ערעור מתאריך", "בקשה להישפט"],
+    "appeal": ["ערעור מתאריך", "בקשה להישפט"],
+    "סטטוס": ["סטטוס לדוח"],
+    "status": ["סטטוס לדוח"],
+    "הער": ["הערת פקח 1", "הערת פקח 2", "הערת פקח 3", "הערת פקח 4"],
+    "note": ["הערת פקח 1", "הערת פקח 2", "הערת פקח 3", "הערת פקח 4"],
+    "מיקומ": ["מיקום", "שם רחוב"],
+    "location": ["מיקום", "שם רחוב"],
+    "שעה": ["שעה"],
+    "hour": ["שעה"],
+    "time": ["שעה"],
+    "יומ": ["יום"],
+    "day": ["יום"],
+    "עיר": ["עיר"],
+    "city": ["עיר"],
+    "שמ משפחה": ["שם משפחה", "שם פרטי"],
+    "name": ["שם משפחה", "שם פרטי"],
+}
+
+# Words showing the question is answerable from the primary table's core
+# columns (counts of reports over dates) even if no other column matches
+GENERAL_KEYWORDS = [
+    "כמה", "מספר", "דוח", "חודש", "שנה", "רבעונ",
+    "ינואר", "פברואר", "מרצ", "אפריל", "מאי", "יוני", "יולי", "אוגוסט",
+    "ספטמבר", "אוקטובר", "נובמבר", "דצמבר",
+    "how many", "count", "number of", "report", "ticket", "month", "year",
+    "quarter", "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+]
+
+_COLUMN_LINE = re.compile(r'^- ("(?:[^"]|"")*"|\S+): (.*)$')
+
+
+def parse_schema(schema_text):
+    """
+    Parses the prompt schema into {table: [(column, description, line)]}
+    """
+    tables = {}
+    current = None
+    for line in schema_text.splitlines():
+        line = line.strip()
+        if line.startswith("Table:"):
+            current = line.split(":", 1)[1].strip()
+            tables[current] = []
+            continue
+        match = _COLUMN_LINE.match(line)
+        if current and match:
+            column = match.group(1)
+            if column.startswith('"'):
+                column = column[1:-1].replace('""', '"')
+            tables[current].append((column, match.group(2), line))
+    return tables
+
+
+def estimate_tokens(text):
+    """
+    Counts prompt tokens with tiktoken when available, else ~4 characters per token
+    """
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.encoding_for_model("gpt-4o").encode(text))
+        except (KeyError, ValueError):
+            pass
+    return max(1, len(text) // 4)
+
+
+def select_tables(normalized_question, tables):
+    selected = [PRIMARY_TABLE] if PRIMARY_TABLE in tables else []
+    for table_name, keywords in TABLE_KEYWORDS.items():
+        if table_name in tables and any(
+            normalize_question(keyword) in normalized_question for keyword in keywords
+        ):
+            selected.append(table_name)
+    return selected
+
+
+def select_columns(normalized_question, columns):
+    """
+    Returns the column names relevant to the question: core columns, columns
+    named in the question, columns whose English description appears in it,
+    and columns reached through COLUMN_ALIASES
+    """
+    wanted = set(CORE_COLUMNS)
+    for alias, alias_columns in COLUMN_ALIASES.items():
+        if normalize_question(alias) in normalized_question:
+            wanted.update(alias_columns)
+    for column, description, _ in columns:
+        if normalize_question(column) in normalized_question:
+            wanted.add(column)
+        elif description.lower() in normalized_question:
+            wanted.add(column)
+    return wanted
+
+
+def prune_schema(question, schema_text):
+    """
+    Builds a schema subset holding only the tables and columns likely needed
+    for the question, plus each kept table's key, categorical and flag
+    columns.
+
+    Returns (pruned schema text, list of selected tables). If the question
+    matches no table, column or general counting/date keyword, the full
+    schema is returned so the model is never starved of context.
+    """
+    tables = parse_schema(schema_text)
+    normalized_question = normalize_question(question)
+    selected_tables = select_tables(normalized_question, tables)
+
+    sections = []
+    matched_any = len(selected_tables) > 1 or any(
+        normalize_question(keyword) in normalized_question
+        for keyword in GENERAL_KEYWORDS
+    )
+    for table_name in selected_tables:
+        wanted = select_columns(normalized_question, tables[table_name])
+        if wanted - set(CORE_COLUMNS):
+            matched_any = True
+        elif table_name != PRIMARY_TABLE:
+            # Selected by keyword only: secondary tables are small, keep them whole
+            wanted = {column for column, _, _ in tables[table_name]}
+        wanted.update(
+            column
+            for column, _, _ in tables[table_name]
+            if column in CATEGORICAL_COLUMNS or column.endswith(FLAG_COLUMN_SUFFIX)
+        )
+        lines = [line for column, _, line in tables[table_name] if column in wanted]
+        sections.append(f"Table: {table_name}\n" + "\n".join(lines))
+
+    if not matched_any:
+        return schema_text, list(tables)
+    return "\n" + "\n\n".join(sections) + "\n", selected_tables
+
+
+def select_examples(examples, tables):
+    """
+    Keeps only the examples whose SQL uses the selected tables
+    """
+    table_pattern = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)", re.IGNORECASE)
+    return [
+        example
+        for example in examples
+        if all(name in tables for name in table_pattern.findall(example["sql"]))
+    ]
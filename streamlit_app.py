@@ -1,11 +1,67 @@
+import asyncio
 import pandas as pd
 import sqlite3
 import streamlit as st
 import hmac
+import os
+import threading
+import time
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import re
 
+from analysis import (
+    area_trends,
+    inspector_comparison,
+    monthly_report_counts,
+    payment_totals,
+    rollup_months,
+)
+from ingest import (
+    DEFAULT_REPORT_STORAGE,
+    build_database,
+    data_version,
+)
+from connection_pool import close_all_connections, get_read_connection
+from index_advisor import advise_indexes, log_executed_query
+from intent_router import answer_text, latest_data_date, route_question
+from metrics import (
+    PROMETHEUS_FILE,
+    RequestTrace,
+    prometheus_text,
+    save_trace,
+    stage_summaries,
+)
+from prompt_context import DATE_EXAMPLES, EXAMPLES, SCHEMA
+from query_guard import (
+    ACTION_LIMIT,
+    blocking_issues,
+    check_query_plan,
+    paged_query,
+    result_column_count,
+    sanitize_sql_query,
+)
+from query_engine import DEFAULT_ENGINE, create_engine
+from question_cache import forget_question_sql, lookup_cached_sql, store_question_sql
+from reports import (
+    generate_reports,
+    make_period,
+    read_report,
+    report_archive,
+    report_periods,
+)
+from result_summary import (
+    describe_results,
+    stats_from_rows,
+    stats_from_sql,
+    stats_table,
+)
+from render_buffer import StreamRenderBuffer, render_totals
+from result_cache import DEFAULT_MAX_BYTES, ResultCache, estimate_result_bytes
+from schema_pruning import estimate_tokens, prune_schema, select_examples
+from text_search import TEXT_SEARCH_TABLE, search_reports
+
 # Set page configuration
 st.set_page_config(
     page_title="Question Answering System",
@@ -290,312 +346,163 @@ client = OpenAI(api_key=st.secrets["openai_api_key"])
 # Cache the CSV loading and database creation so it runs only once per session
 @st.cache_data(show_spinner=False)
 def load_csv_to_sqlite(db_path="reports.db"):
+    # Reuse the existing database when the source CSVs have not changed;
+    # only tables whose source file changed are re-read and rewritten
     try:
-        # Read CSV files with proper encoding
         with st.spinner("📊 Loading data..."):
-            enforcement_df = pd.read_csv(
-                "אכיפה.csv", encoding="utf-8", low_memory=False
-            )
-            financial_df = pd.read_csv(
-                "תנועות כספיות.csv", encoding="utf-8", low_memory=False
-            )
-            address_df = pd.read_csv(
-                "מאגר כתובות.csv", encoding="utf-8", low_memory=False
+            ingest_stats = build_database(
+                db_path,
+                report_storage=st.secrets.get("report_storage", DEFAULT_REPORT_STORAGE),
             )
-            report_df = pd.read_csv("דטא דוחות.csv", encoding="utf-8", low_memory=False)
-    except Exception as e:
+    except (OSError, ValueError, pd.errors.ParserError) as e:
         st.error(f"Error loading CSV files: {e}")
         return None
-
-    # Create and populate SQLite database
-    conn = sqlite3.connect(db_path)
-    try:
-        enforcement_df.to_sql("enforcement", conn, if_exists="replace", index=False)
-        financial_df.to_sql(
-            "financial_transactions", conn, if_exists="replace", index=False
-        )
-        address_df.to_sql("address_database", conn, if_exists="replace", index=False)
-        report_df.to_sql("report_data", conn, if_exists="replace", index=False)
-        prepare_database_for_date_queries(db_path)
-    except Exception as e:
+    except sqlite3.Error as e:
         st.error(f"Error writing to SQLite: {e}")
-        conn.close()
         return None
 
-    conn.close()
+    if ingest_stats:
+        # Pooled connections may hold pages of the replaced tables
+        close_all_connections()
+    for table_name, stats in ingest_stats.items():
+        print(
+            f"Rebuilt {table_name}: {stats['rows']:,} rows, "
+            f"{stats['rows_per_sec']:,} rows/sec"
+        )
     return db_path
 
 
-# Database schema and examples remain the same as your original code
-schema = """
-Table: enforcement
-- "מס' דו''ח": report number
-direction: rtl
-- תאריך: date
-- יום: day
-- שעה: time
-- "קוד פקח": inspector code
-- "שם פקח": inspector name
-- "קוד רחוב": street code
-- "שם רחוב": street name
-- מיקום: location
-- "מס' בית": house number
-- עבירה: offense
-- "מס ' רישוי": vehicle registration number
-- סוג: type
-- צבע: color
-- תוצרת: make
-- נכה: disabled
-- מבוקש: wanted
-- "ננעל/נגרר": locked/towed
-- "כרטיס חניה 1": parking card 1
-- "כרטיס חניה 2": parking card 2
-- "תאריך קובע": determining date
-- "לתשלום עד": payment due date
-- קנס: fine
-- "הערת פקח 1": inspector note 1
-- "הערת פקח 2": inspector note 2
-- "הערת פקח 3": inspector note 3
-- "הערת פקח 4": inspector note 4
-- "אזור חניה": parking area
-- "אזור פיקוח": supervision area
-- "ת''ז": ID number
-- "שם משפחה": last name
-- "שם פרטי": first name
-- רחוב: street
-- "'מס": house number
-- דירה: apartment
-- עיר: city
-- מיקוד: postal code
-- שולם: paid
-- לתשלום: to pay
-- "תאריך תשלום": payment date
-- "ערעור מתאריך": appeal from date
-- "הסבה מתאריך": conversion from date
-- "בקשה להישפט": request for trial
-- "מספר יחודי": unique number
-- "סטטוס לדוח": report status
-- פעולה: action
-- "מספר שבב": chip number
-- "/דוח מוביל": leading report
-- "מספר דרכון": passport number
-
-Table: financial_transactions
-- "מס' דו''ח": report number
-- תאריך: date
-- סוג: type
-- "ת.תשלום": payment date
-- חיוב: charge
-- זיכוי: credit
-- "ת. פירעון": repayment date
-
-Table: address_database
-- "מס' דו''ח": report number
-- תאריך: date
-- "ת.ז": ID number
-- "שם משפחה": last name
-- "שם פרטי": first name
-- רחוב: street
-- מס: house number
-- דירה: apartment
-- מיקוד: postal code
-- "ת.ד": PO box
-- עיר: city
-- מקור: source
-
-Table: report_data
-- "מס' דו''ח": report number
-- תאריך: date
-- יום: day
-- שעה: time
-- "קוד פקח": inspector code
-- "שם פקח": inspector name
-- "קוד רחוב": street code
-- "שם רחוב": street name
-- מיקום: location
-- "מס' בית": house number
-- עבירה: offense
-- "מס ' רישוי": vehicle registration number
-- סוג: type
-- צבע: color
-- תוצרת: make
-- נכה: disabled
-- מבוקש: wanted
-- "ננעל/נגרר": locked/towed
-- "כרטיס חניה 1": parking card 1
-- "כרטיס חניה 2": parking card 2
-- "תאריך קובע": determining date
-- "לתשלום עד": payment due date
-- קנס: fine
-- "הערת פקח 1": inspector note 1
-- "הערת פקח 2": inspector note 2
-- "הערת פקח 3": inspector note 3
-- "הערת פקח 4": inspector note 4
-- "אזור חניה": parking area
-- "אזור פיקוח": supervision area
-- "ת''ז": ID number
-- "שם משפחה": last name
-- "שם פרטי": first name
-- רחוב: street
-- "'מס": house number
-- דירה: apartment
-- עיר: city
-- מיקוד: postal code
-- שולם: paid
-- לתשלום: to pay
-- "תאריך תשלום": payment date
-- "ערעור מתאריך": appeal from date
-- "הסבה מתאריך": conversion from date
-- "בקשה להישפט": request for trial
-- "מספר יחודי": unique number
-- "הערות לדוח": report notes
-- "סטטוס לדוח": report status
-- פעולה: action
-- "מספר שבב": chip number
-- "/דוח מוביל": leading report
-- "מספר דרכון": passport number
-"""
+# Rows fetched for the first page of an answer (table, statistics, answer prompt)
+FIRST_PAGE_ROWS = 1000
+
+# Rows per page in the full results viewer
+PAGE_SIZE = 100
 
-examples = [
-    {
-        "question": "What is the fine for report number 123?",
-        "sql": "SELECT קנס FROM enforcement WHERE \"מס' דו''ח\" = 123;",
-    },
-    {
-        "question": "How much was paid for report number 456?",
-        "sql": "SELECT שולם FROM report_data WHERE \"מס' דו''ח\" = 456;",
-    },
-    {
-        "question": "What is the address for the individual in report number 789?",
-        "sql": "SELECT רחוב, \"'מס\", דירה, עיר FROM address_database WHERE \"מס' דו''ח\" = 789;",
-    },
-    {
-        "question": "List all financial transactions for report number 101.",
-        "sql": "SELECT * FROM financial_transactions WHERE \"מס' דו''ח\" = 101;",
-    },
-    {
-        "question": "What is the offense and fine for report number 202?",
-        "sql": "SELECT עבירה, קנס FROM enforcement WHERE \"מס' דו''ח\" = 202;",
-    },
-]
-
-
-def prepare_database_for_date_queries(db_path="reports.db"):
+# Default for the max_result_rows setting
+MAX_RESULT_ROWS = 100_000
+
+
+@st.cache_resource
+def get_result_cache():
+    """Process-wide query result cache shared by all sessions"""
+    max_bytes = int(
+        st.secrets.get("result_cache_max_bytes", DEFAULT_MAX_BYTES)
+    )
+    return ResultCache(max_bytes=max_bytes)
+
+
+@st.cache_resource
+def get_query_engine(db_path="reports.db"):
     """
-    Adds date index and ensures date columns are properly formatted for SQLite date functions
+    Process-wide query engine (the query_engine setting: sqlite or duckdb)
     """
-    conn = sqlite3.connect(db_path)
-    try:
-        # Create a temporary column with standardized date format if needed
-        conn.execute(
-            """
-        ALTER TABLE enforcement ADD COLUMN date_formatted TEXT;
-        """
-        )
+    return create_engine(st.secrets.get("query_engine", DEFAULT_ENGINE), db_path)
 
-        # Update the new column with properly formatted dates
-        # Assumes your dates are in DD/MM/YYYY format - adjust if different
-        conn.execute(
-            """
-        UPDATE enforcement
-        SET date_formatted =
-            substr(תאריך, 7, 4) || '-' ||
-            substr(תאריך, 4, 2) || '-' ||
-            substr(תאריך, 1, 2)
-        WHERE תאריך LIKE '__/__/____';
-        """
-        )
 
-        # Create an index on the new date column for faster queries
-        conn.execute(
-            """
-        CREATE INDEX IF NOT EXISTS idx_enforcement_date ON enforcement (date_formatted);
-        """
-        )
+def get_max_result_rows():
+    """Upper bound on the rows any single query may return"""
+    return int(st.secrets.get("max_result_rows", MAX_RESULT_ROWS))
 
-        # Do the same for report_data table
-        conn.execute(
-            """
-        ALTER TABLE report_data ADD COLUMN date_formatted TEXT;
-        """
-        )
 
-        conn.execute(
-            """
-        UPDATE report_data
-        SET date_formatted =
-            substr(תאריך, 7, 4) || '-' ||
-            substr(תאריך, 4, 2) || '-' ||
-            substr(תאריך, 1, 2)
-        WHERE תאריך LIKE '__/__/____';
-        """
-        )
+def execute_sql_query(sql, db_path="reports.db", max_rows=None):
+    """
+    Execute a SQL query with improved error handling and query sanitization.
+    At most `max_rows` rows (default: the max_result_rows setting) are fetched.
+    """
+    # Sanitize the SQL query first
+    return run_sanitized_query(sanitize_sql_query(sql), db_path, max_rows)
 
-        conn.execute(
-            """
-        CREATE INDEX IF NOT EXISTS idx_report_data_date ON report_data (date_formatted);
-        """
-        )
 
-        conn.commit()
+def fetch_result_page(sql, db_path="reports.db", page=0, page_size=PAGE_SIZE):
+    """
+    Fetch one page of a query's results with LIMIT/OFFSET, so only that page
+    is materialized. Pages follow the query's ORDER BY, or every column when
+    it has none, so they neither overlap nor skip rows. Pages are cached
+    like any other query result.
+    """
+    sanitized_sql = sanitize_sql_query(sql)
+    page_size = min(page_size, get_max_result_rows())
+    try:
+        column_count = result_column_count(get_read_connection(db_path), sanitized_sql)
     except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        # If column already exists, that's fine
-        conn.rollback()
-    finally:
-        conn.close()
+        return None, f"SQLite error: {str(e)}\nQuery: {sanitized_sql}"
+    page_sql = paged_query(
+        sanitized_sql, page_size, int(page) * int(page_size), column_count
+    )
+    return run_sanitized_query(page_sql, db_path, page_size)
 
 
-def sanitize_sql_query(sql_query):
+def count_result_rows(sql, db_path="reports.db"):
     """
-    Sanitize and fix common SQL query issues
+    Count a query's rows without fetching them, stopping one past the
+    max_result_rows limit. Returns (row count, whether the limit was exceeded),
+    or (None, error message).
     """
-    # Remove any trailing semicolons that could cause 'you can only execute one statement' errors
-    sql_query = sql_query.strip()
-    if sql_query.endswith(";"):
-        sql_query = sql_query[:-1]
-
-    # Remove any additional statements that might be present
-    if ";" in sql_query:
-        sql_query = sql_query.split(";")[0]
-
-    # Fix common issues with SQLite's handling of division and CAST
-    if "CAST(" in sql_query and "AS FLOAT" in sql_query:
-        # SQLite doesn't handle CAST(x AS FLOAT) well, replace with CAST(x AS REAL)
-        sql_query = sql_query.replace("AS FLOAT", "AS REAL")
-
-    # Handle alternative syntax for percentage calculation
-    if "percentage" in sql_query.lower() and "/" in sql_query:
-        # Check for potentially problematic division operations
-        # SQLite might need explicit casting to avoid integer division
-        if not "1.0" in sql_query and not "100.0" in sql_query:
-            sql_query = sql_query.replace("* 100", "* 100.0")
-            sql_query = sql_query.replace("/ COUNT", "/ CAST(COUNT")
-            if not "AS REAL" in sql_query and "))" in sql_query:
-                sql_query = sql_query.replace("))", " AS REAL))")
-
-    return sql_query
-
-
-def execute_sql_query(sql, db_path="reports.db"):
+    max_rows = get_max_result_rows()
+    count_sql = (
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM ({sanitize_sql_query(sql)}) "
+        f"LIMIT {max_rows + 1})"
+    )
+    results, columns_or_error = run_sanitized_query(count_sql, db_path, 1)
+    if results is None:
+        return None, columns_or_error
+    count = results[0][0]
+    return min(count, max_rows), count > max_rows
+
+
+def run_sanitized_query(sanitized_sql, db_path="reports.db", max_rows=None):
     """
-    Execute a SQL query with improved error handling and query sanitization
+    Run an already sanitized query through the result cache and the configured
+    query engine, fetching at most max_rows rows. The plan check always runs
+    on the SQLite connection, since generated queries are SQLite dialect.
     """
-    # Sanitize the SQL query first
-    sanitized_sql = sanitize_sql_query(sql)
-
-    conn = sqlite3.connect(db_path)
+    if max_rows is None:
+        max_rows = get_max_result_rows()
+
+    conn = get_read_connection(db_path)
+    engine = get_query_engine(db_path)
+    result_cache = get_result_cache()
+    version = data_version(conn)
+    cache_key = f"{engine.name}:{max_rows}:{sanitized_sql}"
+    cached = result_cache.get(cache_key, version)
+    if cached is not None:
+        return cached
+
+    budget = {"exceeded": None}
     try:
-        cursor = conn.cursor()
+        # Refuse plans that cannot finish in reasonable time, and cap
+        # unbounded full scans of large tables with a LIMIT
+        issues = check_query_plan(conn, sanitized_sql, version)
+        blocked = blocking_issues(issues)
+        if blocked:
+            error_msg = "Query rejected: " + "; ".join(i["message"] for i in blocked)
+            print(f"{error_msg}\nQuery: {sanitized_sql}")
+            return None, error_msg
+        if any(issue["action"] == ACTION_LIMIT for issue in issues):
+            sanitized_sql = f"SELECT * FROM ({sanitized_sql}) LIMIT {int(max_rows)}"
 
         # For debugging, log the sanitized query
         print(f"Executing sanitized query: {sanitized_sql}")
 
-        cursor.execute(sanitized_sql)
-        results = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        start = time.perf_counter()
+        with engine.budget() as budget:
+            results, columns = engine.execute(sanitized_sql, max_rows)
+
+        # Record the query for the index advisor
+        log_executed_query(
+            sanitized_sql, (time.perf_counter() - start) * 1000, len(results), db_path
+        )
+        result_cache.put(cache_key, version, results, columns)
         return results, columns
-    except sqlite3.Error as e:
+    except (sqlite3.Error, *engine.errors) as e:
+        if budget["exceeded"] is not None:
+            error_msg = (
+                f"Query stopped: it exceeded the {budget['exceeded']} budget. "
+                "Try a narrower question (a date range, an inspector, a street)."
+            )
+            print(f"{error_msg}\nQuery: {sanitized_sql}")
+            return None, error_msg
+
         # Enhanced error information for debugging
         error_msg = f"SQLite error: {str(e)}\nQuery: {sanitized_sql}"
         print(error_msg)
@@ -611,50 +518,6 @@ def execute_sql_query(sql, db_path="reports.db"):
                 error_msg += f"\n\nThe column '{error_column}' does not exist. Available columns might be different."
 
         return None, error_msg
-    finally:
-        conn.close()
-
-
-# Add a function to handle the specific case of the disabled percentage query
-def get_disabled_vehicle_percentage(db_path="reports.db"):
-    """
-    Specifically handle the calculation of disabled vehicle percentage
-    """
-    conn = sqlite3.connect(db_path)
-    try:
-        cursor = conn.cursor()
-
-        # First, check what values exist in the נכה column
-        cursor.execute("SELECT DISTINCT נכה FROM enforcement")
-        distinct_values = cursor.fetchall()
-        print(f"Distinct values in נכה column: {distinct_values}")
-
-        # Try a simpler query that avoids complex casting
-        query = """
-        SELECT
-            COUNT(*) as total_tickets,
-            SUM(CASE WHEN נכה = 'כן' THEN 1
-                     WHEN נכה = 'yes' THEN 1
-                     WHEN נכה = '1' THEN 1
-                     WHEN נכה = 1 THEN 1
-                     ELSE 0 END) as disabled_tickets,
-            ROUND((SUM(CASE WHEN נכה = 'כן' THEN 1
-                         WHEN נכה = 'yes' THEN 1
-                         WHEN נכה = '1' THEN 1
-                         WHEN נכה = 1 THEN 1
-                         ELSE 0 END) * 100.0) / COUNT(*), 2) as percentage
-        FROM enforcement
-        """
-
-        cursor.execute(query)
-        results = cursor.fetchall()
-        columns = ["Total Tickets", "Disabled Vehicle Tickets", "Percentage"]
-
-        return results, columns
-    except sqlite3.Error as e:
-        return None, f"Error calculating disabled percentage: {str(e)}"
-    finally:
-        conn.close()
 
 
 def improve_date_examples_in_prompt(schema, examples):
@@ -662,24 +525,8 @@ def improve_date_examples_in_prompt(schema, examples):
     Update examples to include more robust date-based query examples
     """
 
-    # Add a variety of date examples to help the model understand how to handle dates
-    date_examples = [
-        {
-            "question": "How many tickets were issued in December 2024?",
-            "sql": "SELECT COUNT(*) FROM enforcement WHERE strftime('%Y-%m', date_formatted) = '2024-12';",
-        },
-        {
-            "question": "List the inspectors who issued tickets in the last quarter of 2024.",
-            "sql": "SELECT DISTINCT \"שם פקח\" FROM enforcement WHERE date_formatted >= '2024-10-01' AND date_formatted <= '2024-12-31';",
-        },
-        {
-            "question": "How many tickets did each inspector issue in the first month of 2024?",
-            "sql": "SELECT \"שם פקח\", COUNT(*) as ticket_count FROM enforcement WHERE date_formatted BETWEEN '2024-01-01' AND '2024-01-31' GROUP BY \"שם פקח\" ORDER BY ticket_count DESC;",
-        },
-    ]
-
     # Combine existing examples with new date examples
-    return examples + date_examples
+    return examples + DATE_EXAMPLES
 
 
 def generate_better_sql_prompt(question, schema, examples):
@@ -690,8 +537,17 @@ def generate_better_sql_prompt(question, schema, examples):
         schema
         + """
 
+Note about Column Types:
+- "מס' דו''ח", "קוד פקח" and "קוד רחוב" are INTEGER
+- קנס, שולם, לתשלום, חיוב and זיכוי are REAL amounts; no CAST is needed to SUM or AVG them
+- נכה, מבוקש, "ננעל/נגרר_flag" and "שולם_flag" are indexed 0/1 flags (1 = yes);
+  filter with flag = 1 and count with SUM(flag), never compare them to 'כן' or 'yes'
+- For flag counts or percentages over whole months, read rollup_flags_month instead of
+  scanning enforcement, e.g. SUM(disabled_count) * 100.0 / SUM(report_count)
+
 Note about Date Handling:
-- Dates in the database are in DD/MM/YYYY format but have been converted to YYYY-MM-DD in date_formatted column
+- All date columns are stored as YYYY-MM-DD text; date_formatted holds the same value as תאריך
+- Every date column X also has an integer column "X_day" (days since 1970-01-01), e.g. "תאריך תשלום_day"
 - For date queries, use date_formatted column instead of תאריך
 - The database contains data from 01/01/2021 to 31/12/2024
 - When querying recent data, use specific date literals instead of DATE('now') functions
@@ -702,6 +558,16 @@ Note about Date Handling:
 """
     )
 
+    if TEXT_SEARCH_TABLE in schema:
+        schema_with_date_info += """
+Note about Text Search:
+- To find words in inspector notes, report notes, street names or locations, use
+  report_text_fts MATCH fts_query('words') instead of LIKE '%...%' on the text columns
+- fts_query('words', 'notes'), fts_query('words', 'street') or fts_query('words', 'location')
+  searches one column only; fts_query handles Hebrew prefixes and final letters
+- Join report_text_fts to enforcement or report_data on "מס' דו''ח" and filter on source
+"""
+
     # Get enhanced examples with better date handling
     enhanced_examples = improve_date_examples_in_prompt(schema, examples)
 
@@ -730,16 +596,114 @@ Use WHERE date_formatted BETWEEN '2024-12-01' AND '2024-12-31' instead of DATE('
     return prompt
 
 
+SQL_SYSTEM_PROMPT = (
+    "You are a helpful assistant that generates SQL queries for SQLite based on natural language "
+    "questions and a given database schema. Use specific date literals rather than SQLite date functions."
+)
+
+
+@st.cache_data(show_spinner=False)
+def full_schema_prompt_tokens():
+    """
+    Tokens of the SQL prompt with the full schema and every example, not
+    counting the question; shown next to the pruned prompt's size
+    """
+    return estimate_tokens(generate_better_sql_prompt("", SCHEMA, EXAMPLES))
+
+
+def extract_sql(full_response):
+    """
+    Extract the SQL query from the model response
+    """
+    # Extract the SQL query using regex; allow for trailing semicolons
+    sql_match = re.search(r"(SELECT.*?;?)$", full_response, re.DOTALL | re.IGNORECASE)
+    if sql_match:
+        return sql_match.group(1).strip()
+    return full_response  # Fallback if regex fails
+
+
+async def generate_sql_query(async_client, prompt, trace=None, stage="sql_generation"):
+    """
+    Ask the model for a SQL query and extract it from the response. With a
+    trace, the call's latency and token usage are recorded as `stage`.
+    """
+    start = time.perf_counter()
+    # Call the OpenAI API to generate the SQL query
+    response = await async_client.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": SQL_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        max_tokens=150,
+        temperature=0.0,
+    )
+    if trace is not None:
+        usage = response.usage
+        trace.record(
+            stage,
+            (time.perf_counter() - start) * 1000,
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+        )
+    return extract_sql(response.choices[0].message.content.strip())
+
+
+def precheck_query(sql, db_path="reports.db"):
+    """
+    Plan-check a query before running it; returns the list of plan issues
+    """
+    conn = get_read_connection(db_path)
+    try:
+        return check_query_plan(conn, sanitize_sql_query(sql), data_version(conn))
+    except sqlite3.Error:
+        return []  # Invalid SQL is reported when the query is executed
+
+
+async def request_cheaper_rewrite(async_client, question, sql_query, issues, trace=None):
+    """
+    Ask the model to rewrite a query whose plan was rejected as too expensive
+    """
+    pruned_schema, _ = prune_schema(question, SCHEMA)
+    problems = "\n".join(f"- {issue['message']}" for issue in issues)
+    prompt = f"""Schema:
+{pruned_schema}
+
+The following SQLite query was generated for the question below, but its query plan is too expensive to run.
+Question: {question}
+SQL: {sql_query}
+
+Problems:
+{problems}
+
+Rewrite it as an equivalent but cheaper query. Join tables only on "מס' דו''ח", filter on indexed columns
+(date_formatted, "שם פקח", "קוד רחוב", עבירה) where possible, and never produce a cartesian product.
+Return only the SQL query."""
+    return await generate_sql_query(async_client, prompt, trace, "sql_rewrite")
+
+
+async def run_in_script_thread(func, *args, **kwargs):
+    """
+    Run blocking work in a worker thread that keeps the Streamlit script
+    context, so st caches (e.g. the result cache) still work there
+    """
+    ctx = get_script_run_ctx()
+
+    def call():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args, **kwargs)
+
+    return await asyncio.to_thread(call)
+
+
 def debug_date_formatting(db_path="reports.db"):
     """
     Function to inspect date formatting issues and provide debugging information
     """
-    conn = sqlite3.connect(db_path)
+    cursor = get_read_connection(db_path).cursor()
     debug_info = {}
 
     try:
-        cursor = conn.cursor()
-
         # Check if date_formatted column exists
         cursor.execute("PRAGMA table_info(enforcement)")
         columns = cursor.fetchall()
@@ -775,41 +739,40 @@ def debug_date_formatting(db_path="reports.db"):
     except sqlite3.Error as e:
         debug_info["error"] = str(e)
     finally:
-        conn.close()
+        cursor.close()
 
     return debug_info
 
 
-def generate_textual_answer(question, sql_query, results, columns, language="hebrew"):
+def summarize_query_results(sql_query, db_path, rows, columns, total_rows):
     """
-    Generate a natural language answer based on the SQL query results and stream the answer.
+    Statistics and a compact, token-budgeted description of a query's full
+    results. When only the first page is loaded, the statistics are computed
+    by SQLite over the whole result instead of in pandas.
     """
-    # Create a DataFrame for easier processing
-    df = pd.DataFrame(results, columns=columns)
-
-    # Generate a description of the results
-    if df.empty:
-        result_description = "No data was found for this query."
+    if len(rows) >= total_rows:
+        stats = stats_from_rows(rows, columns)
     else:
-        # Basic description of what's in the dataframe
-        num_rows = len(df)
-        result_description = f"Found {num_rows} rows of data.\n\n"
-
-        # For small datasets, include the full data in a readable format
-        if num_rows <= 20:
-            result_description += df.to_string(index=False)
+        stats, count_or_error = stats_from_sql(
+            lambda summary_sql: run_sanitized_query(summary_sql, db_path),
+            sanitize_sql_query(sql_query),
+            rows,
+            columns,
+        )
+        if stats is None:
+            print(f"Falling back to first-page statistics: {count_or_error}")
+            stats = stats_from_rows(rows, columns)
         else:
-            # For larger datasets, summarize the data
-            result_description += f"Sample of data (first 5 rows):\n{df.head(5).to_string(index=False)}\n\n"
+            total_rows = count_or_error
+    return stats, describe_results(rows, columns, stats, total_rows)
 
-            # Add some basic statistics if appropriate
-            numeric_columns = df.select_dtypes(include=["number"]).columns
-            if len(numeric_columns) > 0:
-                result_description += "Summary statistics for numeric columns:\n"
-                result_description += df[numeric_columns].describe().to_string()
 
+def build_answer_prompt(question, sql_query, result_description, language="hebrew"):
+    """
+    Build the prompt asking the model to explain the query results
+    """
     # Prepare the prompt for OpenAI to generate a conversational answer
-    prompt = f"""
+    return f"""
 The user asked the following question:
 {question}
 
@@ -822,47 +785,345 @@ The query returned the following results:
 Please generate a natural, conversational answer that explains these results in a way that directly answers the original question.
 The answer should be in {language} and should be easy to understand for someone who doesn't know SQL.
 """
-    answer = ""
-    placeholder = st.empty()  # Placeholder for streaming text
 
-    try:
-        # Call the OpenAI API with stream=True to get a streaming response
-        with st.spinner("AI is generating your answer..."):
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that explains database query results.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.3,
-                stream=True,  # Enable streaming mode
-            )
 
-            # Add a pulsing dot animation while waiting
-            answer_container = st.empty()
-            for chunk in response:
-                delta = chunk.choices[0].delta
-                if delta is None:
-                    continue
-                # If this chunk contains regular content:
-                if delta.content is not None:
-                    token = delta.content
-                    answer += token
-                    answer_container.markdown(
-                        f"<div dir='auto' class='answer-text'>{answer}</div>",
-                        unsafe_allow_html=True,
-                    )
+ANSWER_SYSTEM_PROMPT = (
+    "You are a helpful assistant that explains database query results."
+)
+
+
+def answer_renderer(answer_container):
+    """
+    Returns a render callback for StreamRenderBuffer that writes the answer
+    into answer_container and returns the markup it pushed
+    """
+
+    def render(answer):
+        markup = f"<div dir='auto' class='answer-text'>{answer}</div>"
+        answer_container.markdown(markup, unsafe_allow_html=True)
+        return markup
+
+    return render
+
 
-        return answer
+async def stream_textual_answer(async_client, prompt, answer_container, trace=None):
+    """
+    Stream the model's answer into answer_container without blocking the event loop.
+    With a trace, the time to the first token and the whole stream's latency
+    and token usage are recorded.
+    """
+    buffer = StreamRenderBuffer(answer_renderer(answer_container))
+    start = time.perf_counter()
+    first_token_ms = None
+    usage = None
+    try:
+        response = await async_client.chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.3,
+            stream=True,  # Enable streaming mode
+            stream_options={"include_usage": True},  # Usage arrives in the last chunk
+        )
+        async for chunk in response:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta is None or delta.content is None:
+                continue
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - start) * 1000
+            buffer.add(delta.content)
+        buffer.close()
+        if trace is not None:
+            if first_token_ms is not None:
+                trace.record("answer_first_token", first_token_ms)
+            trace.record(
+                "answer_streaming",
+                (time.perf_counter() - start) * 1000,
+                prompt_tokens=usage.prompt_tokens if usage else None,
+                completion_tokens=usage.completion_tokens if usage else buffer.tokens,
+            )
+        return buffer.text
     except Exception as e:
         error_text = f"Error generating textual answer: {e}"
-        placeholder.markdown(error_text)
+        answer_container.markdown(error_text)
         return error_text
 
 
+@st.fragment
+def render_result_pages(sql_query, db_path, total_rows):
+    """
+    Page through a query's results on demand. Runs as a fragment, so changing
+    the page reruns only this viewer and fetches only the requested page.
+    """
+    page_count = max(1, -(-total_rows // PAGE_SIZE))
+    page = st.number_input(
+        f"עמוד (מתוך {page_count:,})",
+        min_value=1,
+        max_value=page_count,
+        value=1,
+        step=1,
+    )
+    results, columns_or_error = fetch_result_page(
+        sql_query, db_path, page - 1, PAGE_SIZE
+    )
+    if results is None:
+        st.error(f"שגיאה בביצוע שאילתת SQL: {columns_or_error}")
+        return
+    st.dataframe(
+        pd.DataFrame(results, columns=columns_or_error),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+async def answer_question_pipeline(question, db_path, trace):
+    """
+    Answer a question end to end: generate SQL, execute it, render the results
+    and stream the explanation. Every stage is recorded as a span of `trace`.
+
+    Blocking work runs in worker threads so the stages overlap: the results
+    table is rendered as soon as the query finishes, while the statistics and
+    the answer prompt are still being computed, and the statistics tab is
+    filled in while the answer streams.
+    """
+    async with AsyncOpenAI(api_key=st.secrets["openai_api_key"]) as async_client:
+        # Reuse the SQL of a previously answered identical question
+        cached_sql = lookup_cached_sql(question, db_path)
+        if cached_sql is not None:
+            sql_query = cached_sql
+            st.caption("⚡ השאילתה נטענה מהמטמון")
+        else:
+            # Generate the prompt for the AI from the relevant part of the schema
+            with trace.span("prompt_build"):
+                pruned_schema, prompt_tables = prune_schema(question, SCHEMA)
+                prompt = generate_better_sql_prompt(
+                    question, pruned_schema, select_examples(EXAMPLES, prompt_tables)
+                )
+                full_prompt_tokens = full_schema_prompt_tokens()
+                full_prompt_tokens += estimate_tokens(question)
+                prompt_tokens = estimate_tokens(prompt)
+            print(
+                f"SQL prompt tokens: {full_prompt_tokens} -> {prompt_tokens} "
+                f"(tables: {', '.join(prompt_tables)})"
+            )
+
+            with st.expander("פרטי SQL", expanded=False):
+                st.write(
+                    f"**Prompt tokens:** {prompt_tokens:,} "
+                    f"(full schema: {full_prompt_tokens:,})"
+                )
+                st.write("**Prompt for SQL Generation:**")
+                st.code(prompt, language="text")
+
+            try:
+                sql_query = await generate_sql_query(async_client, prompt, trace)
+            except Exception as e:
+                st.error(f"Error communicating with OpenAI: {e}")
+                return
+
+        # Check the plan before running model-generated SQL; ask once for a
+        # cheaper rewrite if it would be a cartesian product
+        if cached_sql is None:
+            with trace.span("sanitization"):
+                blocked = blocking_issues(
+                    await run_in_script_thread(precheck_query, sql_query, db_path)
+                )
+            if blocked:
+                st.warning("השאילתה שנוצרה יקרה מדי להרצה, מבקש גרסה יעילה יותר...")
+                try:
+                    sql_query = await request_cheaper_rewrite(
+                        async_client, question, sql_query, blocked, trace
+                    )
+                except Exception as e:
+                    st.error(f"Error communicating with OpenAI: {e}")
+                    return
+
+        with st.expander("קוד SQL שנוצר", expanded=False):
+            st.code(sql_query, language="sql")
+
+        # Execute the SQL query, fetching only the first page of results
+        with trace.span("execution") as span:
+            results, columns_or_error = await run_in_script_thread(
+                fetch_result_page, sql_query, db_path, 0, FIRST_PAGE_ROWS
+            )
+            if results is not None:
+                span["rows"] = len(results)
+                span["bytes"] = estimate_result_bytes(results, columns_or_error)
+        # Only SQL that returned rows is cached; a cached query that no
+        # longer does is dropped so the next asking regenerates it
+        if not results and cached_sql is not None:
+            forget_question_sql(question, db_path)
+        if results is None:
+            st.error(f"שגיאה בביצוע שאילתת SQL: {columns_or_error}")
+            return
+        if not results:
+            st.info("לא נמצאו נתונים לשאלה שהוזנה.")
+            return
+        if cached_sql is None:
+            store_question_sql(question, sql_query, db_path)
+
+        language = (
+            "hebrew" if any("\u0590" <= c <= "\u05FF" for c in question) else "english"
+        )
+        with trace.span("dataframe"):
+            df = await run_in_script_thread(
+                pd.DataFrame, results, columns=columns_or_error
+            )
+
+        # Only a full first page can have more rows behind it
+        if len(results) < FIRST_PAGE_ROWS:
+            total_rows, over_limit = len(results), False
+        else:
+            with trace.span("row_count"):
+                total_rows, over_limit = await run_in_script_thread(
+                    count_result_rows, sql_query, db_path
+                )
+            if total_rows is None:
+                total_rows, over_limit = len(results), False
+
+        # Statistics (computed by SQLite over the full result) and the answer
+        # prompt are prepared off the script thread while the table renders
+        summary_task = asyncio.create_task(
+            run_in_script_thread(
+                summarize_query_results,
+                sql_query,
+                db_path,
+                results,
+                columns_or_error,
+                total_rows,
+            )
+        )
+
+        async def prepare_answer_prompt():
+            _, result_description = await summary_task
+            return build_answer_prompt(
+                question, sql_query, result_description, language
+            )
+
+        answer_prompt_task = asyncio.create_task(prepare_answer_prompt())
+
+        # Nice results display
+        render_start = time.perf_counter()
+        st.markdown("### 📊 תוצאות הניתוח")
+
+        stats_placeholder = None
+        # For small result sets, show as a styled table
+        if total_rows <= 10:
+            st.dataframe(
+                df,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    col: st.column_config.Column(col, help=f"Column: {col}")
+                    for col in df.columns
+                },
+            )
+        else:
+            # For larger datasets, show summary and expandable full results
+            if over_limit:
+                st.write(f"**נמצאו יותר מ-{total_rows:,} שורות**")
+            else:
+                st.write(f"**נמצאו {total_rows:,} שורות**")
+            tab1, tab2 = st.tabs(["תצוגת טבלה", "סטטיסטיקה"])
+
+            with tab1:
+                st.dataframe(df.head(10), use_container_width=True, hide_index=True)
+                st.caption("מוצגות 10 השורות הראשונות בלבד")
+
+            with tab2:
+                stats_placeholder = st.empty()
+
+            with st.expander("הצג את כל הנתונים", expanded=False):
+                render_result_pages(sql_query, db_path, total_rows)
+        trace.record("rendering", (time.perf_counter() - render_start) * 1000)
+
+        # Generate a textual answer, streamed while the statistics are filled in.
+        # Only placeholders are written to after an await, never `with` blocks,
+        # so concurrent tasks cannot render into each other's containers.
+        st.markdown("### 📝 תשובה")
+        answer_container = st.empty()
+        answer_task = asyncio.create_task(
+            stream_textual_answer(
+                async_client, await answer_prompt_task, answer_container, trace
+            )
+        )
+
+        if stats_placeholder is not None:
+            # Show summary statistics if there are numeric columns
+            stats, _ = await summary_task
+            numeric_stats = stats_table(stats)
+            if numeric_stats:
+                with stats_placeholder.container():
+                    st.write("**סטטיסטיקה:**")
+                    st.dataframe(pd.DataFrame(numeric_stats), hide_index=True)
+
+        return await answer_task
+
+
+# Labels of the metrics shown for single-row routed answers
+ROUTED_METRIC_LABELS = {
+    "total_tickets": "סה״כ דוחות",
+    "disabled_tickets": "דוחות לרכבי נכים",
+    "percentage": "אחוז מסך הכל",
+    "report_count": "מספר דוחות",
+    "fine_total": "סכום קנסות",
+    "paid_total": "סכום ששולם",
+}
+
+
+def answer_routed_question(route, question, db_path, trace):
+    """
+    Answer a question matched by the intent router: run its templated SQL
+    and render the results with a templated answer, without calling OpenAI
+    """
+    st.caption(f"⚡ נענה מתבנית שאילתה ({route['intent']}), ללא פנייה למודל")
+    with st.expander("קוד SQL שנוצר", expanded=False):
+        st.code(route["sql"], language="sql")
+
+    with trace.span("execution") as span:
+        results, columns_or_error = execute_sql_query(route["sql"], db_path)
+        if results is not None:
+            span["rows"] = len(results)
+            span["bytes"] = estimate_result_bytes(results, columns_or_error)
+    if results is None:
+        st.error(f"שגיאה בביצוע שאילתת SQL: {columns_or_error}")
+        return None
+
+    render_start = time.perf_counter()
+    st.markdown("### 📊 תוצאות הניתוח")
+    df = pd.DataFrame(results, columns=columns_or_error)
+    if len(df) == 1 and set(df.columns) <= set(ROUTED_METRIC_LABELS):
+        metric_cols = st.columns(len(df.columns))
+        for metric_col, column in zip(metric_cols, df.columns):
+            value = df.iloc[0][column]
+            with metric_col:
+                st.metric(
+                    label=ROUTED_METRIC_LABELS[column],
+                    value=(
+                        f"{value}%" if column == "percentage" else f"{value or 0:,.0f}"
+                    ),
+                )
+        with st.expander("הצג נתונים גולמיים", expanded=False):
+            st.dataframe(df, hide_index=True)
+    elif not df.empty:
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+    language = (
+        "hebrew" if any("\u0590" <= c <= "\u05FF" for c in question) else "english"
+    )
+    st.markdown("### 📝 תשובה")
+    answer = answer_text(route, results, columns_or_error, language)
+    st.markdown(answer)
+    trace.record("rendering", (time.perf_counter() - render_start) * 1000)
+    return answer
+
+
 def add_debugging_tools(db_path):
     """Add debugging tools to the Streamlit app"""
 
@@ -876,9 +1137,8 @@ def add_debugging_tools(db_path):
 
         with col2:
             if st.button("Run Sample Date Query (Dec 2024)", type="primary"):
-                conn = sqlite3.connect(db_path)
+                cursor = get_read_connection(db_path).cursor()
                 try:
-                    cursor = conn.cursor()
                     cursor.execute(
                         "SELECT \"שם פקח\", COUNT(*) as count FROM enforcement WHERE date_formatted BETWEEN '2024-12-01' AND '2024-12-31' GROUP BY \"שם פקח\" ORDER BY count DESC"
                     )
@@ -893,7 +1153,42 @@ def add_debugging_tools(db_path):
                 except Exception as e:
                     st.error(f"Query error: {e}")
                 finally:
-                    conn.close()
+                    cursor.close()
+
+        st.write("**Answer rendering:**")
+        st.json(render_totals())
+
+        st.write("**Pipeline latency (p50/p95 over recent questions):**")
+        conn = get_read_connection(db_path)
+        summaries = stage_summaries(conn)
+        if summaries:
+            st.dataframe(pd.DataFrame(summaries), hide_index=True)
+            st.download_button(
+                "Download Prometheus metrics",
+                prometheus_text(conn),
+                file_name=PROMETHEUS_FILE,
+                mime="text/plain",
+            )
+        else:
+            st.info("No questions answered yet")
+
+        col3, col4 = st.columns(2)
+
+        with col3:
+            if st.button("Suggest Indexes", type="primary"):
+                suggestions = advise_indexes(db_path)
+                if suggestions:
+                    st.dataframe(pd.DataFrame(suggestions), hide_index=True)
+                else:
+                    st.info("No missing indexes found in the query log")
+
+        with col4:
+            if st.button("Create Suggested Indexes", type="primary"):
+                created = advise_indexes(db_path, create=True)
+                if created:
+                    st.dataframe(pd.DataFrame(created), hide_index=True)
+                else:
+                    st.info("No missing indexes found in the query log")
 
 
 def create_feature_cards():
@@ -954,6 +1249,256 @@ def create_feature_cards():
         )
 
 
+def render_analysis(analysis_type, db_path):
+    """
+    Renders one of the Data Analysis tab's analyses from the ingest rollups
+    """
+    conn = get_read_connection(db_path)
+    try:
+        months = rollup_months(conn)
+    except sqlite3.Error as e:
+        st.error(f"טבלאות הסיכום אינן זמינות: {e}")
+        return
+    if not months:
+        st.info("אין נתונים לניתוח.")
+        return
+
+    start_month, end_month = months[0], months[-1]
+    if len(months) > 1:
+        start_month, end_month = st.select_slider(
+            "טווח חודשים", options=months, value=(months[0], months[-1])
+        )
+
+    start_time = time.perf_counter()
+    try:
+        if analysis_type == "התפלגות דוחות לפי חודשים":
+            frame = monthly_report_counts(conn, start_month, end_month)
+            st.bar_chart(frame, x="month", y="report_count")
+            st.line_chart(frame, x="month", y=["fine_total", "paid_total"])
+            st.dataframe(
+                frame.rename(
+                    columns={
+                        "month": "חודש",
+                        "report_count": "מספר דוחות",
+                        "fine_total": "סך קנסות",
+                        "paid_total": "סך שולם",
+                    }
+                ),
+                use_container_width=True,
+            )
+        elif analysis_type == "השוואת פקחים":
+            frame = inspector_comparison(conn, start_month, end_month)
+            frame["average_fine"] = (frame["fine_total"] / frame["report_count"]).round(1)
+            st.bar_chart(frame.head(20), x="inspector", y="report_count")
+            st.dataframe(
+                frame.rename(
+                    columns={
+                        "inspector": "שם פקח",
+                        "report_count": "מספר דוחות",
+                        "fine_total": "סך קנסות",
+                        "paid_total": "סך שולם",
+                        "active_months": "חודשים פעילים",
+                        "average_fine": "קנס ממוצע",
+                    }
+                ),
+                use_container_width=True,
+            )
+        elif analysis_type == "מגמות לפי אזורים":
+            area_label = st.radio(
+                "סוג אזור", ["אזור פיקוח", "אזור חניה"], horizontal=True
+            )
+            area_column = (
+                "supervision_area" if area_label == "אזור פיקוח" else "parking_area"
+            )
+            frame = area_trends(conn, area_column, start_month, end_month)
+            st.line_chart(frame)
+            st.dataframe(frame, use_container_width=True)
+        elif analysis_type == "ניתוח תשלומים":
+            frame = payment_totals(conn, start_month, end_month)
+            st.bar_chart(frame, x="month", y=["charge_total", "credit_total"])
+            totals = st.columns(3)
+            totals[0].metric("סך חיובים", f"{frame['charge_total'].sum():,.0f}")
+            totals[1].metric("סך זיכויים", f"{frame['credit_total'].sum():,.0f}")
+            totals[2].metric("תנועות", f"{int(frame['transaction_count'].sum()):,}")
+            st.dataframe(
+                frame.rename(
+                    columns={
+                        "month": "חודש",
+                        "transaction_count": "תנועות",
+                        "report_count": "דוחות",
+                        "charge_total": "סך חיובים",
+                        "credit_total": "סך זיכויים",
+                        "net_total": "נטו",
+                    }
+                ),
+                use_container_width=True,
+            )
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        st.error(f"שגיאה בטעינת הניתוח: {e}")
+        return
+    st.caption(f"חושב מטבלאות סיכום ב-{(time.perf_counter() - start_time) * 1000:.0f} ms")
+
+
+# Report type labels in the Reports tab -> reports.REPORT_TYPES
+REPORT_TYPE_LABELS = {
+    "דו״ח חודשי": "monthly",
+    "דו״ח רבעוני": "quarterly",
+    "דו״ח שנתי": "yearly",
+    "דו״ח מותאם אישית": "custom",
+}
+
+
+def show_report(result):
+    """
+    Shows one generated report with its download buttons
+    """
+    sections = read_report(result["files"])
+    summary = sections["summary"].iloc[0]
+    st.markdown(f"### {summary['period']}")
+    metric_cols = st.columns(4)
+    metric_cols[0].metric("מספר דוחות", f"{int(summary['report_count']):,}")
+    metric_cols[1].metric("סך קנסות", f"{summary['fine_total']:,.0f}")
+    metric_cols[2].metric("סך שולם", f"{summary['paid_total']:,.0f}")
+    metric_cols[3].metric("סך חיובים", f"{summary['charge_total']:,.0f}")
+
+    section_labels = {
+        "by_month": "לפי חודשים",
+        "by_inspector": "לפי פקחים",
+        "by_area": "לפי אזורים",
+        "payments": "תשלומים",
+    }
+    section_tabs = st.tabs(list(section_labels.values()))
+    for tab, name in zip(section_tabs, section_labels):
+        with tab:
+            st.dataframe(sections[name], use_container_width=True)
+
+    period_key = result["period"]["key"]
+    download_cols = st.columns(2)
+    with download_cols[0]:
+        st.download_button(
+            "⬇️ הורד CSV",
+            report_archive(result["files"]),
+            file_name=f"report_{period_key}.zip",
+            mime="application/zip",
+        )
+    if "xlsx" in result["files"]:
+        with download_cols[1], open(result["files"]["xlsx"][0], "rb") as workbook:
+            st.download_button(
+                "⬇️ הורד Excel",
+                workbook.read(),
+                file_name=f"report_{period_key}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+
+
+def render_reports_tab(db_path):
+    """
+    Report type and period selectors plus generation of one or all periods
+    """
+    try:
+        months = rollup_months(get_read_connection(db_path))
+    except sqlite3.Error as e:
+        st.error(f"טבלאות הסיכום אינן זמינות: {e}")
+        return
+    if not months:
+        st.info("אין נתונים להפקת דוחות.")
+        return
+
+    report_cols = st.columns(2)
+    with report_cols[0]:
+        report_label = st.selectbox("סוג דו״ח", list(REPORT_TYPE_LABELS))
+    report_type = REPORT_TYPE_LABELS[report_label]
+
+    with report_cols[1]:
+        if report_type == "custom":
+            start_month, end_month = st.select_slider(
+                "תקופה", options=months, value=(months[0], months[-1])
+            )
+            periods = [make_period("custom", start_month, end_month)]
+            period = periods[0]
+        else:
+            periods = report_periods(report_type, months)
+            period = st.selectbox(
+                "תקופה",
+                periods,
+                index=len(periods) - 1,
+                format_func=lambda p: p["label"],
+            )
+
+    button_cols = st.columns(2)
+    with button_cols[0]:
+        generate_report = st.button("📄 הפק דו״ח", type="primary")
+    with button_cols[1]:
+        generate_all = st.button(
+            "🗂️ הפק את כל התקופות", disabled=report_type == "custom"
+        )
+
+    if generate_report:
+        with st.spinner("מפיק דו״ח..."):
+            results = generate_reports(db_path, [period])
+        show_report(results[period["key"]])
+    elif generate_all:
+        start_time = time.perf_counter()
+        with st.spinner(f"מפיק {len(periods)} דוחות..."):
+            results = generate_reports(db_path, periods)
+        cached = sum(result["cached"] for result in results.values())
+        st.success(
+            f"הופקו {len(results)} דוחות ({cached} מהמטמון) "
+            f"ב-{time.perf_counter() - start_time:.2f} שניות"
+        )
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "תקופה": result["period"]["label"],
+                        "מהמטמון": result["cached"],
+                        "זמן (שניות)": result["seconds"],
+                        "תיקייה": os.path.dirname(result["files"]["csv"][0]),
+                    }
+                    for result in results.values()
+                ]
+            ),
+            use_container_width=True,
+        )
+
+
+# Search scope labels -> report_text_fts column (None searches all of them)
+SEARCH_SCOPES = {"הכל": None, "הערות": "notes", "רחוב": "street", "מיקום": "location"}
+
+
+def render_report_search(db_path):
+    """
+    Direct full-text search over inspector/report notes, streets and locations
+    """
+    with st.expander("🔎 חיפוש בדוחות (הערות, רחובות ומיקומים)"):
+        search_cols = st.columns([3, 1])
+        with search_cols[0]:
+            search_text = st.text_input(
+                "טקסט לחיפוש",
+                placeholder="לדוגמה: חסימת מעבר",
+                key="report_search_text",
+            )
+        with search_cols[1]:
+            scope = st.selectbox("חפש ב", list(SEARCH_SCOPES), key="report_search_scope")
+        if not search_text.strip():
+            return
+
+        start_time = time.perf_counter()
+        try:
+            results = search_reports(
+                get_read_connection(db_path), search_text, column=SEARCH_SCOPES[scope]
+            )
+        except sqlite3.Error as e:
+            st.error(f"שגיאה בחיפוש: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        if results is None or results.empty:
+            st.info("לא נמצאו דוחות מתאימים.")
+            return
+        st.caption(f"נמצאו {len(results):,} דוחות ב-{elapsed_ms:.0f} ms")
+        st.dataframe(results, use_container_width=True)
+
+
 def main():
     # Custom header with logo
     st.markdown(
@@ -1052,166 +1597,28 @@ def main():
 
             # Animated loading indicator
             with st.spinner("⏳ מעבד את השאלה שלך..."):
-                # Check for specific questions that need special handling
-                is_disabled_percentage_question = any(
-                    term in question.lower()
-                    for term in ["נכים", "disabled", "percentage", "אחוז"]
-                )
-
-                if is_disabled_percentage_question and "רכב" in question:
-                    # Direct handling for the disabled vehicles percentage question
-                    results, columns_or_error = get_disabled_vehicle_percentage(db_path)
-
-                    if results is not None:
-                        df = pd.DataFrame(results, columns=columns_or_error)
-
-                        # Create a nice visualization card for the results
-                        st.markdown("### 📊 תוצאות הניתוח")
-
-                        # Create metrics display
-                        metric_cols = st.columns(3)
-                        with metric_cols[0]:
-                            st.metric(
-                                label="סה״כ דוחות", value=f"{int(df.iloc[0][0]):,}"
-                            )
-                        with metric_cols[1]:
-                            st.metric(
-                                label="דוחות לרכבי נכים",
-                                value=f"{int(df.iloc[0][1]):,}",
-                            )
-                        with metric_cols[2]:
-                            st.metric(label="אחוז מסך הכל", value=f"{df.iloc[0][2]}%")
-
-                        # Create expandable raw data section
-                        with st.expander("הצג נתונים גולמיים", expanded=False):
-                            st.dataframe(df)
-
-                        # Generate a textual answer
-                        language = (
-                            "hebrew"
-                            if any("\u0590" <= c <= "\u05FF" for c in question)
-                            else "english"
-                        )
-                        sql_query = (
-                            "Special query for calculating disabled vehicle percentage"
-                        )
-
-                        st.markdown("### 📝 תשובה")
-                        textual_answer = generate_textual_answer(
-                            question, sql_query, results, columns_or_error, language
+                trace = RequestTrace()
+                try:
+                    # Common question shapes are answered from SQL templates
+                    with trace.span("routing"):
+                        route = route_question(
+                            question, latest_data_date(get_read_connection(db_path))
                         )
+                    if route is not None:
+                        trace.path = "routed"
+                        answer_routed_question(route, question, db_path, trace)
                     else:
-                        st.error(f"Error: {columns_or_error}")
-                else:
-                    # Normal flow for other questions
-                    # Generate the prompt for the AI
-                    prompt = generate_better_sql_prompt(question, schema, examples)
-
-                    with st.expander("פרטי SQL", expanded=False):
-                        st.write("**Prompt for SQL Generation:**")
-                        st.code(prompt, language="text")
-
-                    try:
-                        # Call the OpenAI API to generate the SQL query
-                        response = client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": (
-                                        "You are a helpful assistant that generates SQL queries for SQLite based on natural language "
-                                        "questions and a given database schema. Use specific date literals rather than SQLite date functions."
-                                    ),
-                                },
-                                {"role": "user", "content": prompt},
-                            ],
-                            max_tokens=150,
-                            temperature=0.0,
-                        )
-                        full_response = response.choices[0].message.content.strip()
-                    except Exception as e:
-                        st.error(f"Error communicating with OpenAI: {e}")
-                        return
-
-                    # Extract the SQL query using regex; allow for trailing semicolons
-                    sql_match = re.search(
-                        r"(SELECT.*?;?)$", full_response, re.DOTALL | re.IGNORECASE
+                        # Normal flow for other questions
+                        asyncio.run(answer_question_pipeline(question, db_path, trace))
+                finally:
+                    save_trace(
+                        trace, db_path, st.secrets.get("metrics_file", PROMETHEUS_FILE)
                     )
-                    if sql_match:
-                        sql_query = sql_match.group(1).strip()
-                    else:
-                        sql_query = full_response  # Fallback if regex fails
-
-                    with st.expander("קוד SQL שנוצר", expanded=False):
-                        st.code(sql_query, language="sql")
-
-                    # Execute the SQL query and display the results
-                    results, columns_or_error = execute_sql_query(sql_query, db_path)
-                    if results is not None:
-                        if results:
-                            df = pd.DataFrame(results, columns=columns_or_error)
-
-                            # Nice results display
-                            st.markdown("### 📊 תוצאות הניתוח")
-
-                            # For small result sets, show as a styled table
-                            if len(df) <= 10:
-                                st.dataframe(
-                                    df,
-                                    use_container_width=True,
-                                    hide_index=True,
-                                    column_config={
-                                        col: st.column_config.Column(
-                                            col, help=f"Column: {col}"
-                                        )
-                                        for col in df.columns
-                                    },
-                                )
-                            else:
-                                # For larger datasets, show summary and expandable full results
-                                st.write(f"**נמצאו {len(df)} שורות**")
-                                tab1, tab2 = st.tabs(["תצוגת טבלה", "סטטיסטיקה"])
-
-                                with tab1:
-                                    st.dataframe(
-                                        df.head(10),
-                                        use_container_width=True,
-                                        hide_index=True,
-                                    )
-                                    st.caption("מוצגות 10 השורות הראשונות בלבד")
-
-                                with tab2:
-                                    # Show summary statistics if there are numeric columns
-                                    numeric_cols = df.select_dtypes(
-                                        include=["number"]
-                                    ).columns
-                                    if len(numeric_cols) > 0:
-                                        st.write("**סטטיסטיקה:**")
-                                        st.dataframe(df[numeric_cols].describe())
-
-                                with st.expander("הצג את כל הנתונים", expanded=False):
-                                    st.dataframe(
-                                        df, use_container_width=True, hide_index=True
-                                    )
-
-                            # Generate a textual answer
-                            language = (
-                                "hebrew"
-                                if any("\u0590" <= c <= "\u05FF" for c in question)
-                                else "english"
-                            )
-
-                            st.markdown("### 📝 תשובה")
-                            textual_answer = generate_textual_answer(
-                                question, sql_query, results, columns_or_error, language
-                            )
-                        else:
-                            st.info("לא נמצאו נתונים לשאלה שהוזנה.")
-                    else:
-                        st.error(f"שגיאה בביצוע שאילתת SQL: {columns_or_error}")
 
             st.markdown("</div>", unsafe_allow_html=True)
 
+        render_report_search(db_path)
+
     with tabs[1]:  # Data Analysis tab
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("## 📊 ניתוח נתונים")
@@ -1227,43 +1634,14 @@ def main():
             ],
         )
 
-        st.write("תצוגת ניתוח תופיע כאן לאחר פיתוח הפונקציונליות.")
+        render_analysis(analysis_type, db_path)
         st.markdown("</div>", unsafe_allow_html=True)
 
     with tabs[2]:  # Reports tab
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("## 📋 דוחות")
 
-        report_cols = st.columns(2)
-        with report_cols[0]:
-            report_type = st.selectbox(
-                "סוג דו״ח",
-                ["דו״ח חודשי", "דו״ח רבעוני", "דו״ח שנתי", "דו״ח מותאם אישית"],
-            )
-
-        with report_cols[1]:
-            period = st.selectbox(
-                "תקופה",
-                [
-                    "ינואר 2024",
-                    "פברואר 2024",
-                    "מרץ 2024",
-                    "אפריל 2024",
-                    "מאי 2024",
-                    "יוני 2024",
-                    "יולי 2024",
-                    "אוגוסט 2024",
-                    "ספטמבר 2024",
-                    "אוקטובר 2024",
-                    "נובמבר 2024",
-                    "דצמבר 2024",
-                ],
-            )
-
-        generate_report = st.button("📄 הפק דו״ח", type="primary")
-
-        if generate_report:
-            st.info("פונקציונליות הפקת דוחות תתווסף בגרסה הבאה.")
+        render_reports_tab(db_path)
 
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -1279,6 +1657,34 @@ def main():
             st.toggle("הצג הערות פקח בתוצאות", value=True)
             st.toggle("שמור היסטוריית שאילתות", value=True)
 
+            st.write("מטמון תוצאות שאילתות:")
+            cache_stats = get_result_cache().stats()
+            cache_cols = st.columns(4)
+            with cache_cols[0]:
+                st.metric(label="פגיעות", value=f"{cache_stats['hits']:,}")
+            with cache_cols[1]:
+                st.metric(label="החטאות", value=f"{cache_stats['misses']:,}")
+            with cache_cols[2]:
+                st.metric(label="רשומות במטמון", value=f"{cache_stats['entries']:,}")
+            with cache_cols[3]:
+                st.metric(
+                    label="נפח (MB)",
+                    value=f"{cache_stats['bytes'] / 1024 / 1024:.1f} / "
+                    f"{cache_stats['max_bytes'] / 1024 / 1024:.0f}",
+                )
+            if st.button("נקה מטמון תוצאות"):
+                get_result_cache().clear()
+
+            st.write(
+                f"מנוע שאילתות: {get_query_engine(db_path).name} "
+                "(ניתן לשנות בהגדרה query_engine: sqlite / duckdb)"
+            )
+            st.write(
+                "אחסון דוחות: "
+                f"{st.secrets.get('report_storage', DEFAULT_REPORT_STORAGE)} "
+                "(ניתן לשנות בהגדרה report_storage: shared / separate)"
+            )
+
         with settings_tabs[1]:
             st.write("הגדרות מודל AI:")
             st.selectbox("מודל OpenAI", ["GPT-4o", "GPT-3.5 Turbo"])
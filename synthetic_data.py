@@ -0,0 +1,338 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingest import SOURCE_FILES
+
+# Rows generated and written per chunk, so 10M-row files never sit in memory
+GENERATE_CHUNK_ROWS = 500_000
+
+# Preset sizes (rows per source file) for the benchmark
+SCALES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Share of report_data rows that repeat an enforcement row (the rest are
+# reports only report_data has)
+DEFAULT_OVERLAP = 0.9
+
+# Report dates are spread over these years
+FIRST_YEAR = 2021
+LAST_YEAR = 2024
+
+REPORT_COLUMNS = [
+    "מס' דו''ח", "תאריך", "יום", "שעה", "קוד פקח", "שם פקח", "קוד רחוב",
+    "שם רחוב", "מיקום", "מס' בית", "עבירה", "מס ' רישוי", "סוג", "צבע", "תוצרת",
+    "נכה", "מבוקש", "ננעל/נגרר", "כרטיס חניה 1", "כרטיס חניה 2", "תאריך קובע",
+    "לתשלום עד", "קנס", "הערת פקח 1", "הערת פקח 2", "הערת פקח 3", "הערת פקח 4",
+    "אזור חניה", "אזור פיקוח", "ת''ז", "שם משפחה", "שם פרטי", "רחוב", "'מס",
+    "דירה", "עיר", "מיקוד", "שולם", "לתשלום", "תאריך תשלום", "ערעור מתאריך",
+    "הסבה מתאריך", "בקשה להישפט", "מספר יחודי", "סטטוס לדוח", "פעולה",
+    "מספר שבב", "/דוח מוביל", "מספר דרכון",
+]
+
+# report_data has one column enforcement lacks
+REPORT_DATA_COLUMNS = (
+    REPORT_COLUMNS[:44] + ["הערות לדוח"] + REPORT_COLUMNS[44:]
+)
+
+TRANSACTION_COLUMNS = [
+    "מס' דו''ח", "תאריך", "סוג", "ת.תשלום", "חיוב", "זיכוי", "ת. פירעון",
+]
+
+ADDRESS_COLUMNS = [
+    "מס' דו''ח", "תאריך", "ת.ז", "שם משפחה", "שם פרטי", "רחוב", "מס", "דירה",
+    "מיקוד", "ת.ד", "עיר", "מקור",
+]
+
+# Value pools; inspectors, streets and offenses keep their codes and fines
+INSPECTORS = [
+    (101, "כהן"), (102, "לוי"), (103, "מזרחי"), (104, "פרץ"), (105, "ביטון"),
+    (106, "אברהם"), (107, "פרידמן"), (108, "דהן"), (109, "אזולאי"), (110, "גבאי"),
+    (111, "שפירא"), (112, "חדד"),
+]
+STREETS = [
+    (1, "הרצל"), (2, "ביאליק"), (3, "ויצמן"), (4, "רוטשילד"), (5, "בן יהודה"),
+    (6, "ז'בוטינסקי"), (7, "אלנבי"), (8, "דיזנגוף"), (9, "סוקולוב"),
+    (10, "העצמאות"), (11, "הנביאים"), (12, "קק\"ל"),
+]
+OFFENSES = [
+    ("חניה אסורה", 250), ("חניה על מדרכה", 500), ("חניה במקום נכים", 1000),
+    ("אי תשלום דמי חניה", 100), ("חניה בתחנת אוטובוס", 500),
+    ("עצירה באדום לבן", 250), ("חניה במעבר חציה", 500),
+]
+LOCATIONS = [
+    "ליד חנות", "מול בית ספר", "ליד תחנת אוטובוס", "על המדרכה", "במעבר חציה",
+    "ליד הבנק", "בחניון",
+]
+# Repeated empty values make most notes empty, as in the real data
+NOTES = [
+    "", "", "", "רכב חונה על מדרכה", "חסימת מעבר", "חסימת חניה",
+    "הנהג לא נמצא ברכב", "צולם", "הודבק דוח על השמשה",
+]
+REPORT_NOTES = ["", "", "", "ערעור", "הוסב לנהג", "נשלחה דרישה", "בטיפול"]
+VEHICLE_TYPES = ["פרטי", "פרטי", "פרטי", "מסחרי", "אופנוע", "משאית"]
+COLORS = ["לבן", "שחור", "כסוף", "אפור", "אדום", "כחול"]
+MAKES = ["טויוטה", "יונדאי", "קיה", "מאזדה", "סקודה", "שברולט", "פולקסווגן"]
+PARKING_AREAS = ["א", "ב", "ג", "ד"]
+SUPERVISION_AREAS = ["צפון", "דרום", "מרכז", "מזרח"]
+LAST_NAMES = ["ישראלי", "כהן", "לוי", "פרץ", "אוחנה", "שטרן", "גולן", "נחום"]
+FIRST_NAMES = ["ישראל", "משה", "דוד", "שרה", "רחל", "יוסי", "מיכל", "נועה"]
+CITIES = ["תל אביב", "רמת גן", "חולון", "בת ים", "גבעתיים", "ירושלים"]
+STATUSES = ["פתוח", "שולם", "בערעור", "בוטל", "בגבייה"]
+ACTIONS = ["", "", "דרישה ראשונה", "התראה", "עיקול"]
+ADDRESS_SOURCES = ["משרד הפנים", "משרד התחבורה", "פנייה אישית"]
+HEBREW_WEEKDAYS = ["שני", "שלישי", "רביעי", "חמישי", "שישי", "שבת", "ראשון"]
+TOWED_VALUES = ["", "נגרר", "ננעל"]
+
+
+def pick(rng, values, size, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+
+def date_texts():
+    """
+    DD/MM/YYYY text and Hebrew weekday of every day from FIRST_YEAR on (with
+    room for due and payment dates after LAST_YEAR), indexed by day number;
+    looking dates up here is much faster than strftime on every row
+    """
+    days = pd.date_range(f"{FIRST_YEAR}-01-01", f"{LAST_YEAR + 2}-12-31")
+    texts = np.append(days.strftime("%d/%m/%Y").to_numpy(dtype=object), "")
+    weekdays = np.array(HEBREW_WEEKDAYS, dtype=object)[days.dayofweek]
+    return texts, weekdays
+
+
+DATE_TEXTS, WEEKDAYS = date_texts()
+
+# Days from FIRST_YEAR through LAST_YEAR
+REPORT_DAYS = len(pd.date_range(f"{FIRST_YEAR}-01-01", f"{LAST_YEAR}-12-31"))
+
+# Day number that formats as an empty date
+NO_DATE = -1
+
+
+def format_dates(days):
+    """
+    DD/MM/YYYY text for an array of day numbers; NO_DATE becomes ""
+    """
+    return DATE_TEXTS[days]
+
+
+# HH:MM text of every minute of the day
+TIME_TEXTS = np.array(
+    [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60)], dtype=object
+)
+
+
+def random_days(rng, size):
+    """
+    Day numbers (indexes into DATE_TEXTS) of random report dates
+    """
+    return rng.integers(0, REPORT_DAYS, size=size)
+
+
+def report_chunk(rng, numbers):
+    """
+    Random enforcement rows for the given report numbers
+    """
+    size = len(numbers)
+    days = random_days(rng, size)
+    inspector = rng.integers(0, len(INSPECTORS), size=size)
+    street = rng.integers(0, len(STREETS), size=size)
+    offense = rng.choice(
+        len(OFFENSES), size=size, p=[0.3, 0.2, 0.08, 0.2, 0.08, 0.08, 0.06]
+    )
+    fines = np.array([fine for _, fine in OFFENSES])[offense]
+
+    # Paid in full, partly or not at all
+    payment = rng.choice(3, size=size, p=[0.6, 0.1, 0.3])
+    paid = np.where(payment == 0, fines, np.where(payment == 1, fines // 2, 0))
+    paid_days = np.where(payment < 2, days + rng.integers(1, 90, size=size), NO_DATE)
+    appealed = rng.random(size) < 0.05
+
+    frame = pd.DataFrame(
+        {
+            "מס' דו''ח": numbers,
+            "תאריך": format_dates(days),
+            "יום": WEEKDAYS[days],
+            "שעה": TIME_TEXTS[rng.integers(7 * 60, 23 * 60, size=size)],
+            "קוד פקח": np.array([code for code, _ in INSPECTORS])[inspector],
+            "שם פקח": np.array([name for _, name in INSPECTORS], dtype=object)[inspector],
+            "קוד רחוב": np.array([code for code, _ in STREETS])[street],
+            "שם רחוב": np.array([name for _, name in STREETS], dtype=object)[street],
+            "מיקום": pick(rng, LOCATIONS, size),
+            "מס' בית": rng.integers(1, 150, size=size),
+            "עבירה": np.array([name for name, _ in OFFENSES], dtype=object)[offense],
+            "מס ' רישוי": rng.integers(10_000_000, 99_999_999, size=size),
+            "סוג": pick(rng, VEHICLE_TYPES, size),
+            "צבע": pick(rng, COLORS, size),
+            "תוצרת": pick(rng, MAKES, size),
+            "נכה": np.where(rng.random(size) < 0.08, "כן", "לא"),
+            "מבוקש": np.where(rng.random(size) < 0.02, "כן", ""),
+            "ננעל/נגרר": pick(rng, TOWED_VALUES, size, p=[0.96, 0.03, 0.01]),
+            "כרטיס חניה 1": np.where(rng.random(size) < 0.1, "תושב", ""),
+            "כרטיס חניה 2": "",
+            "תאריך קובע": format_dates(days),
+            "לתשלום עד": format_dates(days + 90),
+            "קנס": fines,
+            "הערת פקח 1": pick(rng, NOTES, size),
+            "הערת פקח 2": np.where(rng.random(size) < 0.2, pick(rng, NOTES, size), ""),
+            "הערת פקח 3": "",
+            "הערת פקח 4": "",
+            "אזור חניה": pick(rng, PARKING_AREAS, size),
+            "אזור פיקוח": pick(rng, SUPERVISION_AREAS, size),
+            "ת''ז": rng.integers(10_000_000, 399_999_999, size=size),
+            "שם משפחה": pick(rng, LAST_NAMES, size),
+            "שם פרטי": pick(rng, FIRST_NAMES, size),
+            "רחוב": np.array([name for _, name in STREETS], dtype=object)[
+                rng.integers(0, len(STREETS), size=size)
+            ],
+            "'מס": rng.integers(1, 150, size=size),
+            "דירה": rng.integers(1, 30, size=size),
+            "עיר": pick(rng, CITIES, size),
+            "מיקוד": rng.integers(1_000_000, 9_999_999, size=size),
+            "שולם": paid,
+            "לתשלום": fines - paid,
+            "תאריך תשלום": format_dates(paid_days),
+            "ערעור מתאריך": format_dates(np.where(appealed, days + 10, NO_DATE)),
+            "הסבה מתאריך": "",
+            "בקשה להישפט": np.where(rng.random(size) < 0.01, "כן", ""),
+            "מספר יחודי": numbers + 5_000_000,
+            "סטטוס לדוח": np.where(payment == 0, "שולם", pick(rng, STATUSES, size)),
+            "פעולה": pick(rng, ACTIONS, size),
+            "מספר שבב": "",
+            "/דוח מוביל": "",
+            "מספר דרכון": "",
+        }
+    )
+    return frame[REPORT_COLUMNS]
+
+
+def report_data_chunk(rng, enforcement, new_numbers, overlap):
+    """
+    report_data rows for one enforcement chunk: each row repeats its
+    enforcement row with probability `overlap` and is a new report otherwise
+    """
+    size = len(enforcement)
+    new = report_chunk(rng, new_numbers)
+    repeat = rng.random(size) < overlap
+    frame = pd.DataFrame(
+        {
+            column: np.where(
+                repeat, enforcement[column].to_numpy(), new[column].to_numpy()
+            )
+            for column in REPORT_COLUMNS
+        }
+    )
+    notes = pick(rng, REPORT_NOTES, size)
+    frame.insert(REPORT_DATA_COLUMNS.index("הערות לדוח"), "הערות לדוח", notes)
+    return frame
+
+
+def transaction_chunk(rng, numbers):
+    """
+    One transaction per report, in random order
+    """
+    size = len(numbers)
+    days = random_days(rng, size)
+    kind = rng.choice(3, size=size, p=[0.75, 0.15, 0.1])
+    amount = pick(rng, [100, 250, 500, 1000], size)
+    return pd.DataFrame(
+        {
+            "מס' דו''ח": rng.permutation(numbers),
+            "תאריך": format_dates(days),
+            "סוג": np.array(["תשלום", "זיכוי", "חיוב"], dtype=object)[kind],
+            "ת.תשלום": format_dates(days + rng.integers(0, 30, size)),
+            "חיוב": np.where(kind != 1, amount, 0),
+            "זיכוי": np.where(kind == 1, amount, 0),
+            "ת. פירעון": format_dates(days + 30),
+        }
+    )[TRANSACTION_COLUMNS]
+
+
+def address_chunk(rng, numbers):
+    size = len(numbers)
+    return pd.DataFrame(
+        {
+            "מס' דו''ח": numbers,
+            "תאריך": format_dates(random_days(rng, size)),
+            "ת.ז": rng.integers(10_000_000, 399_999_999, size=size),
+            "שם משפחה": pick(rng, LAST_NAMES, size),
+            "שם פרטי": pick(rng, FIRST_NAMES, size),
+            "רחוב": np.array([name for _, name in STREETS], dtype=object)[
+                rng.integers(0, len(STREETS), size=size)
+            ],
+            "מס": rng.integers(1, 150, size=size),
+            "דירה": rng.integers(1, 30, size=size),
+            "מיקוד": rng.integers(1_000_000, 9_999_999, size=size),
+            "ת.ד": np.where(
+                rng.random(size) < 0.05, rng.integers(1, 9999, size).astype(str), ""
+            ),
+            "עיר": pick(rng, CITIES, size),
+            "מקור": pick(rng, ADDRESS_SOURCES, size),
+        }
+    )[ADDRESS_COLUMNS]
+
+
+def generate_dataset(
+    output_dir, rows, seed=0, overlap=DEFAULT_OVERLAP, chunksize=GENERATE_CHUNK_ROWS
+):
+    """
+    Writes synthetic versions of the four source CSVs (SOURCE_FILES names,
+    `rows` rows each) to output_dir. Report numbers run from 1, so the
+    prompt examples ("report number 123") find their report. The same seed
+    always gives the same files.
+
+    Returns {table name: CSV path}.
+    """
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {t: os.path.join(output_dir, f) for t, f in SOURCE_FILES.items()}
+    for path in paths.values():
+        if os.path.exists(path):
+            os.remove(path)
+
+    for offset in range(0, rows, chunksize):
+        rng = np.random.default_rng([seed, offset])
+        numbers = np.arange(offset + 1, min(offset + chunksize, rows) + 1)
+        enforcement = report_chunk(rng, numbers)
+        chunks = {
+            "enforcement": enforcement,
+            "report_data": report_data_chunk(rng, enforcement, numbers + rows, overlap),
+            "financial_transactions": transaction_chunk(rng, numbers),
+            "address_database": address_chunk(rng, numbers),
+        }
+        for table_name, chunk in chunks.items():
+            chunk.to_csv(
+                paths[table_name],
+                mode="a",
+                header=offset == 0,
+                index=False,
+                encoding="utf-8",
+            )
+
+    seconds = round(time.perf_counter() - start, 3)
+    print(f"Generated {rows:,} rows per source file in {output_dir} in {seconds}s")
+    return paths
+
+
+def parse_rows(value):
+    """
+    Row count from a preset name ("100k", "1m", "10m") or a number
+    """
+    return SCALES.get(value.lower()) or int(value.replace("_", ""))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Write synthetic source CSVs for benchmarking"
+    )
+    parser.add_argument("output_dir")
+    parser.add_argument("--rows", default="100k", help="100k, 1m, 10m or a number")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--overlap", type=float, default=DEFAULT_OVERLAP)
+    args = parser.parse_args()
+
+    generate_dataset(args.output_dir, parse_rows(args.rows), args.seed, args.overlap)
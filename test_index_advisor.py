@@ -0,0 +1,60 @@
+import functools
+import logging
+import sqlite3
+
+import index_advisor
+from index_advisor import (
+    QUERY_LOG_TABLE,
+    advise_indexes,
+    flush_query_log,
+    log_executed_query,
+    time_query,
+)
+from query_guard import query_budget
+
+RUNAWAY = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+    "SELECT COUNT(*) FROM n"
+)
+
+
+def test_time_query_stops_at_the_query_budget(monkeypatch, caplog):
+    monkeypatch.setattr(
+        index_advisor, "query_budget", functools.partial(query_budget, max_steps=100_000)
+    )
+    conn = sqlite3.connect(":memory:")
+
+    assert time_query(conn, "SELECT 1") >= 0
+    with caplog.at_level(logging.WARNING, logger="index_advisor"):
+        assert time_query(conn, RUNAWAY) is None
+    assert "steps budget" in caplog.text
+    conn.close()
+
+
+def test_query_log_errors_are_logged_not_raised(tmp_path, caplog):
+    db_path = str(tmp_path / "missing" / "reports.db")
+    log_executed_query("SELECT 1", 1.0, 1, db_path)
+
+    with caplog.at_level(logging.WARNING, logger="index_advisor"):
+        flush_query_log(db_path)
+    assert "Query log error, 1 queries dropped" in caplog.text
+
+
+def test_advisor_proposes_indexes_for_scanned_filters(tmp_path):
+    db_path = str(tmp_path / "reports.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, str(i % 7)) for i in range(500)])
+    conn.commit()
+    conn.close()
+    for _ in range(3):
+        log_executed_query("SELECT * FROM t WHERE b = '3'", 1.0, 71, db_path)
+
+    report = advise_indexes(db_path, create=True)
+
+    assert [(r["table"], r["column"], r["executions"]) for r in report] == [("t", "b", 3)]
+    assert report[0]["created"]
+    assert report[0]["before_ms"] is not None and report[0]["after_ms"] is not None
+    conn = sqlite3.connect(db_path)
+    assert conn.execute(f"SELECT COUNT(*) FROM {QUERY_LOG_TABLE}").fetchone()[0] == 3
+    conn.close()
@@ -0,0 +1,263 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from ingest import (
+    QUARANTINE_TABLE,
+    REPORT_COLUMN_TYPES,
+    SCHEMA_VERSION,
+    SOURCE_FILES,
+    SQLITE_TYPES,
+    build_database,
+    convert_chunk,
+    find_stale_tables,
+)
+
+
+def build(data_dir, report_storage="shared"):
+    return build_database(
+        str(data_dir / "reports.db"),
+        str(data_dir),
+        parallel=False,
+        report_storage=report_storage,
+    )
+
+
+def stale_tables(data_dir, report_storage="shared"):
+    conn = sqlite3.connect(data_dir / "reports.db")
+    try:
+        return find_stale_tables(
+            conn, source_dir=str(data_dir), report_storage=report_storage
+        )
+    finally:
+        conn.close()
+
+
+def row_count(data_dir, table_name):
+    conn = sqlite3.connect(data_dir / "reports.db")
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_first_build_loads_every_table(data_dir):
+    stats = build(data_dir)
+
+    assert set(stats) == set(SOURCE_FILES)
+    assert stale_tables(data_dir) == ({}, {})
+    conn = sqlite3.connect(data_dir / "reports.db")
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    conn.close()
+
+
+def test_unchanged_sources_are_not_rebuilt(data_dir):
+    build(data_dir)
+
+    assert build(data_dir) == {}
+
+
+def test_touched_identical_source_only_updates_the_manifest(data_dir):
+    build(data_dir)
+    path = data_dir / SOURCE_FILES["address_database"]
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 60))
+
+    stale, touched = stale_tables(data_dir)
+    assert stale == {}
+    assert set(touched) == {"address_database"}
+
+    assert build(data_dir) == {}
+    assert stale_tables(data_dir) == ({}, {})
+
+
+def test_changed_source_rebuilds_only_its_table(data_dir):
+    build(data_dir)
+    before = row_count(data_dir, "financial_transactions")
+    path = data_dir / SOURCE_FILES["financial_transactions"]
+    with open(path, encoding="utf-8") as f:
+        last_row = f.read().splitlines()[-1]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(last_row + "\n")
+
+    stale, _ = stale_tables(data_dir)
+    assert set(stale) == {"financial_transactions"}
+
+    assert set(build(data_dir)) == {"financial_transactions"}
+    assert row_count(data_dir, "financial_transactions") == before + 1
+
+
+def test_other_schema_version_rebuilds_everything(data_dir):
+    build(data_dir)
+    conn = sqlite3.connect(data_dir / "reports.db")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+    conn.commit()
+    conn.close()
+
+    stale, _ = stale_tables(data_dir)
+    assert set(stale) == set(SOURCE_FILES)
+
+
+def test_missing_table_is_rebuilt(data_dir):
+    build(data_dir)
+    conn = sqlite3.connect(data_dir / "reports.db")
+    conn.execute("DROP TABLE address_database")
+    conn.commit()
+    conn.close()
+
+    assert set(build(data_dir)) == {"address_database"}
+    assert row_count(data_dir, "address_database") > 0
+
+
+def test_columns_are_stored_with_their_declared_types(databases):
+    conn = sqlite3.connect(databases["separate"])
+    declared = {
+        row[1]: row[2] for row in conn.execute("PRAGMA table_info(enforcement)")
+    }
+    stored = conn.execute(
+        "SELECT typeof(\"מס' דו''ח\"), typeof(קנס), typeof(נכה), תאריך, תאריך_day "
+        "FROM enforcement WHERE תאריך IS NOT NULL LIMIT 1"
+    ).fetchone()
+    conn.close()
+
+    for column, kind in REPORT_COLUMN_TYPES.items():
+        assert declared[column] == SQLITE_TYPES[kind]
+    assert declared["תאריך_day"] == "INTEGER"
+    assert declared["שולם_flag"] == "INTEGER"
+    number_type, fine_type, flag_type, iso_date, day = stored
+    assert (number_type, fine_type, flag_type) == ("integer", "real", "integer")
+    assert day == (pd.Timestamp(iso_date) - pd.Timestamp("1970-01-01")).days
+
+
+def test_convert_chunk_types_values_and_reports_failures():
+    chunk = pd.DataFrame(
+        {
+            "מס' דו''ח": ["12", "13.5", "x", None],
+            "תאריך": ["05/07/2021", "31/02/2021", "", "01/01/2024 10:30"],
+            "קנס": ["1,000", "250 ₪", "", "abc"],
+            "נכה": ["כן", "לא", "", "אולי"],
+        }
+    )
+    converted, failures = convert_chunk("financial_transactions", chunk[["מס' דו''ח"]])
+    assert failures.tolist() == ["", "מס' דו''ח", "מס' דו''ח", ""]
+
+    converted, failures = convert_chunk("enforcement", chunk)
+    assert converted["מס' דו''ח"].tolist()[0] == 12
+    assert converted["תאריך"].tolist()[0] == "2021-07-05"
+    assert converted["תאריך"].tolist()[3] == "2024-01-01"
+    assert converted["תאריך_day"].tolist()[0] == 18813
+    assert converted["קנס"].tolist()[:2] == [1000.0, 250.0]
+    assert converted["קנס"].isna().tolist()[3]
+    assert converted["נכה"].tolist()[:3] == [1, 0, 0]
+    assert converted["נכה"].isna().tolist()[3]
+    # Only the key column and dates quarantine a row
+    assert failures.tolist() == ["", "מס' דו''ח;תאריך", "מס' דו''ח", ""]
+
+
+def test_rows_that_fail_conversion_are_quarantined(data_dir):
+    path = data_dir / SOURCE_FILES["financial_transactions"]
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    header, first = lines[0].split(","), lines[1].split(",")
+    bad_date = list(first)
+    bad_date[header.index("תאריך")] = "99/99/2024"
+    bad_amount = list(first)
+    bad_amount[header.index("מס' דו''ח")] = "990001"
+    bad_amount[header.index("חיוב")] = "not a number"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(",".join(bad_date) + "\n" + ",".join(bad_amount) + "\n")
+
+    build(data_dir)
+
+    conn = sqlite3.connect(data_dir / "reports.db")
+    quarantined = conn.execute(
+        f"SELECT line_number, failed_columns, raw_row FROM {QUARANTINE_TABLE} "
+        "WHERE table_name = 'financial_transactions'"
+    ).fetchall()
+    rows = conn.execute("SELECT COUNT(*) FROM financial_transactions").fetchone()[0]
+    amounts = conn.execute(
+        "SELECT \"חיוב\" FROM financial_transactions WHERE \"מס' דו''ח\" = 990001"
+    ).fetchall()
+    conn.close()
+
+    assert len(quarantined) == 1
+    line_number, failed_columns, raw_row = quarantined[0]
+    assert line_number == len(lines) + 1
+    assert failed_columns == "תאריך"
+    assert "99/99/2024" in raw_row
+    # An unparseable amount is stored as NULL and the row is kept
+    assert rows == len(lines)
+    assert amounts == [(None,)]
+
+
+def test_unknown_flag_spellings_are_stored_as_null(data_dir):
+    path = data_dir / SOURCE_FILES["enforcement"]
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    header = lines[0].split(",")
+    row = lines[1].split(",")
+    row[header.index("מס' דו''ח")] = "990001"
+    row[header.index("נכה")] = "אולי"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(",".join(row) + "\n")
+
+    build(data_dir, report_storage="separate")
+
+    conn = sqlite3.connect(data_dir / "reports.db")
+    flags = conn.execute(
+        "SELECT \"נכה\" FROM enforcement WHERE \"מס' דו''ח\" = 990001"
+    ).fetchall()
+    quarantined = conn.execute(
+        f"SELECT COUNT(*) FROM {QUARANTINE_TABLE} WHERE table_name = 'enforcement'"
+    ).fetchone()[0]
+    conn.close()
+
+    assert flags == [(None,)]
+    assert quarantined == 0
+
+
+def test_paid_flag_needs_a_known_positive_fine_covered_by_the_payment():
+    chunk = pd.DataFrame(
+        {
+            "תאריך": ["05/07/2021"] * 7,
+            "קנס": ["250", "250", "250", "0", "0", "", ""],
+            "שולם": ["250", "300", "100", "", "0", "", "100"],
+        }
+    )
+    converted, failures = convert_chunk("enforcement", chunk)
+
+    assert (failures == "").all()
+    assert converted["שולם_flag"].tolist() == [1, 1, 0, 0, 0, pd.NA, pd.NA]
+
+
+def test_zero_and_unknown_fines_are_not_counted_as_paid(data_dir):
+    path = data_dir / SOURCE_FILES["enforcement"]
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    header = lines[0].split(",")
+    added = []
+    for number, fine, paid in [(990001, "0", ""), (990002, "", "100"), (990003, "", "")]:
+        row = lines[1].split(",")
+        row[header.index("מס' דו''ח")] = str(number)
+        row[header.index("קנס")] = fine
+        row[header.index("שולם")] = paid
+        added.append(",".join(row))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(added) + "\n")
+
+    build(data_dir, report_storage="separate")
+
+    conn = sqlite3.connect(data_dir / "reports.db")
+    flags = conn.execute(
+        "SELECT \"מס' דו''ח\", \"שולם_flag\" FROM enforcement "
+        "WHERE \"מס' דו''ח\" >= 990001 ORDER BY 1"
+    ).fetchall()
+    paid, rolled_up = conn.execute(
+        'SELECT (SELECT SUM("שולם_flag") FROM enforcement), '
+        "(SELECT SUM(paid_count) FROM rollup_flags_month)"
+    ).fetchone()
+    conn.close()
+
+    assert flags == [(990001, 0), (990002, None), (990003, None)]
+    assert paid == rolled_up
@@ -0,0 +1,123 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from intent_router import answer_text, extract_date_range, route_question, routing_text
+
+REFERENCE = date(2024, 12, 28)
+
+
+def period(question):
+    return extract_date_range(routing_text(question), REFERENCE)[0]
+
+
+@pytest.mark.parametrize(
+    "question, expected",
+    [
+        ("כמה דוחות היו בדצמבר 2024?", ("2024-12-01", "2024-12-31", "12/2024")),
+        ("כמה דוחות היו במרץ?", ("2024-03-01", "2024-03-31", "03/2024")),
+        ("How many tickets in 3/2023", ("2023-03-01", "2023-03-31", "03/2023")),
+        ("how many tickets in Q2 2023", ("2023-04-01", "2023-06-30", "Q2 2023")),
+        ("כמה דוחות ברבעון האחרון של 2023", ("2023-10-01", "2023-12-31", "Q4 2023")),
+        ("כמה דוחות היו בשנה שעברה", ("2023-01-01", "2023-12-31", "2023")),
+        ("how many tickets last month", ("2024-12-01", "2024-12-31", "12/2024")),
+        ("כמה דוחות ב-05/07/2022", ("2022-07-05", "2022-07-05", "05/07/2022")),
+        (
+            "how many tickets between 01/02/2022 and 15/02/2022",
+            ("2022-02-01", "2022-02-15", "01/02/2022–15/02/2022"),
+        ),
+    ],
+)
+def test_date_phrases_resolve_to_periods(question, expected):
+    result = period(question)
+    assert (result["start"], result["end"], result["label"]) == expected
+
+
+@pytest.mark.parametrize(
+    "question, intent, params",
+    [
+        ("הצג את דוח מספר 100001", "report_lookup", {"number": 100001}),
+        ("Show me report 100001 details", "report_lookup", {"number": 100001}),
+        ("האם דו״ח 100001 שולם?", "payment_status", {"number": 100001}),
+        ("Has ticket 2024 been paid yet?", "payment_status", {"number": 2024}),
+        ("כמה דוחות נרשמו ב-2023?", "report_count", {}),
+        ("מה אחוז הדוחות לרכבי נכים בשנת 2022", "disabled_percentage", {}),
+        ("כמה דוחות נתן כל פקח בינואר 2024", "inspector_counts", {}),
+        ("total fines per inspector in 2023", "fine_totals", {"by_inspector": True}),
+        ("מה סכום הקנסות בשנת 2023", "fine_totals", {"by_inspector": False}),
+    ],
+)
+def test_common_questions_are_routed(question, intent, params):
+    route = route_question(question, REFERENCE)
+    assert route is not None
+    assert (route["intent"], route["params"]) == (intent, params)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "",
+        "?!",
+        "מי הפקח עם הכי הרבה דוחות ברחוב הרצל?",
+        "how many tickets were issued on Herzl street in 2023",
+        "how many tickets in 2023 compared to 2022",
+        "כמה דוחות היו ב-31/02/2023",
+    ],
+)
+def test_other_questions_go_to_the_model(question):
+    assert route_question(question, REFERENCE) is None
+
+
+@pytest.mark.parametrize("report_storage", ["shared", "separate"])
+def test_routed_sql_matches_direct_aggregates(databases, report_storage):
+    conn = sqlite3.connect(databases[report_storage])
+
+    def run(question):
+        route = route_question(question, REFERENCE)
+        cursor = conn.execute(route["sql"])
+        columns = [desc[0] for desc in cursor.description]
+        return route, cursor.fetchall(), columns
+
+    try:
+        # Whole months are answered from the rollups, other periods from the
+        # report table; both must agree with a direct count
+        for question, start, end in [
+            ("how many tickets in 2023", "2023-01-01", "2023-12-31"),
+            ("מה סכום הקנסות בשנת 2023", "2023-01-01", "2023-12-31"),
+            (
+                "total fines between 05/01/2023 and 20/03/2023",
+                "2023-01-05",
+                "2023-03-20",
+            ),
+        ]:
+            count, fines = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(קנס), 0) FROM enforcement "
+                "WHERE date_formatted BETWEEN ? AND ?",
+                (start, end),
+            ).fetchone()
+            route, rows, columns = run(question)
+            result = dict(zip(columns, rows[0]))
+            assert result["report_count"] == count
+            if "fine_total" in result:
+                assert result["fine_total"] == pytest.approx(fines)
+
+        expected = dict(
+            conn.execute(
+                'SELECT "שם פקח", COUNT(*) FROM enforcement '
+                "WHERE date_formatted BETWEEN '2024-01-01' AND '2024-01-31' "
+                'GROUP BY "שם פקח"'
+            ).fetchall()
+        )
+        _, rows, _ = run("כמה דוחות נתן כל פקח בינואר 2024")
+        assert dict(rows) == expected
+
+        number = conn.execute("SELECT \"מס' דו''ח\" FROM enforcement LIMIT 1").fetchone()[0]
+        route, rows, columns = run(f"הצג את דוח מספר {number}")
+        assert rows and {row[0] for row in rows} <= {"enforcement", "report_data"}
+        assert answer_text(route, rows, columns, "english").strip()
+        route, rows, columns = run(f"Has ticket {number} been paid?")
+        assert len(rows) == 1
+        assert answer_text(route, rows, columns, "hebrew").strip()
+    finally:
+        conn.close()
@@ -0,0 +1,122 @@
+import glob
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+from query_engine import (
+    BENCHMARK_QUERIES,
+    DEFAULT_ENGINE,
+    available_engines,
+    benchmark_engines,
+    create_engine,
+    sqlite_to_duckdb,
+)
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        (
+            "SELECT strftime('%Y-%m', date_formatted) FROM enforcement",
+            "SELECT strftime(CAST(date_formatted AS DATE), '%Y-%m') FROM enforcement",
+        ),
+        (
+            "SELECT STRFTIME( '%Y', \"ת.תשלום\" ) FROM financial_transactions",
+            "SELECT strftime(CAST(\"ת.תשלום\" AS DATE), '%Y') FROM financial_transactions",
+        ),
+        (
+            "SELECT COUNT(*) FROM enforcement WHERE date_formatted >= date('now')",
+            "SELECT COUNT(*) FROM enforcement WHERE date_formatted >= current_date",
+        ),
+        (
+            "SELECT strftime('%Y', 'now')",
+            "SELECT strftime(current_date, '%Y')",
+        ),
+        (
+            "SELECT julianday(e.date_formatted) FROM enforcement e",
+            "SELECT (epoch(CAST(e.date_formatted AS TIMESTAMP)) / 86400.0 + 2440587.5) "
+            "FROM enforcement e",
+        ),
+        (
+            "SELECT * FROM enforcement WHERE \"שם רחוב\" NOT LIKE '%הרצל%'",
+            "SELECT * FROM enforcement WHERE \"שם רחוב\" NOT ILIKE '%הרצל%'",
+        ),
+    ],
+)
+def test_sqlite_to_duckdb_rewrites_sqlite_functions(sql, expected):
+    assert sqlite_to_duckdb(sql) == expected
+
+
+def test_sqlite_to_duckdb_leaves_literals_and_identifiers_alone():
+    sql = (
+        "SELECT \"date(x)\", 'strftime(''%Y'', now) LIKE' FROM enforcement "
+        "WHERE \"הערת פקח 1\" = 'julianday(now)'"
+    )
+    assert sqlite_to_duckdb(sql) == sql
+
+
+def test_unavailable_engine_falls_back_to_sqlite(databases):
+    engine = create_engine("no-such-engine", databases["shared"])
+    assert engine.name == DEFAULT_ENGINE
+    rows, columns = engine.execute("SELECT COUNT(*) AS n FROM enforcement", 10)
+    assert columns == ["n"] and rows[0][0] > 0
+
+
+@pytest.fixture
+def duckdb_db(tmp_path, databases):
+    """
+    A private copy of the shared-storage database, since the DuckDB engine
+    writes its columnar copy next to it
+    """
+    pytest.importorskip("duckdb")
+    db_path = tmp_path / "reports.db"
+    shutil.copy(databases["shared"], db_path)
+    return str(db_path)
+
+
+def test_engines_return_the_same_rows(duckdb_db):
+    assert "duckdb" in available_engines()
+    report = benchmark_engines(duckdb_db, ["sqlite", "duckdb"], repeat=1)
+    assert len(report) == len(BENCHMARK_QUERIES)
+    for entry in report:
+        assert entry["same_results"], entry["question"]
+
+
+def test_duckdb_reruns_unsupported_queries_on_sqlite(duckdb_db):
+    engine = create_engine("duckdb", duckdb_db)
+    rows, columns = engine.execute("SELECT sqlite_version() AS version", 10)
+    assert columns == ["version"] and rows[0][0].startswith("3.")
+
+
+def test_duckdb_copy_is_replaced_without_closing_running_queries(duckdb_db):
+    engine = create_engine("duckdb", duckdb_db)
+    count = "SELECT COUNT(*) FROM enforcement"
+    expected = engine.execute(count, 1)[0]
+    ready, changed = threading.Event(), threading.Event()
+    results = []
+
+    def long_query():
+        # Holds the old copy across the data version change
+        with engine.budget():
+            ready.set()
+            changed.wait(30)
+            results.append(engine.execute(count, 1)[0])
+
+    worker = threading.Thread(target=long_query)
+    worker.start()
+    ready.wait(30)
+    old_paths = set(glob.glob(duckdb_db[: -len(".db")] + "-*.duckdb"))
+    conn = sqlite3.connect(duckdb_db)
+    conn.execute("PRAGMA user_version = 99")
+    conn.commit()
+    conn.close()
+
+    assert engine.execute(count, 1)[0] == expected
+    changed.set()
+    worker.join(30)
+
+    assert results == [expected]
+    paths = set(glob.glob(duckdb_db[: -len(".db")] + "-*.duckdb"))
+    assert len(old_paths) == len(paths) == 1 and paths != old_paths
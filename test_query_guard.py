@@ -0,0 +1,180 @@
+import sqlite3
+
+import pytest
+
+import query_guard
+from query_guard import (
+    ACTION_LIMIT,
+    ACTION_REWRITE,
+    ACTION_WARN,
+    blocking_issues,
+    check_query_plan,
+    paged_query,
+    query_budget,
+    result_column_count,
+    sanitize_sql_query,
+    table_row_counts,
+)
+
+REPORT_NUMBER = "\"מס' דו''ח\""
+
+
+@pytest.fixture(params=["shared", "separate"])
+def conn(request, databases, monkeypatch):
+    """
+    A connection to each storage layout's test database, with every table of
+    the synthetic data counting as large
+    """
+    monkeypatch.setattr(query_guard, "LARGE_TABLE_ROWS", 100)
+    conn = sqlite3.connect(databases[request.param])
+    yield conn
+    conn.close()
+
+
+def kinds(issues):
+    return sorted((issue["kind"], issue["table"], issue["action"]) for issue in issues)
+
+
+def test_join_without_condition_is_blocked(conn):
+    issues = check_query_plan(
+        conn,
+        'SELECT e."שם רחוב", f."חיוב" FROM enforcement e, financial_transactions f '
+        "LIMIT 10",
+    )
+    assert ("cartesian", "enforcement, financial_transactions", ACTION_REWRITE) in kinds(
+        issues
+    )
+    assert blocking_issues(issues)
+
+
+def test_indexed_join_is_not_blocked(conn):
+    issues = check_query_plan(
+        conn,
+        'SELECT e."שם רחוב", f."חיוב" FROM enforcement e '
+        f"JOIN financial_transactions f ON f.{REPORT_NUMBER} = e.{REPORT_NUMBER} "
+        "LIMIT 10",
+    )
+    assert not blocking_issues(issues)
+
+
+def test_full_scan_without_limit_is_limited(conn):
+    issues = check_query_plan(conn, 'SELECT "שם רחוב" FROM enforcement')
+    assert kinds(issues) == [("full_scan", "enforcement", ACTION_LIMIT)]
+    assert "rows) without a LIMIT" in issues[0]["message"]
+
+    assert check_query_plan(conn, 'SELECT "שם רחוב" FROM enforcement LIMIT 5') == []
+    assert check_query_plan(conn, "SELECT COUNT(*) FROM report_data") == []
+
+
+def test_index_lookups_are_not_flagged(conn):
+    for table_name in ("enforcement", "report_data", "financial_transactions"):
+        sql = f"SELECT * FROM {table_name} WHERE {REPORT_NUMBER} = 1234"
+        assert check_query_plan(conn, sql) == []
+
+
+def test_leading_wildcard_like_warns(conn):
+    issues = check_query_plan(
+        conn, "SELECT COUNT(*) FROM report_data WHERE \"שם רחוב\" LIKE '%הרצל%'"
+    )
+    assert kinds(issues) == [("wildcard_like", "report_data", ACTION_WARN)]
+
+
+def test_small_tables_are_not_flagged(databases):
+    conn = sqlite3.connect(databases["shared"])
+    try:
+        assert check_query_plan(conn, 'SELECT "שם רחוב" FROM enforcement') == []
+    finally:
+        conn.close()
+
+
+def test_query_budget_interrupts_runaway_queries():
+    conn = sqlite3.connect(":memory:")
+    runaway = (
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+        "SELECT COUNT(*) FROM n"
+    )
+    with query_budget(conn, max_steps=1_000_000) as budget:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute(runaway).fetchone()
+    assert budget["exceeded"] == "steps"
+
+    with query_budget(conn, timeout=0.0) as budget:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute(runaway).fetchone()
+    assert budget["exceeded"] == "time"
+
+    with query_budget(conn) as budget:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    assert budget["exceeded"] is None
+    conn.close()
+
+
+def test_sanitize_sql_query():
+    assert sanitize_sql_query(" SELECT 1; ") == "SELECT 1"
+    assert sanitize_sql_query("SELECT 1; DROP TABLE enforcement") == "SELECT 1"
+    assert (
+        sanitize_sql_query("SELECT CAST(x AS FLOAT) FROM t")
+        == "SELECT CAST(x AS REAL) FROM t"
+    )
+
+
+def pages(conn, sql, page_size):
+    column_count = result_column_count(conn, sql)
+    rows, offset = [], 0
+    while True:
+        page = conn.execute(paged_query(sql, page_size, offset, column_count)).fetchall()
+        rows += page
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        'SELECT "שם פקח", "שם רחוב", קנס FROM enforcement',
+        'SELECT "שם פקח", COUNT(*) AS n FROM enforcement GROUP BY 1 ORDER BY n DESC',
+        'SELECT "שם רחוב", קנס FROM report_data ORDER BY קנס, 1, 2 LIMIT 333',
+        'SELECT "שם רחוב", קנס FROM report_data ORDER BY קנס, 1, 2 LIMIT 10, 333',
+        "SELECT \"שם רחוב\", 'ORDER BY' FROM (SELECT * FROM enforcement ORDER BY קנס)",
+    ],
+)
+def test_result_pages_cover_every_row_once(conn, sql):
+    expected = conn.execute(sql).fetchall()
+    rows = pages(conn, sql, 97)
+
+    assert sorted(rows, key=repr) == sorted(expected, key=repr)
+    if "ORDER BY" in query_guard.top_level_sql(sql):
+        assert rows == expected
+
+
+def test_pages_of_an_unordered_query_are_stable():
+    sql = "SELECT a % 3, a FROM t"
+    assert paged_query(sql, 10, 20, 2) == f"{sql} ORDER BY 1, 2 LIMIT 10 OFFSET 20"
+    assert (
+        paged_query("SELECT a FROM t LIMIT 5, 25", 10, 20, 1)
+        == "SELECT a FROM t ORDER BY 1 LIMIT 5 OFFSET 25"
+    )
+    assert (
+        paged_query("SELECT a FROM t ORDER BY a LIMIT 25", 10, 30, 1)
+        == "SELECT a FROM t ORDER BY a LIMIT 0 OFFSET 30"
+    )
+
+
+def test_row_counts_are_cached_per_database_and_data_version(tmp_path):
+    paths = [str(tmp_path / "a.db"), str(tmp_path / "b.db")]
+    conns = [sqlite3.connect(path) for path in paths]
+    for rows, conn in zip([3, 5], conns):
+        conn.execute("CREATE TABLE t (a)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(rows)])
+        conn.commit()
+
+    assert table_row_counts(conns[0], "v1") == {"t": 3}
+    assert table_row_counts(conns[1], "v1") == {"t": 5}
+    conns[0].execute("INSERT INTO t VALUES (9)")
+    conns[0].commit()
+    assert table_row_counts(conns[0], "v1") == {"t": 3}
+    assert table_row_counts(conns[0], "v2") == {"t": 4}
+    assert table_row_counts(conns[1], "v1") == {"t": 5}
+    for conn in conns:
+        conn.close()
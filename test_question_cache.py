@@ -0,0 +1,93 @@
+import sqlite3
+
+import pandas as pd
+
+from question_cache import (
+    HIT_FLUSH_COUNT,
+    QUESTION_CACHE_TABLE,
+    flush_cache_hits,
+    forget_question_sql,
+    lookup_cached_sql,
+    normalize_question,
+    normalize_series,
+    store_question_sql,
+)
+
+QUESTIONS = [
+    "כמה דוחות יש?",
+    "כַּמָּה דּוּחוֹת יֵשׁ",
+    "כמה דו״ח יש בשנת 2023?",
+    "מה הקנס הממוצע (בש\"ח) לכל סוג עבירה?",
+    "  Show   ALL reports_for 2024!  ",
+    "",
+    None,
+]
+
+
+def test_normalize_question_ignores_spelling_differences():
+    assert normalize_question("כַּמָּה דּוּחוֹת יֵשׁ") == normalize_question("כמה דוחות יש?")
+    assert normalize_question("כמה דו״ח יש") == normalize_question("כמה דוח יש")
+    assert normalize_question("כמה דו''ח יש") == normalize_question("כמה דוח יש")
+    assert normalize_question("שלום") == "שלומ"
+    assert normalize_question("  Show   ALL reports_for 2024!  ") == "show all reports for 2024"
+
+
+def test_normalize_series_matches_normalize_question():
+    values = pd.Series(QUESTIONS, index=range(10, 10 + len(QUESTIONS)))
+    normalized = normalize_series(values)
+    assert normalized.index.tolist() == values.index.tolist()
+    assert normalized.tolist() == [normalize_question(q or "") for q in QUESTIONS]
+
+
+def test_stored_sql_is_found_for_an_equivalent_question(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    store_question_sql("כמה דוחות יש?", "SELECT COUNT(*) FROM enforcement", db_path)
+
+    assert lookup_cached_sql("כַּמָּה דּוּחוֹת יֵשׁ", db_path) == "SELECT COUNT(*) FROM enforcement"
+    assert lookup_cached_sql("כמה תשלומים יש?", db_path) is None
+    assert lookup_cached_sql("?!", db_path) is None
+
+
+def test_entries_of_another_schema_version_are_ignored(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    store_question_sql("כמה דוחות יש?", "SELECT 1", db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA user_version = 99")
+    conn.close()
+
+    assert lookup_cached_sql("כמה דוחות יש?", db_path) is None
+
+
+def test_hits_are_written_in_batches(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    store_question_sql("כמה דוחות יש?", "SELECT 1", db_path)
+
+    def hits():
+        conn = sqlite3.connect(db_path)
+        count = conn.execute(f"SELECT hits FROM {QUESTION_CACHE_TABLE}").fetchone()[0]
+        conn.close()
+        return count
+
+    for _ in range(HIT_FLUSH_COUNT - 1):
+        lookup_cached_sql("כמה דוחות יש?", db_path)
+    assert hits() == 0
+    lookup_cached_sql("כמה דוחות יש?", db_path)
+    assert hits() == HIT_FLUSH_COUNT
+
+    lookup_cached_sql("כמה דוחות יש?", db_path)
+    flush_cache_hits(db_path)
+    assert hits() == HIT_FLUSH_COUNT + 1
+
+
+def test_forgotten_sql_is_not_replayed(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    store_question_sql("כמה דוחות יש?", "SELECT 1", db_path)
+    lookup_cached_sql("כמה דוחות יש?", db_path)
+
+    forget_question_sql("כמה דו״חות יש", db_path)
+
+    assert lookup_cached_sql("כמה דוחות יש?", db_path) is None
+    flush_cache_hits(db_path)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute(f"SELECT COUNT(*) FROM {QUESTION_CACHE_TABLE}").fetchone()[0] == 0
+    conn.close()
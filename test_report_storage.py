@@ -0,0 +1,157 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from index_advisor import scanned_tables
+from ingest import (
+    REPORT_EXTRA_COLUMNS,
+    REPORT_ROWS_TABLE,
+    REPORT_SOURCE_BITS,
+    ROW_HASH_COLUMN,
+    SOURCE_FILES,
+    build_database,
+    merge_report_rows,
+    report_storage_stats,
+)
+
+REPORT_NUMBER = "\"מס' דו''ח\""
+
+
+def build(data_dir, report_storage):
+    return build_database(
+        str(data_dir / "reports.db"),
+        str(data_dir),
+        parallel=False,
+        report_storage=report_storage,
+    )
+
+
+def read_table(db_path, table_name):
+    conn = sqlite3.connect(db_path)
+    try:
+        frame = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
+    finally:
+        conn.close()
+    return frame.sort_values(list(frame.columns), ignore_index=True)
+
+
+@pytest.mark.parametrize("table_name", list(REPORT_SOURCE_BITS))
+def test_shared_storage_returns_the_same_rows(databases, table_name):
+    shared = read_table(databases["shared"], table_name)
+    separate = read_table(databases["separate"], table_name)
+
+    assert list(shared.columns) == list(separate.columns)
+    assert len(shared) > 0
+    pd.testing.assert_frame_equal(shared, separate)
+
+
+def test_shared_storage_stores_common_rows_once(databases):
+    shared = report_storage_stats(databases["shared"])
+    separate = report_storage_stats(databases["separate"])
+
+    assert separate["mode"] == "separate" and separate["shared_rows"] == 0
+    assert shared["mode"] == "shared"
+    assert shared["rows"] == separate["rows"]
+    assert shared["shared_rows"] > 0
+    assert shared["stored_rows"] == shared["rows"] - shared["shared_rows"]
+
+
+def test_separate_storage_is_the_default(data_dir):
+    build_database(str(data_dir / "reports.db"), str(data_dir), parallel=False)
+
+    assert report_storage_stats(str(data_dir / "reports.db"))["mode"] == "separate"
+
+
+def append_last_row(data_dir, table_name):
+    path = data_dir / SOURCE_FILES[table_name]
+    with open(path, encoding="utf-8") as f:
+        last_row = f.read().splitlines()[-1]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(last_row + "\n")
+
+
+@pytest.mark.parametrize(
+    "report_storage, rebuilt",
+    [("shared", set(REPORT_SOURCE_BITS)), ("separate", {"report_data"})],
+)
+def test_report_table_change_rebuilds_its_storage(data_dir, report_storage, rebuilt):
+    build(data_dir, report_storage)
+    before = read_table(str(data_dir / "reports.db"), "enforcement")
+    append_last_row(data_dir, "report_data")
+
+    assert set(build(data_dir, report_storage)) == rebuilt
+    after = read_table(str(data_dir / "reports.db"), "enforcement")
+    pd.testing.assert_frame_equal(before, after)
+
+
+def test_switching_storage_mode_rebuilds_the_report_tables(data_dir):
+    build(data_dir, "separate")
+    separate = read_table(str(data_dir / "reports.db"), "report_data")
+
+    assert set(build(data_dir, "shared")) == set(REPORT_SOURCE_BITS)
+    assert report_storage_stats(str(data_dir / "reports.db"))["mode"] == "shared"
+    shared = read_table(str(data_dir / "reports.db"), "report_data")
+    pd.testing.assert_frame_equal(separate, shared)
+
+    assert set(build(data_dir, "separate")) == set(REPORT_SOURCE_BITS)
+    conn = sqlite3.connect(data_dir / "reports.db")
+    leftover = conn.execute(
+        "SELECT name FROM sqlite_master WHERE name = ?", (REPORT_ROWS_TABLE,)
+    ).fetchone()
+    conn.close()
+    assert leftover is None
+
+
+def test_view_scans_are_attributed_to_report_rows(databases):
+    conn = sqlite3.connect(databases["shared"])
+    try:
+        assert scanned_tables(conn, 'SELECT "שם רחוב" FROM enforcement') == [
+            REPORT_ROWS_TABLE
+        ]
+        assert scanned_tables(
+            conn, f"SELECT * FROM report_data WHERE {REPORT_NUMBER} = 1"
+        ) == []
+    finally:
+        conn.close()
+
+
+def stage(conn, table_name, rows):
+    extra = "".join(f', "{c}" TEXT' for c in REPORT_EXTRA_COLUMNS[table_name])
+    conn.execute(
+        f'CREATE TABLE staging.{table_name} ("מס\' דו\'\'ח" INTEGER, "שם רחוב" TEXT'
+        f"{extra}, {ROW_HASH_COLUMN} INTEGER)"
+    )
+    for row in rows:
+        values = (*row[:2], *([None] * len(REPORT_EXTRA_COLUMNS[table_name])), row[2])
+        conn.execute(
+            f"INSERT INTO staging.{table_name} VALUES "
+            f"({', '.join('?' * len(values))})",
+            values,
+        )
+
+
+def test_rows_pair_only_when_their_values_are_equal():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("ATTACH DATABASE ':memory:' AS staging")
+    # Hash 7 collides: only the values tell those rows apart
+    enforcement = [(1, "הרצל", 7), (2, "ביאליק", 7), (5, "ויצמן", 9), (5, "ויצמן", 9)]
+    report_data = [(2, "ביאליק", 7), (3, None, 7), (5, "ויצמן", 9)]
+    stage(conn, "enforcement", enforcement)
+    stage(conn, "report_data", report_data)
+    merge_report_rows(conn, "enforcement")
+    merge_report_rows(conn, "report_data")
+
+    def rows(table_name):
+        return sorted(
+            conn.execute(f'SELECT "מס\' דו\'\'ח", "שם רחוב" FROM {table_name}').fetchall(),
+            key=repr,
+        )
+
+    assert rows("enforcement") == sorted((n, s) for n, s, _ in enforcement)
+    assert rows("report_data") == sorted(((n, s) for n, s, _ in report_data), key=repr)
+    stored = conn.execute(
+        f'SELECT source_mask, "מס\' דו\'\'ח" FROM {REPORT_ROWS_TABLE} ORDER BY row_id'
+    ).fetchall()
+    conn.close()
+    assert stored == [(1, 1), (1, 2), (3, 5), (1, 5), (2, 2), (2, 3)]
@@ -0,0 +1,51 @@
+import os
+import threading
+
+from reports import (
+    REPORT_SECTIONS,
+    generate_reports,
+    load_rollups,
+    make_period,
+    read_report,
+    write_report,
+)
+
+
+def test_reports_are_built_once_per_data_version(databases, tmp_path):
+    periods = [make_period("monthly", "2023-03"), make_period("yearly", "2023-01")]
+
+    first = generate_reports(databases["shared"], periods, str(tmp_path), parallel=False)
+    again = generate_reports(databases["shared"], periods, str(tmp_path), parallel=False)
+
+    assert [r["cached"] for r in first.values()] == [False, False]
+    assert [r["cached"] for r in again.values()] == [True, True]
+    sections = read_report(first["2023"]["files"])
+    assert list(sections) == REPORT_SECTIONS
+
+
+def test_sessions_writing_the_same_report_do_not_clash(databases, tmp_path):
+    rollups, version = load_rollups(databases["separate"])
+    directory = str(tmp_path / version / "monthly" / "2023-03")
+    sections = {
+        name: rollups["rollup_inspector_month"].head(50) for name in REPORT_SECTIONS
+    }
+    start = threading.Barrier(4)
+    results, errors = [], []
+
+    def write():
+        start.wait()
+        try:
+            results.append(write_report(sections, directory))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(results) == 4 and all(files is not None for files in results)
+    assert os.listdir(os.path.dirname(directory)) == ["2023-03"]
+    assert len(read_report(results[0])["summary"]) == 50
@@ -0,0 +1,111 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from text_search import (
+    INSPECTOR_NOTE_COLUMNS,
+    REPORT_NUMBER_COLUMN,
+    TEXT_SEARCH_TABLE,
+    ensure_text_search_table,
+    fts_query,
+    index_text,
+    index_texts,
+    search_reports,
+    text_matches,
+    word_variants,
+)
+
+
+def test_word_variants_strip_up_to_two_prefix_letters():
+    assert word_variants("וברחוב") == ["וברחוב", "ברחוב", "רחוב"]
+    assert word_variants("הרצל") == ["הרצל", "רצל"]
+    assert word_variants("בית") == ["בית"]
+    assert word_variants("חניה") == ["חניה"]
+
+
+def test_fts_query_matches_prefixes_and_exact_stems():
+    assert fts_query("ברחוב הרצל") == '("ברחוב"* OR "רחוב") AND ("הרצל"* OR "רצל")'
+    assert fts_query("חונ") == '"חונ"*'
+    assert fts_query("דו״ח", "notes") == 'notes : ("דוח"*)'
+    assert fts_query("חונה", "no-such-column") == '"חונה"*'
+    assert fts_query("?!") is None
+    assert fts_query(None) is None
+
+
+@pytest.fixture
+def index():
+    conn = sqlite3.connect(":memory:")
+    ensure_text_search_table(conn)
+    texts = {1: "עברה על חניה", 2: "חסימת מעבר", 3: "רכב חונה ברחוב הרצל"}
+    conn.executemany(
+        f"INSERT INTO {TEXT_SEARCH_TABLE} VALUES (?, 'enforcement', ?, '', '')",
+        [(number, index_text(text)) for number, text in texts.items()],
+    )
+    yield conn
+    conn.close()
+
+
+def matching(conn, text):
+    return sorted(
+        row[0]
+        for row in conn.execute(
+            f'SELECT "{REPORT_NUMBER_COLUMN}" FROM {TEXT_SEARCH_TABLE} '
+            f"WHERE {TEXT_SEARCH_TABLE} MATCH ?",
+            (fts_query(text),),
+        )
+    )
+
+
+def test_fts_query_does_not_match_unrelated_stems(index):
+    # "מעבר" minus its prefix is "עבר", which must not find "עברה"
+    assert matching(index, "מעבר") == [2]
+    assert matching(index, "רחוב") == [3]
+    assert matching(index, "וברחוב") == [3]
+    assert matching(index, "חונ") == [3]
+    assert matching(index, "חונה מעבר") == []
+
+
+def test_text_matches_agrees_with_fts(index):
+    texts = {1: "עברה על חניה", 2: "חסימת מעבר", 3: "רכב חונה ברחוב הרצל"}
+    for query in ["מעבר", "רחוב", "וברחוב", "חונ", "חונה מעבר", "עברה"]:
+        words = query.split()
+        expected = [n for n, text in texts.items() if text_matches(index_text(text), words)]
+        assert matching(index, query) == expected
+
+
+def test_index_texts_matches_index_text(databases):
+    conn = sqlite3.connect(databases["separate"])
+    columns = INSPECTOR_NOTE_COLUMNS + ["שם רחוב", "מיקום"]
+    frame = pd.read_sql_query(
+        "SELECT {} FROM enforcement".format(", ".join(f'"{c}"' for c in columns)), conn
+    )
+    conn.close()
+    frame.loc[0, "מיקום"] = "לְיַד הַחֲנוּת, בְּרְחוֹב הֶרְצְל"
+
+    indexed = index_texts(frame)
+    assert indexed.index.tolist() == frame.index.tolist()
+    assert indexed.tolist() == [
+        index_text(*(value for value in row if isinstance(value, str)))
+        for row in frame.itertuples(index=False)
+    ]
+
+
+@pytest.mark.parametrize("report_storage", ["shared", "separate"])
+def test_search_reports_returns_only_matching_rows(databases, report_storage):
+    conn = sqlite3.connect(databases[report_storage])
+    try:
+        results = search_reports(conn, "מעבר", limit=1000)
+        street = search_reports(conn, "ביאליק", limit=1000, column="street")
+        assert search_reports(conn, "?!") is None
+        assert search_reports(conn, "אין כזה דבר").empty
+    finally:
+        conn.close()
+
+    assert not results.empty
+    assert set(results["source"]) == {"enforcement", "report_data"}
+    for _, row in results.iterrows():
+        text = " ".join(value for value in row if isinstance(value, str))
+        assert "מעבר" in text
+    assert not street.empty
+    assert (street["שם רחוב"] == "ביאליק").all()
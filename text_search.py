@@ -0,0 +1,300 @@
+import sqlite3
+import time
+
+import pandas as pd
+
+from question_cache import normalize_question, normalize_series
+
+# FTS5 index over the free-text columns of the report tables. Text is
+# normalized in Python before indexing (FTS5 tokenizers cannot be written in
+# Python), and queries go through the same normalization via fts_query().
+TEXT_SEARCH_TABLE = "report_text_fts"
+
+REPORT_NUMBER_COLUMN = "מס' דו''ח"
+
+INSPECTOR_NOTE_COLUMNS = ["הערת פקח 1", "הערת פקח 2", "הערת פקח 3", "הערת פקח 4"]
+
+# Source columns indexed into each FTS column, per source table
+TEXT_SEARCH_SOURCES = {
+    "enforcement": {
+        "notes": INSPECTOR_NOTE_COLUMNS,
+        "street": ["שם רחוב"],
+        "location": ["מיקום"],
+    },
+    "report_data": {
+        "notes": INSPECTOR_NOTE_COLUMNS + ["הערות לדוח"],
+        "street": ["שם רחוב"],
+        "location": ["מיקום"],
+    },
+}
+
+TEXT_SEARCH_COLUMNS = ["notes", "street", "location"]
+
+# One-letter Hebrew prefixes (ו, ה, ב, כ, ל, מ, ש) that attach to the next word
+HEBREW_PREFIXES = "והבכלמש"
+MAX_PREFIX_LETTERS = 2
+# Stripping a prefix must leave at least this many letters
+MIN_STEM_LETTERS = 3
+
+SEARCH_RESULT_LIMIT = 50
+
+# Source rows read and indexed per batch
+INDEX_BATCH_ROWS = 50_000
+
+
+def word_variants(word):
+    """
+    Returns the word and its forms with up to two Hebrew prefix letters
+    removed, e.g. "וברחוב" -> ["וברחוב", "ברחוב", "רחוב"]
+    """
+    variants = [word]
+    for count in range(1, MAX_PREFIX_LETTERS + 1):
+        stem = word[count:]
+        if word[count - 1] not in HEBREW_PREFIXES or len(stem) < MIN_STEM_LETTERS:
+            break
+        variants.append(stem)
+    return variants
+
+
+def index_text(*values):
+    """
+    Normalizes source text for indexing: niqqud, quotes and punctuation are
+    removed, final letters mapped to regular letters, and every prefixed
+    word is indexed with its prefix-stripped forms as well
+    """
+    words = normalize_question(" ".join(v for v in values if v)).split()
+    return " ".join(variant for word in words for variant in word_variants(word))
+
+
+def index_texts(frame):
+    """
+    index_text of every row of a DataFrame of source text columns; returns
+    a Series. Normalization is vectorized, and the prefix-stripped forms are
+    added once per distinct text (notes, streets and locations repeat a lot).
+    """
+    joined = pd.Series("", index=frame.index)
+    for column in frame.columns:
+        joined = joined + " " + frame[column].fillna("").astype(str)
+    normalized = normalize_series(joined)
+    indexed = {
+        text: " ".join(
+            variant for word in text.split() for variant in word_variants(word)
+        )
+        for text in normalized.unique()
+    }
+    return normalized.map(indexed)
+
+
+def word_terms(word):
+    """
+    The indexed tokens a query word matches: the word itself as a prefix
+    (so "חונ" finds "חונה") and, for a prefixed word, its stem exactly
+    ("ברחוב" also finds "רחוב"). Other prefix-stripped forms are left out,
+    since they are stems of unrelated words ("מעבר" must not find "עבירה").
+    """
+    variants = word_variants(word)
+    return word, variants[-1] if len(variants) > 1 else None
+
+
+def fts_query(text, column=None):
+    """
+    Converts free text to an FTS5 MATCH expression over report_text_fts.
+
+    Every word must match, as a prefix or by its stem (see word_terms).
+    Registered on the pooled connections as the SQL function
+    fts_query(text[, column]); returns NULL for text without words.
+    """
+    words = normalize_question(text or "").split()
+    if not words:
+        return None
+    terms = []
+    for word in words:
+        prefix, stem = word_terms(word)
+        if stem is None:
+            terms.append(f'"{prefix}"*')
+        else:
+            terms.append(f'("{prefix}"* OR "{stem}")')
+    expression = " AND ".join(terms)
+    if column in TEXT_SEARCH_COLUMNS:
+        expression = f"{column} : ({expression})"
+    return expression
+
+
+def text_matches(indexed, words):
+    """
+    Whether indexed text (index_text output) matches every query word the
+    way fts_query's expression does
+    """
+    tokens = indexed.split()
+    for word in words:
+        prefix, stem = word_terms(word)
+        if not any(token.startswith(prefix) or token == stem for token in tokens):
+            return False
+    return True
+
+
+def register_search_functions(conn):
+    conn.create_function("fts_query", 1, fts_query, deterministic=True)
+    conn.create_function("fts_query", 2, fts_query, deterministic=True)
+
+
+def ensure_text_search_table(conn):
+    columns = ", ".join(TEXT_SEARCH_COLUMNS)
+    conn.execute(
+        f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TEXT_SEARCH_TABLE} USING fts5(
+        "{REPORT_NUMBER_COLUMN}" UNINDEXED, source UNINDEXED, {columns},
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """
+    )
+
+
+def source_text_columns(conn, table_name):
+    """
+    Returns {fts column: [source columns present in the table]}
+    """
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+    return {
+        fts_column: [c for c in columns if c in existing]
+        for fts_column, columns in TEXT_SEARCH_SOURCES[table_name].items()
+    }
+
+
+def build_text_index(conn, table_name):
+    """
+    Replaces the indexed text of one source table in a single transaction
+    """
+    start = time.perf_counter()
+    columns = source_text_columns(conn, table_name)
+    selected = [REPORT_NUMBER_COLUMN] + [c for cols in columns.values() for c in cols]
+    select_sql = "SELECT {} FROM {}".format(
+        ", ".join('"' + c.replace('"', '""') + '"' for c in selected), table_name
+    )
+    insert_sql = f"INSERT INTO {TEXT_SEARCH_TABLE} VALUES (?, ?, ?, ?, ?)"
+
+    rows = 0
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN")
+        ensure_text_search_table(conn)
+        conn.execute(f"DELETE FROM {TEXT_SEARCH_TABLE} WHERE source = ?", (table_name,))
+        cursor = conn.cursor()
+        cursor.execute(select_sql)
+        while True:
+            batch = cursor.fetchmany(INDEX_BATCH_ROWS)
+            if not batch:
+                break
+            frame = pd.DataFrame.from_records(batch, columns=selected)
+            texts = pd.DataFrame(
+                {
+                    fts_column: index_texts(frame[columns[fts_column]])
+                    for fts_column in TEXT_SEARCH_COLUMNS
+                }
+            )
+            # Numbers are taken from the raw rows so they keep their SQLite type
+            numbers = [row[0] for row in batch]
+            records = [
+                (numbers[i], table_name, *values)
+                for i, values in enumerate(texts.itertuples(index=False))
+                if any(values)
+            ]
+            conn.executemany(insert_sql, records)
+            rows += len(records)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = isolation_level
+
+    seconds = round(time.perf_counter() - start, 3)
+    print(f"Indexed text of {rows:,} {table_name} rows in {seconds}s")
+    return rows
+
+
+def refresh_text_index(db_path="reports.db", tables=None):
+    """
+    Reindexes the text of the given (just rebuilt) source tables, or of every
+    source table when the FTS table does not exist yet
+    """
+    tables = set(tables or [])
+    conn = sqlite3.connect(db_path)
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (TEXT_SEARCH_TABLE,)
+        ).fetchone()
+        present = {
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')"
+            )
+        }
+        for table_name in TEXT_SEARCH_SOURCES:
+            if table_name in present and (table_name in tables or not exists):
+                build_text_index(conn, table_name)
+    except sqlite3.Error as e:
+        print(f"Text index error: {e}")
+    finally:
+        conn.close()
+
+
+def search_reports(conn, text, limit=SEARCH_RESULT_LIMIT, column=None):
+    """
+    Finds report rows whose notes, street or location match the text, best
+    matches first. Returns a DataFrame with the original (not normalized)
+    text of each matching row, or None when the text has no searchable words.
+    """
+    expression = fts_query(text, column)
+    if expression is None:
+        return None
+    words = normalize_question(text).split()
+    matches = conn.execute(
+        f"""
+    SELECT "{REPORT_NUMBER_COLUMN}", source, MIN(rank) AS score
+    FROM {TEXT_SEARCH_TABLE} WHERE {TEXT_SEARCH_TABLE} MATCH ?
+    GROUP BY "{REPORT_NUMBER_COLUMN}", source ORDER BY score LIMIT ?
+    """,
+        (expression, limit),
+    ).fetchall()
+
+    frames = []
+    for table_name in TEXT_SEARCH_SOURCES:
+        numbers = [number for number, source, _ in matches if source == table_name]
+        if not numbers:
+            continue
+        columns = source_text_columns(conn, table_name)
+        selected = [REPORT_NUMBER_COLUMN, "תאריך"] + [
+            c for cols in columns.values() for c in cols
+        ]
+        placeholders = ", ".join("?" * len(numbers))
+        frame = pd.read_sql_query(
+            "SELECT {} FROM {} WHERE \"{}\" IN ({})".format(
+                ", ".join('"' + c.replace('"', '""') + '"' for c in selected),
+                table_name,
+                REPORT_NUMBER_COLUMN,
+                placeholders,
+            ),
+            conn,
+            params=numbers,
+        )
+        # A report number can have several rows; keep the ones whose text
+        # matched
+        scope = [column] if column in TEXT_SEARCH_COLUMNS else TEXT_SEARCH_COLUMNS
+        searched = [c for fts_column in scope for c in columns[fts_column]]
+        indexed = index_texts(frame[searched])
+        frame = frame.loc[[text_matches(text, words) for text in indexed]]
+        frame.insert(1, "source", table_name)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=[REPORT_NUMBER_COLUMN, "source"])
+
+    order = {(number, source): i for i, (number, source, _) in enumerate(matches)}
+    results = pd.concat(frames, ignore_index=True)
+    results["_order"] = [
+        order.get((number, source), len(order))
+        for number, source in zip(results[REPORT_NUMBER_COLUMN], results["source"])
+    ]
+    return results.sort_values("_order").drop(columns="_order").reset_index(drop=True)